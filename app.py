@@ -1,5 +1,6 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for
+from flask import Flask, Blueprint, render_template, request, jsonify, redirect, url_for, Response, stream_with_context
 import os
+import atexit
 from dotenv import load_dotenv, find_dotenv
 import uuid
 import time
@@ -8,6 +9,7 @@ import collections
 import traceback
 import requests
 import json
+import queue
 import markdown
 from news_backend.knowledge_hub_data import unit1_data, unit2_data, unit3_data, unit4_data, unit5_data, unit6_data, unit7_data
 
@@ -30,7 +32,8 @@ else:
 
 # --- API Keys (will be loaded from environment variables) ---
 NEWSAPI_API_KEY = os.getenv("NEWSAPI_API_KEY")
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+# GEMINI_API_KEYS (comma-separated) configures a pool of server keys; any one of them stands for the whole pool
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY") or (os.getenv("GEMINI_API_KEYS") or "").split(",")[0].strip() or None
 
 if not NEWSAPI_API_KEY or not GEMINI_API_KEY:
     print("WARNING: NEWSAPI_API_KEY or GEMINI_API_KEY environment variable not set. API features may not work.")
@@ -39,51 +42,71 @@ if not NEWSAPI_API_KEY or not GEMINI_API_KEY:
 from news_backend.debunked import (
     learn_chat,
     search_debunked,
+    normalize_search_query,
+    get_search_stage_timings,
     get_news_headlines,
     get_misconception_headlines,
     get_issue_headlines,
     create_full_news_article,
     create_full_misconception_article,
     create_full_issue_article,
-    API_CALL_DELAY
+    create_full_news_articles_batch,
+    create_full_misconception_articles_batch,
+    create_full_issue_articles_batch
 )
-
-app = Flask(__name__,
-            template_folder='templates',
-            static_folder='static')
+from news_backend import upstream
+from news_backend import rate_limit
+from news_backend import key_pool
+from news_backend import resilience
+from news_backend import response_cache
+from news_backend.singleflight import SingleFlight
+from news_backend.scheduler import JobScheduler
+from news_backend.article_store import ArticleStore, ARTICLE_STORE_PATH
+from news_backend.article_cache import ArticleCache, ARTICLE_CACHE_MAX_BYTES, ARTICLE_CACHE_POLICY
+from news_backend.leader import LeaderElection
+from news_backend.feed_store import FeedStore, article_card, json_object, render_page, FEED_PAGE_SIZE, FEED_MAX_PAGE_SIZE
+from news_backend.search_jobs import search_jobs, JobQueueFull, JOB_QUEUED, JOB_SUCCEEDED, JOB_FAILED
+from news_backend.rate_limit import RateLimitExceeded
+
+# All routes live on this blueprint; create_app() registers it on a new Flask app
+routes = Blueprint('main', __name__)
 
 # --- Global Caching and Threading Setup ---
-ARTICLE_CACHE = {} # Stores full article objects by ID for /article/<id> route
 
+# Writer-side headline queues; published articles live in feed_store snapshots
 feed_cache = {
-    "latest_news": {"headlines": [], "full_articles": [], "timestamp": 0},
-    "general_misconceptions": {"headlines": [], "full_articles": [], "timestamp": 0},
-    "important_issues": {"headlines": [], "full_articles": [], "timestamp": 0}
+    "latest_news": {"headlines": []},
+    "general_misconceptions": {"headlines": []},
+    "important_issues": {"headlines": []}
 }
-cache_lock = threading.Lock() # Protects feed_cache and ARTICLE_CACHE
+cache_lock = threading.Lock() # Protects feed_cache and generation_state; never held across network calls
 
-# Global state for the background worker's sequence
+# Global state for the background generator
 worker_state = {
     "initial_generation_complete": False,
-    "creation_sequence_active": False,
-    "refresh_sequence_active": False,
-    "current_generation_step": 0,
-    "last_sequence_execution_time": 0,
-    "user_requested_more": False
+    "last_refresh_time": 0
 }
 worker_state_lock = threading.Lock() # Protects worker_state
 
 MAX_HEADLINES_TO_GENERATE_AT_ONCE = 15
 MAX_ARTICLES_PER_SECTION = 15 # Target max articles to generate/store per section
 INITIAL_DISPLAY_ARTICLES = 3 # Initial articles to display on feed load (from the first 3 generated)
+ARTICLE_GENERATION_BATCH_SIZE = int(os.getenv("ARTICLE_GENERATION_BATCH_SIZE", 3)) # Articles generated per Gemini call during feed fill
+
+FEED_WORKER_THREADS = int(os.getenv("FEED_WORKER_THREADS", 3)) # Concurrent generation tasks
+FEED_REFRESH_INTERVAL_SECONDS = float(os.getenv("FEED_REFRESH_INTERVAL_SECONDS", 60)) # Periodic re-plan of every section
+FEED_RETRY_DELAY_SECONDS = float(os.getenv("FEED_RETRY_DELAY_SECONDS", 30)) # Pause before retrying a section after a failed upstream call
+MAX_HEADLINE_ATTEMPTS = 2 # Headlines whose article fails this many times are dropped
 
-stop_background_thread = threading.Event()
-background_thread = None
+feed_scheduler = None
+feed_generation_keys = (None, None)
+headline_attempts = {} # headline -> failed generation attempts, protected by cache_lock
 
 section_configs = {
     "latest_news": {
         "get_headlines_func": get_news_headlines,
         "create_article_func": create_full_news_article,
+        "create_articles_batch_func": create_full_news_articles_batch,
         "headlines_topic": "current events",
         "initial_articles_target": 3,
         "needs_news_key": True
@@ -91,6 +114,7 @@ section_configs = {
     "general_misconceptions": {
         "get_headlines_func": get_misconception_headlines,
         "create_article_func": create_full_misconception_article,
+        "create_articles_batch_func": create_full_misconception_articles_batch,
         "headlines_topic": "common myths",
         "initial_articles_target": 3,
         "needs_news_key": False
@@ -98,15 +122,62 @@ section_configs = {
     "important_issues": {
         "get_headlines_func": get_issue_headlines,
         "create_article_func": create_full_issue_article,
+        "create_articles_batch_func": create_full_issue_articles_batch,
         "headlines_topic": "global challenges",
         "initial_articles_target": 3,
         "needs_news_key": False
     }
 }
 
-# Global variable to track 429 errors and implement backoff
-last_429_error_time = 0
-BACKOFF_DURATION_ON_429 = 300 # 5 minutes in seconds, can be increased if needed
+# Per-section generation bookkeeping, protected by cache_lock:
+# "claimed" = headlines handed to scheduled generate tasks, "fetching" = headline fetch in progress
+generation_state = {sec_name: {"claimed": 0, "fetching": False} for sec_name in section_configs}
+
+# Immutable, versioned feed snapshots: readers never take cache_lock
+feed_store = FeedStore(
+    section_configs.keys(),
+    section_targets={sec_name: config["initial_articles_target"] for sec_name, config in section_configs.items()}
+)
+# Generated articles, section membership, headline queues and worker progress survive restarts here
+article_store = ArticleStore(ARTICLE_STORE_PATH)
+atexit.register(article_store.close)
+
+# Multi-process mode: one elected process generates, the others follow the shared article store
+FEED_SHARED_STORE = os.getenv("FEED_SHARED_STORE", "false").lower() == "true"
+FEED_SYNC_INTERVAL_SECONDS = float(os.getenv("FEED_SYNC_INTERVAL_SECONDS", 1))
+feed_leader = None
+feed_sync_lock = threading.Lock() # Serializes publishing persisted versions into feed_store
+feed_sync_stop = threading.Event()
+feed_sync_thread = None
+
+# Full article objects by ID for the /article/<id> route; bounded, falling back to article_store on a miss
+ARTICLE_CACHE = ArticleCache(ARTICLE_CACHE_MAX_BYTES, ARTICLE_CACHE_POLICY, backing_store=article_store)
+
+# Clients may keep the feed but must revalidate it (If-None-Match) before every reuse
+FEED_CACHE_CONTROL = "private, no-cache"
+# Payload encodings in order of preference; each gets its own ETag since the bytes differ
+FEED_ENCODINGS = ("br", "gzip", "identity")
+
+def feed_variant(fields="full", section=None, cursor=0, limit=None):
+    """ETag suffix naming one representation of the feed; the default whole feed has none."""
+    if fields == "full" and section is None and cursor == 0 and limit is None:
+        return ""
+    return f"-{fields}-{section or 'all'}-{cursor}-{limit or 'all'}"
+
+def feed_etag(snapshot, encoding, variant=""):
+    etag = snapshot.etag + variant
+    return etag if encoding == "identity" else f"{etag}-{encoding}"
+
+# Longest a foreground request may wait for a rate-limit token before failing fast with a 429
+REQUEST_RATE_LIMIT_WAIT_SECONDS = float(os.getenv("REQUEST_RATE_LIMIT_WAIT_SECONDS", 20))
+
+# Interval between SSE comment lines that keep idle streams open through proxies
+SSE_HEARTBEAT_SECONDS = 15
+
+# Live feed subscribers each hold a connection and a thread, so their number is capped
+FEED_STREAM_MAX_SUBSCRIBERS = int(os.getenv("FEED_STREAM_MAX_SUBSCRIBERS", 100))
+FEED_STREAM_RETRY_AFTER_SECONDS = 30
+feed_stream_slots = threading.BoundedSemaphore(FEED_STREAM_MAX_SUBSCRIBERS)
 
 # Define CATEGORY_COLORS to match frontend (for article_detail.html)
 CATEGORY_COLORS = {
@@ -123,452 +194,355 @@ CATEGORY_COLORS = {
 }
 DEFAULT_CATEGORY_COLOR = CATEGORY_COLORS['general'] # Fallback if category not found
 
-def background_article_generation_worker(gemini_key, news_key):
-    """"
-    Worker thread to generate and update articles in the cache.
-    It performs initial generation and then continuous updates.
-
-    global last_429_error_time
-    print("DEBUG: Background article generation worker started.")
-    
-    while not stop_background_thread.is_set():
-        current_time = time.time()
-
-        with worker_state_lock:
-            initial_complete = worker_state["initial_generation_complete"]
-            creation_active = worker_state["creation_sequence_active"]
-            refresh_active = worker_state["refresh_sequence_active"]
-            current_step = worker_state["current_generation_step"]
-            last_exec_time = worker_state["last_sequence_execution_time"]
-            user_requested_refresh = worker_state["user_requested_more"]
-
-        # Check if we are in a 429 backoff period
-        if current_time - last_429_error_time < BACKOFF_DURATION_ON_429:
-            remaining_backoff = BACKOFF_DURATION_ON_429 - (current_time - last_429_error_time)
-            print(f"DEBUG: Background: In 429 backoff. Sleeping for {remaining_backoff:.2f} seconds.")
-            time.sleep(remaining_backoff)
-            continue
+# Concurrent identical searches share one search_debunked run
+search_flight = SingleFlight("search_articles")
+
+# --- Background Feed Generation (priority job scheduler) ---
+# Lower priority numbers run first: sections still below their initial target are filled before
+# the rest of the feed is topped up.
+PRIORITY_INITIAL_FILL = 0
+PRIORITY_FILL = 5
+PRIORITY_REFRESH = 9
+
+def schedule_feed_task(name, fn, *args, **kwargs):
+    """Schedules a generation task; a no-op once the generator has been stopped."""
+    scheduler = feed_scheduler
+    if scheduler is None or not scheduler.is_running():
+        return None
+    return scheduler.schedule(name, fn, *args, **kwargs)
+
+def section_budgets(sec_name, gemini_key, news_key):
+    """Rate-limit buckets a section's tasks draw from; the scheduler defers tasks until they have tokens."""
+    budgets = [("gemini", gemini_key)]
+    if section_configs[sec_name]["needs_news_key"]:
+        budgets.append(("newsapi", news_key))
+    return budgets
+
+def update_initial_generation_complete():
+    # Derived by feed_store from each section's initial_articles_target
+    complete = feed_store.current().initial_generation_complete
+    with worker_state_lock:
+        if complete and not worker_state["initial_generation_complete"]:
+            print("DEBUG: All initial article generation complete.")
+        worker_state["initial_generation_complete"] = complete
 
-        try:
-            task_processed_in_this_loop = False
-
-            # --- Initial Generation Sequence ---
-            if not initial_complete:
-                print(f"DEBUG: Initial Generation Sequence - Step {current_step}")
-                with cache_lock:
-                    
-                    if current_step == 0: # Generate 15 headlines for news
-                        print("DEBUG: Initial: Generating 15 headlines for latest_news.")
-                        new_headlines_response = section_configs["latest_news"]["get_headlines_func"](gemini_key, news_key, count=MAX_HEADLINES_TO_GENERATE_AT_ONCE)
-                        if isinstance(new_headlines_response, list):
-                            feed_cache["latest_news"]["headlines"].extend(new_headlines_response)
-                            print(f"DEBUG: Initial: Added {len(new_headlines_response)} headlines to latest_news. Total: {len(feed_cache['latest_news']['headlines'])}")
-                        else:
-                            print(f"ERROR: Initial: Failed to get headlines for latest_news: {new_headlines_response.get('error', 'Unknown error')}")
-                        with worker_state_lock: worker_state["current_generation_step"] += 1
-                        task_processed_in_this_loop = True
-                        time.sleep(API_CALL_DELAY)
-                        
-                    elif current_step == 1: # Generate 3 articles for news
-                        print("DEBUG: Initial: Generating 3 articles for latest_news.")
-                        for _ in range(3):
-                            if feed_cache["latest_news"]["headlines"]:
-                                headline_to_process = feed_cache["latest_news"]["headlines"].pop(0)
-                                full_article = section_configs["latest_news"]["create_article_func"](headline_to_process, [], gemini_key)
-                                if full_article:
-                                    category_key = full_article.get('category', 'General').lower().replace(' ', '-')
-                                    full_article['category_color'] = CATEGORY_COLORS.get(category_key, DEFAULT_CATEGORY_COLOR)
-                                    ARTICLE_CACHE[full_article['id']] = full_article
-                                    feed_cache["latest_news"]["full_articles"].append(full_article)
-                                    feed_cache["latest_news"]["timestamp"] = time.time()
-                                    print(f"DEBUG: Initial: Added full article to latest_news. Total: {len(feed_cache['latest_news']['full_articles'])}")
-                                time.sleep(API_CALL_DELAY)
-                            else:
-                                print("WARNING: Initial: Not enough headlines for latest_news to generate 3 articles.")
-                                break
-                        with worker_state_lock: worker_state["current_generation_step"] += 1
-                        task_processed_in_this_loop = True
-
-                    elif current_step == 2: # Generate 15 headlines for misconceptions
-                        print("DEBUG: Initial: Generating 15 headlines for general_misconceptions.")
-                        new_headlines_response = section_configs["general_misconceptions"]["get_headlines_func"](gemini_key, count=MAX_HEADLINES_TO_GENERATE_AT_ONCE)
-                        if isinstance(new_headlines_response, list):
-                            feed_cache["general_misconceptions"]["headlines"].extend(new_headlines_response)
-                            print(f"DEBUG: Initial: Added {len(new_headlines_response)} headlines to general_misconceptions. Total: {len(feed_cache['general_misconceptions']['headlines'])}")
-                        else:
-                            print(f"ERROR: Initial: Failed to get headlines for general_misconceptions: {new_headlines_response.get('error', 'Unknown error')}")
-                        with worker_state_lock: worker_state["current_generation_step"] += 1
-                        task_processed_in_this_loop = True
-                        time.sleep(API_CALL_DELAY)
-                        
-                    elif current_step == 3: # Generate 3 articles for misconceptions
-                        print("DEBUG: Initial: Generating 3 articles for general_misconceptions.")
-                        for _ in range(3):
-                            if feed_cache["general_misconceptions"]["headlines"]:
-                                headline_to_process = feed_cache["general_misconceptions"]["headlines"].pop(0)
-                                full_article = section_configs["general_misconceptions"]["create_article_func"](headline_to_process, gemini_key)
-                                if full_article:
-                                    category_key = full_article.get('category', 'General').lower().replace(' ', '-')
-                                    full_article['category_color'] = CATEGORY_COLORS.get(category_key, DEFAULT_CATEGORY_COLOR)
-                                    ARTICLE_CACHE[full_article['id']] = full_article
-                                    feed_cache["general_misconceptions"]["full_articles"].append(full_article)
-                                    feed_cache["general_misconceptions"]["timestamp"] = time.time()
-                                    print(f"DEBUG: Initial: Added full article to general_misconceptions. Total: {len(feed_cache['general_misconceptions']['full_articles'])}")
-                                time.sleep(API_CALL_DELAY)
-                            else:
-                                print("WARNING: Initial: Not enough headlines for general_misconceptions to generate 3 articles.")
-                                break
-                        with worker_state_lock: worker_state["current_generation_step"] += 1
-                        task_processed_in_this_loop = True
-
-                    elif current_step == 4: # Generate 15 headlines for issues
-                        print("DEBUG: Initial: Generating 15 headlines for important_issues.")
-                        new_headlines_response = section_configs["important_issues"]["get_headlines_func"](gemini_key, count=MAX_HEADLINES_TO_GENERATE_AT_ONCE)
-                        if isinstance(new_headlines_response, list):
-                            feed_cache["important_issues"]["headlines"].extend(new_headlines_response)
-                            print(f"DEBUG: Initial: Added {len(new_headlines_response)} headlines to important_issues. Total: {len(feed_cache['important_issues']['headlines'])}")
-                        else:
-                            print(f"ERROR: Initial: Failed to get headlines for important_issues: {new_headlines_response.get('error', 'Unknown error')}")
-                        with worker_state_lock: worker_state["current_generation_step"] += 1
-                        task_processed_in_this_loop = True
-                        time.sleep(API_CALL_DELAY)
-                        
-                    elif current_step == 5: # Generate 3 articles for issues
-                        print("DEBUG: Initial: Generating 3 articles for important_issues.")
-                        for _ in range(3):
-                            if feed_cache["important_issues"]["headlines"]:
-                                headline_to_process = feed_cache["important_issues"]["headlines"].pop(0)
-                                full_article = section_configs["important_issues"]["create_article_func"](headline_to_process, gemini_key)
-                                if full_article:
-                                    category_key = full_article.get('category', 'General').lower().replace(' ', '-')
-                                    full_article['category_color'] = CATEGORY_COLORS.get(category_key, DEFAULT_CATEGORY_COLOR)
-                                    ARTICLE_CACHE[full_article['id']] = full_article
-                                    feed_cache["important_issues"]["full_articles"].append(full_article)
-                                    feed_cache["important_issues"]["timestamp"] = time.time()
-                                    print(f"DEBUG: Initial: Added full article to important_issues. Total: {len(feed_cache['important_issues']['full_articles'])}")
-                                time.sleep(API_CALL_DELAY)
-                            else:
-                                print("WARNING: Initial: Not enough headlines for important_issues to generate 3 articles.")
-                                break
-                        with worker_state_lock: worker_state["current_generation_step"] += 1
-                        task_processed_in_this_loop = True
-
-                    elif current_step == 6: # Check if initial generation is complete and set flag
-                        all_sections_met_initial_target = True
-                        for section in section_configs:
-                            if len(feed_cache[section]["full_articles"]) < section_configs[section]["initial_articles_target"]:
-                                all_sections_met_initial_target = False
-                                break
-                        
-                        with worker_state_lock:
-                            worker_state["initial_generation_complete"] = all_sections_met_initial_target
-                            if all_sections_met_initial_target:
-                                print("DEBUG: All initial article generation complete. Resetting step and transitioning.")
-                                worker_state["current_generation_step"] = 0
-                            else:
-                                print("DEBUG: Initial generation not yet complete. Looping back to step 0.")
-                                worker_state["current_generation_step"] = 0
-                            worker_state["last_sequence_execution_time"] = time.time()
-                        task_processed_in_this_loop = True
-                        time.sleep(5)
-
-                if task_processed_in_this_loop:
-                    continue
+def plan_section(sec_name, gemini_key, news_key):
+    """
+    Schedules whatever the section needs next: article batches for queued headlines, or a
+    headline fetch once the queue runs dry. Headlines are claimed here so concurrent tasks
+    never generate the same one, and nothing is scheduled past MAX_ARTICLES_PER_SECTION.
+    """
+    if feed_scheduler is None or not feed_scheduler.is_running():
+        return
+    config = section_configs[sec_name]
+    with cache_lock:
+        section = feed_cache[sec_name]
+        state = generation_state[sec_name]
+        article_count = feed_store.section_size(sec_name)
+        priority = PRIORITY_INITIAL_FILL if article_count < config["initial_articles_target"] else PRIORITY_FILL
+        missing = MAX_ARTICLES_PER_SECTION - article_count - state["claimed"]
+
+        batches = []
+        while missing > 0 and section["headlines"]:
+            take = min(ARTICLE_GENERATION_BATCH_SIZE, missing, len(section["headlines"]))
+            batches.append(section["headlines"][:take])
+            del section["headlines"][:take]
+            state["claimed"] += take
+            missing -= take
+
+        fetch_headlines = missing > 0 and not section["headlines"] and not state["fetching"]
+        if fetch_headlines:
+            state["fetching"] = True
+
+    budgets = section_budgets(sec_name, gemini_key, news_key)
+    for batch in batches:
+        schedule_feed_task(
+            f"generate:{sec_name}", generate_section_articles_task, sec_name, batch, gemini_key, news_key,
+            priority=priority, budgets=[("gemini", gemini_key)]
+        )
+    if fetch_headlines:
+        schedule_feed_task(
+            f"headlines:{sec_name}", fetch_section_headlines_task, sec_name, gemini_key, news_key,
+            priority=priority, budgets=budgets
+        )
 
+def fetch_section_headlines_task(sec_name, gemini_key, news_key):
+    config = section_configs[sec_name]
+    get_headlines_func = config["get_headlines_func"]
+    print(f"DEBUG: Background: Fetching {MAX_HEADLINES_TO_GENERATE_AT_ONCE} headlines for {sec_name}.")
+    try:
+        if config["needs_news_key"]:
+            new_headlines_response = get_headlines_func(gemini_key, news_key, count=MAX_HEADLINES_TO_GENERATE_AT_ONCE)
+        else:
+            new_headlines_response = get_headlines_func(gemini_key, count=MAX_HEADLINES_TO_GENERATE_AT_ONCE)
+    except RateLimitExceeded:
+        raise  # The scheduler defers the task with its arguments (and claims) intact
+    except Exception as e:
+        new_headlines_response = {"error": str(e)}
+
+    if not isinstance(new_headlines_response, list) or not new_headlines_response:
+        error = new_headlines_response.get('error', 'Unknown error') if isinstance(new_headlines_response, dict) else 'No headlines returned'
+        print(f"ERROR: Background: Failed to get headlines for {sec_name}: {error}. Retrying in {FEED_RETRY_DELAY_SECONDS} seconds.")
+        schedule_feed_task(
+            f"retry_headlines:{sec_name}", retry_section_task, sec_name, gemini_key, news_key,
+            priority=PRIORITY_REFRESH, delay=FEED_RETRY_DELAY_SECONDS
+        )
+        return
 
-            # --- Creation Sequence ---
-            needs_creation_sequence = False
-            with cache_lock:
-                if initial_complete and not refresh_active:
-                    for sec_name in section_configs:
-                        if len(feed_cache[sec_name]["full_articles"]) < MAX_ARTICLES_PER_SECTION:
-                            needs_creation_sequence = True
-                            break
-            
-            if needs_creation_sequence:
-                with worker_state_lock:
-                    worker_state["creation_sequence_active"] = True
-
-                print(f"DEBUG: Creation Sequence - Step {current_step}")
-                with cache_lock:
-                    if current_step > 0 and current_time - last_exec_time < 60:
-                        remaining_wait = 60 - (current_time - last_exec_time)
-                        print(f"DEBUG: Creation: Waiting for {remaining_wait:.2f} seconds for 1-minute interval.")
-                        time.sleep(remaining_wait)
-                        continue
-
-                    if current_step < 2:
-                        articles_to_generate = 5
-                        for sec_name in section_configs:
-                            for _ in range(articles_to_generate):
-                                if len(feed_cache[sec_name]["full_articles"]) >= MAX_ARTICLES_PER_SECTION:
-                                    print(f"DEBUG: Creation: {sec_name} already has MAX_ARTICLES_PER_SECTION. Skipping.")
-                                    continue
-
-                                if feed_cache[sec_name]["headlines"]:
-                                    headline_to_process = feed_cache[sec_name]["headlines"].pop(0)
-                                    create_func = section_configs[sec_name]["create_article_func"]
-                                    if sec_name == "latest_news":
-                                        full_article = create_func(headline_to_process, [], gemini_key)
-                                    else:
-                                        full_article = create_func(headline_to_process, gemini_key)
-
-                                    if full_article:
-                                        category_key = full_article.get('category', 'General').lower().replace(' ', '-')
-                                        full_article['category_color'] = CATEGORY_COLORS.get(category_key, DEFAULT_CATEGORY_COLOR)
-                                        ARTICLE_CACHE[full_article['id']] = full_article
-                                        feed_cache[sec_name]["full_articles"].append(full_article)
-                                        feed_cache[sec_name]["timestamp"] = time.time()
-                                        print(f"DEBUG: Creation: Added full article to {sec_name}. Total: {len(feed_cache[sec_name]['full_articles'])}")
-                                    time.sleep(API_CALL_DELAY)
-                                else:
-                                    print(f"WARNING: Creation: Not enough headlines for {sec_name} to generate {articles_to_generate} articles. Re-fetching headlines...")
-                                    get_headlines_func = section_configs[sec_name]["get_headlines_func"]
-                                    if section_configs[sec_name]["needs_news_key"]:
-                                        new_headlines_response = get_headlines_func(gemini_key, news_key, count=5)
-                                    else:
-                                        new_headlines_response = get_headlines_func(gemini_key, count=5)
-                                    if isinstance(new_headlines_response, list):
-                                        feed_cache[sec_name]["headlines"].extend(new_headlines_response)
-                                        print(f"DEBUG: Creation: Added {len(new_headlines_response)} new headlines for {sec_name}.")
-                                    else:
-                                        print(f"ERROR: Creation: Failed to fetch more headlines for {sec_name}: {new_headlines_response.get('error', 'Unknown error')}")
-                        with worker_state_lock:
-                            worker_state["current_generation_step"] += 1
-                            worker_state["last_sequence_execution_time"] = time.time()
-                        task_processed_in_this_loop = True
-                        
-                    elif current_step == 2:
-                        articles_to_generate = 2
-                        for sec_name in section_configs:
-                            for _ in range(articles_to_generate):
-                                if len(feed_cache[sec_name]["full_articles"]) >= MAX_ARTICLES_PER_SECTION:
-                                    print(f"DEBUG: Creation: {sec_name} already has MAX_ARTICLES_PER_SECTION. Skipping.")
-                                    continue
-
-                                if feed_cache[sec_name]["headlines"]:
-                                    headline_to_process = feed_cache[sec_name]["headlines"].pop(0)
-                                    create_func = section_configs[sec_name]["create_article_func"]
-                                    if sec_name == "latest_news":
-                                        full_article = create_func(headline_to_process, [], gemini_key)
-                                    else:
-                                        full_article = create_func(headline_to_process, gemini_key)
-
-                                    if full_article:
-                                        category_key = full_article.get('category', 'General').lower().replace(' ', '-')
-                                        full_article['category_color'] = CATEGORY_COLORS.get(category_key, DEFAULT_CATEGORY_COLOR)
-                                        ARTICLE_CACHE[full_article['id']] = full_article
-                                        feed_cache[sec_name]["full_articles"].append(full_article)
-                                        feed_cache[sec_name]["timestamp"] = time.time()
-                                        print(f"DEBUG: Creation: Added full article to {sec_name}. Total: {len(feed_cache[sec_name]['full_articles'])}")
-                                    time.sleep(API_CALL_DELAY)
-                                else:
-                                    print(f"WARNING: Creation: Not enough headlines for {sec_name} to generate {articles_to_generate} articles. Re-fetching headlines...")
-                                    get_headlines_func = section_configs[sec_name]["get_headlines_func"]
-                                    if section_configs[sec_name]["needs_news_key"]:
-                                        new_headlines_response = get_headlines_func(gemini_key, news_key, count=5)
-                                    else:
-                                        new_headlines_response = get_headlines_func(gemini_key, count=5)
-                                    if isinstance(new_headlines_response, list):
-                                        feed_cache[sec_name]["headlines"].extend(new_headlines_response)
-                                        print(f"DEBUG: Creation: Added {len(new_headlines_response)} new headlines for {sec_name}.")
-                                    else:
-                                        print(f"ERROR: Creation: Failed to fetch more headlines for {sec_name}: {new_headlines_response.get('error', 'Unknown error')}")
-                        with worker_state_lock:
-                            worker_state["current_generation_step"] += 1
-                            worker_state["last_sequence_execution_time"] = time.time()
-                        task_processed_in_this_loop = True
-
-                    elif current_step == 3:
-                        for sec_name in section_configs:
-                            print(f"DEBUG: Creation: Generating 15 headlines for {sec_name}.")
-                            get_headlines_func = section_configs[sec_name]["get_headlines_func"]
-                            if section_configs[sec_name]["needs_news_key"]:
-                                new_headlines_response = get_headlines_func(gemini_key, news_key, count=MAX_HEADLINES_TO_GENERATE_AT_ONCE)
-                            else:
-                                new_headlines_response = get_headlines_func(gemini_key, count=MAX_HEADLINES_TO_GENERATE_AT_ONCE)
-                            if isinstance(new_headlines_response, list):
-                                feed_cache[sec_name]["headlines"].extend(new_headlines_response)
-                                print(f"DEBUG: Creation: Added {len(new_headlines_response)} headlines to {sec_name}. Total: {len(feed_cache[sec_name]['headlines'])}")
-                            else:
-                                print(f"ERROR: Creation: Failed to get headlines for {sec_name}: {new_headlines_response.get('error', 'Unknown error')}")
-                            time.sleep(API_CALL_DELAY)
-                        with worker_state_lock:
-                            worker_state["current_generation_step"] += 1
-                            worker_state["last_sequence_execution_time"] = time.time()
-                        task_processed_in_this_loop = True
-
-                    elif current_step == 4:
-                        print("DEBUG: Creation Sequence Complete. Waiting 1 minute.")
-                        with worker_state_lock:
-                            worker_state["creation_sequence_active"] = False
-                            worker_state["current_generation_step"] = 0
-                            worker_state["last_sequence_execution_time"] = time.time()
-                        task_processed_in_this_loop = True
-                        time.sleep(60)
-                        
-                if task_processed_in_this_loop:
-                    continue
+    with cache_lock:
+        section = feed_cache[sec_name]
+        known_titles = set(section["headlines"]) | {a.get("title") for a in feed_store.current().sections[sec_name]}
+        fresh_headlines = [h for h in new_headlines_response if h not in known_titles]
+        section["headlines"].extend(fresh_headlines)
+        generation_state[sec_name]["fetching"] = False
+        article_store.set_headline_queue(sec_name, section["headlines"])
+        print(f"DEBUG: Background: Added {len(fresh_headlines)} headlines to {sec_name}. Total: {len(section['headlines'])}")
+    plan_section(sec_name, gemini_key, news_key)
+
+def retry_section_task(sec_name, gemini_key, news_key):
+    with cache_lock:
+        generation_state[sec_name]["fetching"] = False
+    plan_section(sec_name, gemini_key, news_key)
 
+def generate_section_articles_task(sec_name, headlines, gemini_key, news_key):
+    config = section_configs[sec_name]
+    try:
+        if len(headlines) > 1:
+            full_articles = config["create_articles_batch_func"](headlines, gemini_key)
+        elif sec_name == "latest_news":
+            full_articles = [config["create_article_func"](headlines[0], [], gemini_key)]
+        else:
+            full_articles = [config["create_article_func"](headlines[0], gemini_key)]
+    except RateLimitExceeded:
+        raise  # The scheduler defers the task with its arguments (and claims) intact
+    except Exception as e:
+        print(f"ERROR: Background: Article generation for {sec_name} failed: {e}")
+        full_articles = [None] * len(headlines)
 
-            # --- Refresh Sequence ---
-            needs_refresh_sequence = False
-            with worker_state_lock:
-                if user_requested_refresh or (initial_complete and not creation_active and not refresh_active and current_time - last_exec_time >= 60):
-                    needs_refresh_sequence = True
-                    worker_state["user_requested_more"] = False
-                    worker_state["refresh_sequence_active"] = True
-                    worker_state["current_generation_step"] = 0
-
-            if needs_refresh_sequence:
-                print(f"DEBUG: Refresh Sequence - Step {current_step}")
-                with cache_lock:
-                    if current_step > 0 and current_time - last_exec_time < 60:
-                        remaining_wait = 60 - (current_time - last_exec_time)
-                        print(f"DEBUG: Refresh: Waiting for {remaining_wait:.2f} seconds for 1-minute interval.")
-                        time.sleep(remaining_wait)
-                        continue
-
-                    if current_step < 3:
-                        articles_to_generate = 5
-                        for sec_name in section_configs:
-                            for _ in range(articles_to_generate):
-                                if len(feed_cache[sec_name]["full_articles"]) >= MAX_ARTICLES_PER_SECTION:
-                                    print(f"DEBUG: Refresh: {sec_name} already has MAX_ARTICLES_PER_SECTION. Skipping.")
-                                    continue
-
-                                if feed_cache[sec_name]["headlines"]:
-                                    headline_to_process = feed_cache[sec_name]["headlines"].pop(0)
-                                    create_func = section_configs[sec_name]["create_article_func"]
-                                    if sec_name == "latest_news":
-                                        full_article = create_func(headline_to_process, [], gemini_key)
-                                    else:
-                                        full_article = create_func(headline_to_process, gemini_key)
-
-                                    if full_article:
-                                        category_key = full_article.get('category', 'General').lower().replace(' ', '-')
-                                        full_article['category_color'] = CATEGORY_COLORS.get(category_key, DEFAULT_CATEGORY_COLOR)
-                                        ARTICLE_CACHE[full_article['id']] = full_article
-                                        feed_cache[sec_name]["full_articles"].append(full_article)
-                                        feed_cache[sec_name]["timestamp"] = time.time()
-                                        print(f"DEBUG: Refresh: Added full article to {sec_name}. Total: {len(feed_cache[sec_name]['full_articles'])}")
-                                    time.sleep(API_CALL_DELAY)
-                                else:
-                                    print(f"WARNING: Refresh: Not enough headlines for {sec_name} to generate {articles_to_generate} articles. Re-fetching headlines...")
-                                    get_headlines_func = section_configs[sec_name]["get_headlines_func"]
-                                    if section_configs[sec_name]["needs_news_key"]:
-                                        new_headlines_response = get_headlines_func(gemini_key, news_key, count=5)
-                                    else:
-                                        new_headlines_response = get_headlines_func(gemini_key, count=5)
-                                    if isinstance(new_headlines_response, list):
-                                        feed_cache[sec_name]["headlines"].extend(new_headlines_response)
-                                        print(f"DEBUG: Refresh: Added {len(new_headlines_response)} new headlines for {sec_name}.")
-                                    else:
-                                        print(f"ERROR: Refresh: Failed to fetch more headlines for {sec_name}: {new_headlines_response.get('error', 'Unknown error')}")
-                        with worker_state_lock:
-                            worker_state["current_generation_step"] += 1
-                            worker_state["last_sequence_execution_time"] = time.time()
-                        task_processed_in_this_loop = True
-                        
-                    elif current_step == 3:
-                        for sec_name in section_configs:
-                            print(f"DEBUG: Refresh: Generating 15 headlines for {sec_name}.")
-                            get_headlines_func = section_configs[sec_name]["get_headlines_func"]
-                            if section_configs[sec_name]["needs_news_key"]:
-                                new_headlines_response = get_headlines_func(gemini_key, news_key, count=MAX_HEADLINES_TO_GENERATE_AT_ONCE)
-                            else:
-                                new_headlines_response = get_headlines_func(gemini_key, count=MAX_HEADLINES_TO_GENERATE_AT_ONCE)
-                            if isinstance(new_headlines_response, list):
-                                feed_cache[sec_name]["headlines"].extend(new_headlines_response)
-                                print(f"DEBUG: Refresh: Added {len(new_headlines_response)} headlines to {sec_name}. Total: {len(feed_cache[sec_name]['headlines'])}")
-                            else:
-                                print(f"ERROR: Refresh: Failed to get headlines for {sec_name}: {new_headlines_response.get('error', 'Unknown error')}")
-                            time.sleep(API_CALL_DELAY)
-                        with worker_state_lock:
-                            worker_state["current_generation_step"] += 1
-                            worker_state["last_sequence_execution_time"] = time.time()
-                        task_processed_in_this_loop = True
-
-                    elif current_step == 4:
-                        print("DEBUG: Refresh Sequence Complete. Waiting for next refresh.")
-                        with worker_state_lock:
-                            worker_state["refresh_sequence_active"] = False
-                            worker_state["current_generation_step"] = 0
-                            worker_state["last_sequence_execution_time"] = time.time()
-                        task_processed_in_this_loop = True
-                        
-                if task_processed_in_this_loop:
-                    continue
+    new_articles = []
+    with cache_lock:
+        section = feed_cache[sec_name]
+        for headline, full_article in zip(headlines, full_articles):
+            if full_article:
+                category_key = full_article.get('category', 'General').lower().replace(' ', '-')
+                full_article['category_color'] = CATEGORY_COLORS.get(category_key, DEFAULT_CATEGORY_COLOR)
+                ARTICLE_CACHE.put(full_article)  # Written through to article_store below
+                new_articles.append(full_article)
+                headline_attempts.pop(headline, None)
+            else:
+                # Partial failure: give the headline another chance in a later batch.
+                headline_attempts[headline] = headline_attempts.get(headline, 0) + 1
+                if headline_attempts[headline] < MAX_HEADLINE_ATTEMPTS:
+                    section["headlines"].append(headline)
+                else:
+                    print(f"WARNING: Background: Dropping headline '{headline}' after {MAX_HEADLINE_ATTEMPTS} failed attempts.")
+                    headline_attempts.pop(headline, None)
+        # Commit the new version before any client can see it: the feed instance id survives restarts, so a
+        # version that was published but lost in a crash would be reused with different articles (and ETags).
+        version = feed_store.current().version + 1 if new_articles else None
+        article_store.put_articles(new_articles)
+        article_store.append_to_section(sec_name, [a['id'] for a in new_articles], version=version)
+        article_store.set_headline_queue(sec_name, section["headlines"])
+        article_store.set_state("headline_attempts", dict(headline_attempts))
+        if new_articles:
+            article_store.flush()
+        # Publish before releasing the claim so the planner never sees the batch as missing.
+        snapshot = feed_store.append_articles(sec_name, new_articles, version)
+        # Clamped: a task still running when its scheduler stopped finishes after restore_generator_progress()
+        generation_state[sec_name]["claimed"] = max(0, generation_state[sec_name]["claimed"] - len(headlines))
+        print(f"DEBUG: Background: {sec_name} now has {feed_store.section_size(sec_name)} articles.")
+    update_initial_generation_complete()
+
+    if not any(full_articles):
+        # Nothing succeeded (upstream trouble): back off before planning more work for this section.
+        schedule_feed_task(
+            f"retry_generate:{sec_name}", plan_section, sec_name, gemini_key, news_key,
+            priority=PRIORITY_REFRESH, delay=FEED_RETRY_DELAY_SECONDS
+        )
+    else:
+        plan_section(sec_name, gemini_key, news_key)
 
-            with worker_state_lock:
-                initial_complete = worker_state["initial_generation_complete"]
-                creation_active = worker_state["creation_sequence_active"]
-                refresh_active = worker_state["refresh_sequence_active"]
+def refresh_feed_task(gemini_key, news_key):
+    """Periodic re-plan of every section; reschedules itself."""
+    with worker_state_lock:
+        worker_state["last_refresh_time"] = time.time()
+    article_store.set_state("last_refresh_time", worker_state["last_refresh_time"])
+    for sec_name in section_configs:
+        plan_section(sec_name, gemini_key, news_key)
+    schedule_feed_task(
+        "refresh", refresh_feed_task, gemini_key, news_key,
+        priority=PRIORITY_REFRESH, delay=FEED_REFRESH_INTERVAL_SECONDS
+    )
+
+def request_feed_refresh():
+    """Called when a user asks for more stories: re-plans every section right away."""
+    if feed_scheduler is None or not feed_scheduler.is_running():
+        return
+    for sec_name in section_configs:
+        plan_section(sec_name, *feed_generation_keys)
+
+def restore_generator_progress(saved):
+    """
+    Restores headline queues and worker progress from an article_store.load() result. Claims and
+    headline fetches belonged to tasks of a stopped scheduler, so they are cleared; the claimed
+    headlines are back in the restored queues.
+    """
+    with cache_lock:
+        for sec_name in section_configs:
+            feed_cache[sec_name]["headlines"] = saved["headlines"].get(sec_name, [])
+            generation_state[sec_name] = {"claimed": 0, "fetching": False}
+        headline_attempts.clear()
+        headline_attempts.update(saved["state"].get("headline_attempts", {}))
+    with worker_state_lock:
+        worker_state["last_refresh_time"] = saved["state"].get("last_refresh_time", 0)
+
+def warm_load_feed():
+    """Restores articles, feed sections, headline queues and worker progress from the article store."""
+    saved = article_store.load()
+    # Shared by every process using the store, so their versions and ETags agree
+    instance_id = article_store.get_or_create_state("feed_instance", feed_store.instance_id)
+    for article in saved["articles"].values():
+        ARTICLE_CACHE.put(article)
+    sections = {
+        sec_name: [saved["articles"][article_id] for article_id in saved["sections"].get(sec_name, []) if article_id in saved["articles"]]
+        for sec_name in section_configs
+    }
+    with feed_sync_lock:
+        feed_store.restore(sections, saved["version"], instance_id)
+    restore_generator_progress(saved)
+    update_initial_generation_complete()
+    if saved["articles"]:
+        print(f"DEBUG: Warm-loaded {len(saved['articles'])} articles (feed version {saved['version']}) from {article_store.db_path} "
+              f"({', '.join(f'{sec}: {len(articles)}' for sec, articles in sections.items())}).")
+
+def sync_feed_from_store():
+    """Replica side of FEED_SHARED_STORE: publishes every feed version the leader has persisted since ours."""
+    with feed_sync_lock:
+        for version, appends in article_store.load_section_changes(feed_store.current().version):
+            if version <= feed_store.current().version:
+                continue  # Already published here (we were the leader)
+            for articles in appends.values():
+                for article in articles:
+                    ARTICLE_CACHE.put(article)
+            feed_store.append(appends, version)
+    update_initial_generation_complete()
+
+def feed_sync_loop():
+    while not feed_sync_stop.wait(FEED_SYNC_INTERVAL_SECONDS):
+        if feed_leader is not None and feed_leader.is_leader:
+            continue
+        try:
+            sync_feed_from_store()
+        except Exception as e:
+            print(f"ERROR: Feed sync from the shared store failed: {e}")
 
-            if initial_complete and not creation_active and not refresh_active:
-                print("DEBUG: Background: All sequences complete. Sleeping longer, waiting for refresh trigger.")
-                time.sleep(30)
-                continue
+def become_feed_leader(gemini_key, news_key):
+    # Catch up with whatever the previous leader published before generating more.
+    sync_feed_from_store()
+    restore_generator_progress(article_store.load())
+    start_background_generation(gemini_key, news_key)
 
-            if not task_processed_in_this_loop:
-                print("DEBUG: Background: No specific sequence task processed this loop. Sleeping normally.")
-                time.sleep(API_CALL_DELAY)
+def step_down_as_feed_leader():
+    stop_background_generation()
+    article_store.flush()  # Hand everything generated so far to the next leader
 
-        except Exception as e:
-            print(f"CRITICAL ERROR in background generation worker main loop: {e}")
-            traceback.print_exc()
-            if "429 RESOURCE_EXHAUSTED" in str(e):
-                last_429_error_time = time.time()
-                print(f"DEBUG: Background: Encountered 429. Initiating backoff for {BACKOFF_DURATION_ON_429} seconds.")
-            time.sleep(10)
+def start_feed_services(gemini_key, news_key):
+    """
+    Warm-loads the feed, then either runs the generator in this process or, with FEED_SHARED_STORE,
+    joins the leader election: the elected process generates and every other process follows the
+    shared article store.
+    """
+    global feed_leader, feed_sync_thread
+    if article_store.enabled or feed_store.current().version == 0:
+        # Without a store, a restart keeps the in-memory feed rather than restoring an empty one over it
+        warm_load_feed()
+    if FEED_SHARED_STORE:
+        if not article_store.enabled:
+            print("ERROR: FEED_SHARED_STORE requires ARTICLE_STORE_PATH. Serving this process's feed only.")
+            return
+        feed_sync_thread = threading.Thread(target=feed_sync_loop, name="feed_sync", daemon=True)
+        feed_sync_thread.start()
+        if not (gemini_key and news_key):
+            print("WARNING: Missing API keys: following the shared feed without standing for leader election.")
+            return
+        feed_leader = LeaderElection(
+            ARTICLE_STORE_PATH, "feed_generator",
+            on_elected=lambda: become_feed_leader(gemini_key, news_key),
+            on_demoted=step_down_as_feed_leader
+        )
+        feed_leader.start()
+        atexit.register(feed_leader.stop)
+    elif gemini_key and news_key:
+        start_background_generation(gemini_key, news_key)
+        print("DEBUG: Background generation worker started on app startup.")
+    else:
+        print("WARNING: Background generation worker not started due to missing API keys.")
 
-    print("DEBUG: Background article generation worker stopped.")"""
+def start_background_generation(gemini_key, news_key):
+    global feed_scheduler, feed_generation_keys
+    if feed_scheduler is not None and feed_scheduler.is_running():
+        return feed_scheduler
+    feed_generation_keys = (gemini_key, news_key)
+    feed_scheduler = JobScheduler("feed_generator", FEED_WORKER_THREADS, traffic_class=rate_limit.BACKGROUND)
+    feed_scheduler.start()
+    feed_scheduler.schedule("refresh", refresh_feed_task, gemini_key, news_key, priority=PRIORITY_INITIAL_FILL)
+    return feed_scheduler
+
+def stop_background_generation():
+    global feed_scheduler
+    if feed_scheduler is not None:
+        feed_scheduler.stop()
+        feed_scheduler = None
+    with cache_lock:
+        # Claims and headline fetches belonged to the dropped tasks
+        for sec_name in section_configs:
+            generation_state[sec_name] = {"claimed": 0, "fetching": False}
 
 
 # --- Main Page Routes ---
 
-@app.route('/')
+@routes.route('/')
 def home():
     """Serves the Home page (Saved Articles & Learn Progress)."""
     return render_template('home.html')
 
-@app.route('/feed')
+@routes.route('/feed')
 def feed():
     """Serves the News Feed page."""
     return render_template('feed.html')
 
-@app.route('/search')
+@routes.route('/search')
 def search():
     """Serves the Search page."""
     return render_template('search.html')
 
-@app.route('/learn')
+@routes.route('/learn')
 def learn():
     return render_template('learn.html')
 
 # --- New Route for Full Article Display ---
-@app.route('/article/<article_id>')
+@routes.route('/article/<article_id>')
 def article_detail(article_id):
     article = ARTICLE_CACHE.get(article_id)
     if not article:
         return render_template('error.html', message="Article not found or has expired."), 404
     
-    # Add category_color to the article before passing to template
+    # Add category_color to a copy: cached articles are shared with feed snapshots and must not be mutated
     category_key = article.get('category', 'General').lower().replace(' ', '-')
-    article['category_color'] = CATEGORY_COLORS.get(category_key, DEFAULT_CATEGORY_COLOR)
+    article = {**article, 'category_color': CATEGORY_COLORS.get(category_key, DEFAULT_CATEGORY_COLOR)}
     
     # MODIFIED: Determine back link and text based on referrer
     referrer = request.referrer
     if referrer and '/search' in referrer:
-        back_link = url_for('search')
+        back_link = url_for('main.search')
         back_text = "Search"
     else:
-        back_link = url_for('feed')
+        back_link = url_for('main.feed')
         back_text = "Feed"
 
     return render_template('article_detail.html', article=article, back_link=back_link, back_text=back_text)
 
-@app.route('/learn/<path:article_id>')
+@routes.route('/learn/<path:article_id>')
 def learn_article_detail(article_id):
     article_data = None
     for unit_name, unit_info in knowledge_articles.items():
@@ -578,10 +552,10 @@ def learn_article_detail(article_id):
     if not article_data:
         return "Article not found", 404
     # Pass the correct back_link for Knowledge Hub
-    return render_template('learn_article_detail.html', article=article_data, back_link=url_for('learn'))
+    return render_template('learn_article_detail.html', article=article_data, back_link=url_for('main.learn'))
 # --- API Endpoints ---
 
-@app.route('/api/get_feed_articles', methods=['GET'])
+@routes.route('/api/get_feed_articles', methods=['GET'])
 def get_feed_articles_api():
     """
     Fetches and processes news articles for the Feed page.
@@ -596,35 +570,192 @@ def get_feed_articles_api():
     if not news_api_key_to_use or not gemini_api_key_to_use:
         return jsonify({"error": "API keys not provided or configured. Please enter them in your profile settings.", "code": 401}), 401
 
-    with cache_lock:
-        # Filter out None and also any non-dict objects for extra safety
-        response_data = {
-            "latest_news": [a for a in feed_cache["latest_news"]["full_articles"] if isinstance(a, dict)],
-            "general_misconceptions": [a for a in feed_cache["general_misconceptions"]["full_articles"] if isinstance(a, dict)],
-            "important_issues": [a for a in feed_cache["important_issues"]["full_articles"] if isinstance(a, dict)]
-        }
-    # Debug: Print the lengths and maybe a sample title
-    print("DEBUG: Returning articles to frontend:")
-    print("  latest_news:", len(response_data["latest_news"]), 
-          [a.get("title") for a in response_data["latest_news"][:2]])
-    print("  general_misconceptions:", len(response_data["general_misconceptions"]), 
-          [a.get("title") for a in response_data["general_misconceptions"][:2]])
-    print("  important_issues:", len(response_data["important_issues"]), 
-          [a.get("title") for a in response_data["important_issues"][:2]])
-        
     if request.args.get('refresh') == 'true':
-        with worker_state_lock:
-            worker_state["user_requested_more"] = True
-            print(f"DEBUG: get_feed_articles_api: User requested refresh. Setting user_requested_more=True.")
+        print("DEBUG: get_feed_articles_api: User requested refresh. Re-planning feed generation.")
+        request_feed_refresh()
+
+    # Lock-free read of the current immutable snapshot
+    snapshot = feed_store.current()
+    # fields=card serves the slim card projection; section/cursor/limit select one page of one section
+    fields = request.args.get('fields', 'full')
+    section_param = request.args.get('section')
+    cursor = request.args.get('cursor', 0, type=int)
+    limit = request.args.get('limit', type=int)
+    if fields not in ('full', 'card'):
+        return jsonify({"error": "'fields' must be 'full' or 'card'.", "code": 400}), 400
+    if section_param is not None and section_param not in snapshot.sections:
+        return jsonify({"error": f"Unknown feed section '{section_param}'.", "code": 400}), 400
+    if cursor < 0 or (limit is not None and limit < 1):
+        return jsonify({"error": "'cursor' and 'limit' must be positive integers.", "code": 400}), 400
+    if limit is None and (fields == 'card' or section_param is not None):
+        limit = FEED_PAGE_SIZE
+    if limit is not None:
+        limit = min(limit, FEED_MAX_PAGE_SIZE)
+
+    variant = feed_variant(fields, section_param, cursor, limit)
+    for encoding in FEED_ENCODINGS:
+        if request.if_none_match.contains_weak(feed_etag(snapshot, encoding, variant)):
+            # Unchanged since the client's copy of this representation: skip serialization entirely
+            response = Response(status=304)
+            response.set_etag(feed_etag(snapshot, encoding, variant))
+            response.headers['Cache-Control'] = FEED_CACHE_CONTROL
+            response.headers['Vary'] = 'Accept-Encoding'
+            return response
+
+    def build_body(snapshot):
+        meta = {
+            "version": snapshot.version,
+            "instance": feed_store.instance_id,
+            "initial_generation_complete": snapshot.initial_generation_complete
+        }
+        if section_param is not None:
+            items_json, next_cursor = render_page(snapshot, section_param, fields, cursor, limit)
+            return json_object({**meta, "section": section_param, "next_cursor": next_cursor}, {"items": items_json})
+        pages = {}
+        next_cursors = {}
+        for sec_name in snapshot.sections:
+            pages[sec_name], next_cursors[sec_name] = render_page(snapshot, sec_name, fields, 0, limit)
+        return json_object({**meta, "next_cursors": next_cursors}, pages)
+
+    default_limit = None if fields == 'full' else FEED_PAGE_SIZE
+    if section_param is None and limit == default_limit:
+        # Default whole-feed bodies are identical for every client of a version: serialize and compress them once.
+        # Other limits are client-chosen, so they are built per request rather than filling the memo.
+        payloads = feed_store.encoded_payload(snapshot, fields, build_body)
+    else:
+        payloads = {"identity": build_body(snapshot).encode("utf-8")}
+
+    encoding = next((e for e in FEED_ENCODINGS if e in payloads and request.accept_encodings[e]), "identity")
+    response = Response(payloads[encoding], mimetype='application/json')
+    if encoding != "identity":
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.set_etag(feed_etag(snapshot, encoding, variant))
+    response.headers['Cache-Control'] = FEED_CACHE_CONTROL
+    return response
+
+def feed_changes_payload(snapshot, delta):
+    """Shapes a FeedStore.changes_since() result for /api/feed/changes and /api/feed/stream."""
+    payload = {
+        "version": snapshot.version,
+        "instance": feed_store.instance_id,
+        "etag": snapshot.etag,
+        # Deltas carry cards, so a client applying them holds the default card feed of this version
+        "card_etag": feed_etag(snapshot, "identity", feed_variant("card", None, 0, FEED_PAGE_SIZE)),
+        "initial_generation_complete": snapshot.initial_generation_complete,
+        "resync": delta is None
+    }
+    if delta is not None:
+        payload["sections"] = {
+            sec_name: {"added": [article_card(a) for a in changes["added"]], "removed": changes["removed"]}
+            for sec_name, changes in delta.items()
+        }
+    return payload
 
-    with worker_state_lock:
-        response_data["initial_generation_complete"] = worker_state["initial_generation_complete"]
+@routes.route('/api/feed/changes', methods=['GET'])
+def feed_changes_api():
+    """
+    Returns the cards added to and ids removed from each section since feed version `since`.
+    `instance` must match the feed's instance id; otherwise, or when the change log no longer
+    covers `since`, the response has "resync": true and the client must reload the full feed.
+    """
+    since = request.args.get('since', type=int)
+    if since is None or since < 0:
+        return jsonify({"error": "A non-negative integer 'since' version is required.", "code": 400}), 400
+
+    snapshot, delta = feed_store.changes_since(since)
+    if request.args.get('instance') != feed_store.instance_id:
+        delta = None
+    response = jsonify(feed_changes_payload(snapshot, delta))
+    response.headers['Cache-Control'] = 'no-store'
+    return response
 
-    print("DEBUG: Serving feed articles from cache. Background worker will handle generation.")
-    return jsonify(response_data)
 
+def finalize_search_result(result):
+    """Adds the category colour and registers the article for its /article/<id> permalink."""
+    if result:
+        category_key = result.get('category', 'General').lower().replace(' ', '-')
+        result['category_color'] = CATEGORY_COLORS.get(category_key, DEFAULT_CATEGORY_COLOR)
 
-@app.route('/api/search_articles', methods=['GET'])
+    article_store.put_articles([result])
+    ARTICLE_CACHE.put(result)
+    return result
+
+def run_coalesced_search(query, gemini_api_key, news_api_key, rate_limit_wait_seconds=None, on_event=None):
+    """
+    Runs search_debunked through the single-flight group so identical concurrent searches share one run.
+    Only searches made with the same Gemini and NewsAPI keys are coalesced, so nobody's search runs
+    on (or fails with) another user's key. `on_event` gets search_debunked's progress events when
+    this call runs the search; a caller that joins a search already in flight only gets the result.
+    """
+    def run_search():
+        if rate_limit_wait_seconds is None:
+            result = search_debunked(query, gemini_api_key, news_api_key, on_event=on_event)
+        else:
+            with rate_limit.deadline(rate_limit_wait_seconds):
+                result = search_debunked(query, gemini_api_key, news_api_key, on_event=on_event)
+        return finalize_search_result(result)
+
+    flight_key = (
+        f"{rate_limit.key_fingerprint(gemini_api_key)}:{rate_limit.key_fingerprint(news_api_key)}:"
+        f"{normalize_search_query(query)}"
+    )
+    return search_flight.do(flight_key, run_search)
+
+def format_sse(event, data, event_id=None):
+    message = f"event: {event}\ndata: {json.dumps(data)}\n"
+    if event_id is not None:
+        message = f"id: {event_id}\n" + message
+    return message + "\n"
+
+@routes.route('/api/feed/stream', methods=['GET'])
+def feed_stream_api():
+    """
+    Pushes feed updates over Server-Sent Events. Each published version becomes one 'feed_changes'
+    event (same payload as /api/feed/changes) with id '<instance>:<version>', so a reconnecting
+    EventSource resumes from Last-Event-ID. Clients start from `since`/`instance`; a 'resync' event
+    means the client is too far behind (or the server restarted) and must reload the full feed.
+    """
+    if not feed_stream_slots.acquire(blocking=False):
+        response = jsonify({"error": "Too many live feed subscribers. Please refresh manually.", "code": 503})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(FEED_STREAM_RETRY_AFTER_SECONDS)
+        return response
+
+    since = request.args.get('since', type=int)
+    instance = request.args.get('instance')
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    if ':' in last_event_id:
+        instance, _, last_version = last_event_id.rpartition(':')
+        since = int(last_version) if last_version.isdigit() else None
+
+    def generate():
+        last_version = since
+        if last_version is None or instance != feed_store.instance_id or last_version > feed_store.current().version:
+            last_version = None
+        while True:
+            if last_version is None:
+                snapshot, delta = feed_store.current(), None
+            else:
+                snapshot = feed_store.wait_for_version(last_version, SSE_HEARTBEAT_SECONDS)
+                if snapshot.version == last_version:
+                    yield ": keep-alive\n\n"
+                    continue
+                snapshot, delta = feed_store.changes_since(last_version)
+            event = "feed_changes" if delta is not None else "resync"
+            yield format_sse(event, feed_changes_payload(snapshot, delta), event_id=f"{feed_store.instance_id}:{snapshot.version}")
+            last_version = snapshot.version
+
+    response = Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    # Released when the response is closed, even if the stream never started
+    response.call_on_close(feed_stream_slots.release)
+    return response
+
+@routes.route('/api/search_articles', methods=['GET'])
 def search_articles_api():
     query = request.args.get('query')
     if not query:
@@ -640,22 +771,136 @@ def search_articles_api():
         return jsonify({"error": "API keys not provided or configured."}), 401
 
     try:
-        detailed_article_result = search_debunked(query, gemini_api_key_to_use, news_api_key_to_use)
-
-        if detailed_article_result:
-            category_key = detailed_article_result.get('category', 'General').lower().replace(' ', '-')
-            detailed_article_result['category_color'] = CATEGORY_COLORS.get(category_key, DEFAULT_CATEGORY_COLOR)
-
-        article_id = detailed_article_result['id'] 
-        ARTICLE_CACHE[article_id] = detailed_article_result
-
+        detailed_article_result = run_coalesced_search(query, gemini_api_key_to_use, news_api_key_to_use, REQUEST_RATE_LIMIT_WAIT_SECONDS)
         return jsonify({"results": [detailed_article_result]})
+    except RateLimitExceeded as e:
+        print(f"DEBUG: search_articles_api: {e}")
+        return jsonify({"error": "Too many requests", "message": str(e)}), 429, {"Retry-After": str(int(e.retry_after) + 1)}
     except Exception as e:
         print(f"Error performing search in app.py: {e}")
         traceback.print_exc()
         return jsonify({"error": "Failed to perform search", "message": str(e)}), 500
 
-@app.route('/api/chatbot_message', methods=['POST'])
+@routes.route('/api/search_articles/stream', methods=['GET'])
+def search_articles_stream_api():
+    """
+    Streams a search over Server-Sent Events: 'stage' events as the query is classified and
+    sources are found, 'partial_article' events while the article is generated, then a final
+    'result' (same shape as /api/search_articles) or 'error' event. The search runs on the bounded
+    search_jobs pool (429 when it is full) and is coalesced like /api/search_articles.
+    """
+    query = request.args.get('query')
+    if not query:
+        return jsonify({"error": "No search query provided"}), 400
+
+    user_newsapi_key_from_header = request.headers.get('X-User-News-API-Key')
+    news_api_key_to_use = user_newsapi_key_from_header if user_newsapi_key_from_header else NEWSAPI_API_KEY
+
+    user_gemini_api_key_from_header = request.headers.get('X-User-Gemini-API-Key')
+    gemini_api_key_to_use = user_gemini_api_key_from_header if user_gemini_api_key_from_header else GEMINI_API_KEY
+
+    if not news_api_key_to_use or not gemini_api_key_to_use:
+        return jsonify({"error": "API keys not provided or configured."}), 401
+
+    events = queue.Queue()
+    closed = threading.Event()  # Set when the client goes away; the search still finishes for other waiters
+
+    def emit(name, data):
+        if not closed.is_set():
+            events.put((name, data))
+
+    def run_search():
+        try:
+            result = run_coalesced_search(
+                query, gemini_api_key_to_use, news_api_key_to_use, REQUEST_RATE_LIMIT_WAIT_SECONDS, on_event=emit
+            )
+            emit("result", {"results": [result]})
+        except RateLimitExceeded as e:
+            print(f"DEBUG: search_articles_stream_api: {e}")
+            emit("error", {"error": "Too many requests", "message": str(e), "retry_after": e.retry_after})
+            raise
+        except Exception as e:
+            print(f"Error performing streamed search in app.py: {e}")
+            traceback.print_exc()
+            emit("error", {"error": "Failed to perform search", "message": str(e)})
+            raise
+
+    try:
+        search_jobs.submit(run_search, description=query)
+    except JobQueueFull as e:
+        return jsonify({"error": "Too many requests", "message": str(e)}), 429, {"Retry-After": "5"}
+
+    def generate():
+        try:
+            yield format_sse("stage", {"stage": "started", "query": query})
+            while True:
+                try:
+                    name, data = events.get(timeout=SSE_HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_sse(name, data)
+                if name in ("result", "error"):
+                    break
+        finally:
+            closed.set()
+
+    response = Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    response.call_on_close(closed.set)  # Also covers a stream that never started
+    return response
+
+@routes.route('/api/search_jobs', methods=['POST'])
+def create_search_job_api():
+    """
+    Starts a search in the background and returns its job id immediately (202).
+    Poll GET /api/search_jobs/<job_id> for the status and result.
+    """
+    payload = request.get_json(silent=True) or {}
+    query = payload.get('query') or request.args.get('query')
+    if not query:
+        return jsonify({"error": "No search query provided"}), 400
+
+    user_newsapi_key_from_header = request.headers.get('X-User-News-API-Key')
+    news_api_key_to_use = user_newsapi_key_from_header if user_newsapi_key_from_header else NEWSAPI_API_KEY
+
+    user_gemini_api_key_from_header = request.headers.get('X-User-Gemini-API-Key')
+    gemini_api_key_to_use = user_gemini_api_key_from_header if user_gemini_api_key_from_header else GEMINI_API_KEY
+
+    if not news_api_key_to_use or not gemini_api_key_to_use:
+        return jsonify({"error": "API keys not provided or configured."}), 401
+
+    try:
+        # Jobs wait for rate-limit tokens no longer than an interactive search would, then fail with the reason
+        job_id = search_jobs.submit(
+            run_coalesced_search, query, gemini_api_key_to_use, news_api_key_to_use, REQUEST_RATE_LIMIT_WAIT_SECONDS,
+            description=query
+        )
+    except JobQueueFull as e:
+        return jsonify({"error": "Too many requests", "message": str(e)}), 429, {"Retry-After": "5"}
+
+    status_url = url_for('main.get_search_job_api', job_id=job_id)
+    return jsonify({"job_id": job_id, "status": JOB_QUEUED, "status_url": status_url}), 202, {"Location": status_url}
+
+@routes.route('/api/search_jobs/<job_id>', methods=['GET'])
+def get_search_job_api(job_id):
+    """Returns a search job's status, plus its results once it has succeeded."""
+    job = search_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Search job not found or has expired."}), 404
+
+    response_data = {"job_id": job_id, "status": job["status"], "query": job["description"]}
+    if job["status"] == JOB_SUCCEEDED:
+        response_data["results"] = [job["result"]]
+    elif job["status"] == JOB_FAILED:
+        response_data["error"] = "Failed to perform search"
+        response_data["message"] = job["error"]
+    return jsonify(response_data)
+
+@routes.route('/api/chatbot_message', methods=['POST'])
 def chatbot_message_api():
     user_message = request.json.get('message', '')
     history = request.json.get('history', [])
@@ -667,53 +912,42 @@ def chatbot_message_api():
         return jsonify({"response": "Error: Gemini API key is missing.", "history": history}), 401
 
     try:
-        model_response_text, updated_history = learn_chat(history, user_message, gemini_api_key_to_use)
+        with rate_limit.deadline(REQUEST_RATE_LIMIT_WAIT_SECONDS):
+            model_response_text, updated_history = learn_chat(history, user_message, gemini_api_key_to_use)
         return jsonify({"response": model_response_text, "history": updated_history})
+    except RateLimitExceeded as e:
+        print(f"DEBUG: chatbot_message_api: {e}")
+        return jsonify({"response": "I'm getting a lot of questions right now. Please try again in a moment.", "history": history}), 429, {"Retry-After": str(int(e.retry_after) + 1)}
     except Exception as e:
         print(f"Error in chatbot_message_api: {e}")
         traceback.print_exc()
         return jsonify({"response": "Sorry, I'm having trouble responding right now. Please try again.", "history": history}), 500
 
-@app.route('/api/quiz_submit', methods=['POST'])
+@routes.route('/api/metrics', methods=['GET'])
+def metrics_api():
+    """Exposes cache and rate-limiter counters for monitoring."""
+    return jsonify({
+        "gemini_response_cache": response_cache.gemini_response_cache.stats(),
+        "search_singleflight": search_flight.stats(),
+        "search_stage_timings": get_search_stage_timings(),
+        "search_jobs": search_jobs.stats(),
+        "feed_scheduler": feed_scheduler.stats() if feed_scheduler is not None else None,
+        "article_store": article_store.stats(),
+        "feed_leader": feed_leader.stats() if feed_leader is not None else None,
+        "article_cache": ARTICLE_CACHE.stats(),
+        "rate_limit": rate_limit.stats(),
+        "rate_limit_classes": rate_limit.class_stats(),
+        "api_keys": key_pool.stats(),
+        "circuit_breakers": resilience.stats()
+    })
+
+@routes.route('/api/quiz_submit', methods=['POST'])
 def quiz_submit_api():
     print(f"Received quiz submission: {request.json}")
     return jsonify({"status": "success", "message": "Quiz answers received."})
 
-# --- Run the Flask app ---
-if __name__ == '__main__':
-    if NEWSAPI_API_KEY and GEMINI_API_KEY:
-        background_thread = threading.Thread(
-            target=background_article_generation_worker,
-            args=(GEMINI_API_KEY, NEWSAPI_API_KEY),
-            name="background_gen_worker"
-        )
-        background_thread.daemon = True
-        background_thread.start()
-        print("DEBUG: Background generation worker started on app startup.")
-    else:
-        print("WARNING: Background generation worker not started due to missing API keys.")
-
-    app.run(debug=True, use_reloader=False)
-
-@app.route('/learn/<path:article_id>')
-def learn_article_detail(article_id):
-    article_data = None
-    unit_name = None
-    
-    # Search through all units to find the article
-    for unit_key, unit_info in knowledge_articles.items():
-        if article_id in unit_info["lessons"]:
-            article_data = unit_info["lessons"][article_id]
-            unit_name = unit_key
-            break
-    
-    if not article_data:
-        return "Article not found", 404
-    
-    return render_template('learn_article_detail.html', article=article_data, back_link=url_for('learn'))
-
-# Add new API endpoint for interactive activities
-@app.route('/api/analyze_bias', methods=['POST'])
+# --- Interactive Activity Endpoints ---
+@routes.route('/api/analyze_bias', methods=['POST'])
 def analyze_bias_api():
     """API endpoint for bias detection activity"""
     article_text = request.json.get('text', '')
@@ -727,14 +961,18 @@ def analyze_bias_api():
     try:
         # Import the analysis function
         from news_backend.interactive_activities import analyze_bias
-        result = analyze_bias(article_text, gemini_api_key_to_use)
+        with rate_limit.deadline(REQUEST_RATE_LIMIT_WAIT_SECONDS):
+            result = analyze_bias(article_text, gemini_api_key_to_use)
         return jsonify(result)
+    except RateLimitExceeded as e:
+        print(f"DEBUG: analyze_bias_api: {e}")
+        return jsonify({"error": "Too many requests", "message": str(e)}), 429, {"Retry-After": str(int(e.retry_after) + 1)}
     except Exception as e:
         print(f"Error in analyze_bias_api: {e}")
         traceback.print_exc()
         return jsonify({"error": "Failed to analyze bias", "message": str(e)}), 500
 
-@app.route('/api/check_framing', methods=['POST'])
+@routes.route('/api/check_framing', methods=['POST'])
 def check_framing_api():
     """API endpoint for framing analysis activity"""
     headline = request.json.get('headline', '')
@@ -747,14 +985,18 @@ def check_framing_api():
     
     try:
         from news_backend.interactive_activities import analyze_framing
-        result = analyze_framing(headline, gemini_api_key_to_use)
+        with rate_limit.deadline(REQUEST_RATE_LIMIT_WAIT_SECONDS):
+            result = analyze_framing(headline, gemini_api_key_to_use)
         return jsonify(result)
+    except RateLimitExceeded as e:
+        print(f"DEBUG: check_framing_api: {e}")
+        return jsonify({"error": "Too many requests", "message": str(e)}), 429, {"Retry-After": str(int(e.retry_after) + 1)}
     except Exception as e:
         print(f"Error in check_framing_api: {e}")
         traceback.print_exc()
         return jsonify({"error": "Failed to analyze framing", "message": str(e)}), 500
 
-@app.route('/api/verify_source', methods=['POST'])
+@routes.route('/api/verify_source', methods=['POST'])
 def verify_source_api():
     """API endpoint for source verification activity"""
     source_url = request.json.get('url', '')
@@ -767,14 +1009,18 @@ def verify_source_api():
     
     try:
         from news_backend.interactive_activities import verify_source
-        result = verify_source(source_url, gemini_api_key_to_use)
+        with rate_limit.deadline(REQUEST_RATE_LIMIT_WAIT_SECONDS):
+            result = verify_source(source_url, gemini_api_key_to_use)
         return jsonify(result)
+    except RateLimitExceeded as e:
+        print(f"DEBUG: verify_source_api: {e}")
+        return jsonify({"error": "Too many requests", "message": str(e)}), 429, {"Retry-After": str(int(e.retry_after) + 1)}
     except Exception as e:
         print(f"Error in verify_source_api: {e}")
         traceback.print_exc()
         return jsonify({"error": "Failed to verify source", "message": str(e)}), 500
 
-@app.route('/api/detect_deepfake', methods=['POST'])
+@routes.route('/api/detect_deepfake', methods=['POST'])
 def detect_deepfake_api():
     """API endpoint for deepfake detection activity"""
     description = request.json.get('description', '')
@@ -787,9 +1033,75 @@ def detect_deepfake_api():
     
     try:
         from news_backend.interactive_activities import analyze_deepfake_signs
-        result = analyze_deepfake_signs(description, gemini_api_key_to_use)
+        with rate_limit.deadline(REQUEST_RATE_LIMIT_WAIT_SECONDS):
+            result = analyze_deepfake_signs(description, gemini_api_key_to_use)
         return jsonify(result)
+    except RateLimitExceeded as e:
+        print(f"DEBUG: detect_deepfake_api: {e}")
+        return jsonify({"error": "Too many requests", "message": str(e)}), 429, {"Retry-After": str(int(e.retry_after) + 1)}
     except Exception as e:
         print(f"Error in detect_deepfake_api: {e}")
         traceback.print_exc()
-        return jsonify({"error": "Failed to analyze for deepfakes", "message": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": "Failed to analyze for deepfakes", "message": str(e)}), 500
+
+# --- Worker Lifecycle ---
+
+workers_started = False
+
+def start_workers():
+    """
+    Starts this process's background work: upstream pre-warm and feed generation (or, with
+    FEED_SHARED_STORE, leader election and replication). Call after any fork; calling it again
+    after stop_workers() restarts the workers.
+    """
+    global workers_started
+    if workers_started:
+        return
+    workers_started = True
+    feed_sync_stop.clear()
+    search_jobs.start()
+    if upstream.UPSTREAM_PREWARM:
+        upstream.prewarm()
+    start_feed_services(GEMINI_API_KEY, NEWSAPI_API_KEY)
+
+def stop_workers():
+    """
+    Stops background work and flushes pending writes to the article store. Safe to call more than
+    once; start_workers() can start everything again afterwards.
+    """
+    global workers_started, feed_leader, feed_sync_thread
+    workers_started = False
+    feed_sync_stop.set()
+    if feed_sync_thread is not None:
+        feed_sync_thread.join(timeout=5)
+        feed_sync_thread = None
+    if feed_leader is not None:
+        feed_leader.stop()
+        feed_leader = None
+    stop_background_generation()
+    search_jobs.shutdown()
+    article_store.flush()
+
+# --- App Factory ---
+
+DEFAULT_CONFIG = {
+    # Start background workers from create_app(). Forking servers start them per worker instead (see gunicorn.conf.py).
+    "START_WORKERS": False,
+}
+
+def create_app(config=None):
+    """Builds the Flask app; `config` entries override DEFAULT_CONFIG and Flask's own settings."""
+    app = Flask(__name__,
+                template_folder='templates',
+                static_folder='static')
+    app.config.update(DEFAULT_CONFIG)
+    app.config.update(config or {})
+    app.register_blueprint(routes)
+    if app.config["START_WORKERS"]:
+        start_workers()
+    return app
+
+# --- Run the Flask app (development server; see wsgi.py for production) ---
+if __name__ == '__main__':
+    app = create_app({"START_WORKERS": True})
+    app.run(debug=os.getenv("FLASK_DEBUG", "false").lower() == "true", threaded=True, use_reloader=False)
@@ -0,0 +1,5 @@
+"""
+End-to-end benchmarks: the real Flask app, served over HTTP, against the local mock upstream.
+
+    python -m benchmarks --scenarios feed,search,chat,generation --baseline benchmarks/results/previous.json
+"""
@@ -0,0 +1,146 @@
+"""
+Runs the benchmark scenarios and writes the results as JSON.
+
+    python -m benchmarks [--scenarios feed,search,chat,generation] [--output FILE] [--baseline FILE]
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+
+from benchmarks import harness
+from news_backend.mock_upstream import MockUpstream
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+# Metrics compared against a baseline, and whether a higher value is better
+COMPARED_METRICS = {
+    "requests_per_second": True,
+    "articles_per_minute": True,
+    "p50_ms": False,
+    "p95_ms": False,
+    "p99_ms": False,
+}
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def flatten(results, prefix=""):
+    """{'feed': {'runs': {'full@1': {'p50_ms': 3}}}} -> {'feed.runs.full@1.p50_ms': 3} for compared metrics."""
+    flat = {}
+    for key, value in results.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, path))
+        elif key in COMPARED_METRICS and isinstance(value, (int, float)):
+            flat[path] = value
+    return flat
+
+
+def compare(baseline, current):
+    """Prints each compared metric's change from the baseline run; '+' is an improvement."""
+    before, after = flatten(baseline["results"]), flatten(current["results"])
+    print(f"\nCompared with {baseline['meta'].get('git_commit')} ({baseline['meta'].get('started_at')}):")
+    for path in sorted(before.keys() & after.keys()):
+        old, new = before[path], after[path]
+        if not old:
+            continue
+        change = (new - old) / old * 100
+        better = change > 0 if COMPARED_METRICS[path.rsplit(".", 1)[1]] else change < 0
+        print(f"  {'+' if better else '-'} {path}: {old} -> {new} ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end benchmarks against the local mock upstream.")
+    parser.add_argument("--scenarios", default="feed,search,chat,generation", help="Comma-separated subset of: feed, search, chat, generation.")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/<timestamp>.json).")
+    parser.add_argument("--baseline", help="Earlier results file to compare against.")
+    parser.add_argument("--gemini-latency", default="lognormal:0.8,0.4", help="Mock Gemini latency spec.")
+    parser.add_argument("--newsapi-latency", default="uniform:0.05,0.2", help="Mock NewsAPI latency spec.")
+    parser.add_argument("--feed-requests", type=int, default=500, help="Requests per feed variant and concurrency level.")
+    parser.add_argument("--feed-concurrency", default="1,8,32")
+    parser.add_argument("--search-requests", type=int, default=40)
+    parser.add_argument("--chat-requests", type=int, default=20, help="Requests per history length.")
+    parser.add_argument("--chat-history-lengths", default="0,4,16,64")
+    parser.add_argument("--generation-rpm", type=int, default=15, help="Per-key Gemini/NewsAPI quota for the generation run.")
+    parser.add_argument("--generation-seconds", type=float, default=60)
+    parser.add_argument("--seed", default="bench", help="Mock upstream seed.")
+    parser.add_argument("--verbose", action="store_true", help="Keep the app's own log output.")
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in scenarios if name not in ("feed", "search", "chat", "generation")]
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(unknown)}")
+
+    mock = MockUpstream(gemini_latency=args.gemini_latency, newsapi_latency=args.newsapi_latency, seed=args.seed)
+    mock_url = mock.start(port=0)
+    work_dir = tempfile.mkdtemp(prefix="debunkd_bench_")
+    harness.prepare_environment(mock_url, work_dir)
+
+    from benchmarks import scenarios as scenario_functions  # Imports the app's modules, so after prepare_environment()
+    options = {
+        "feed": {"concurrency_levels": [int(c) for c in args.feed_concurrency.split(",")], "requests_per_level": args.feed_requests},
+        "search": {"total": args.search_requests},
+        "chat": {"history_lengths": [int(n) for n in args.chat_history_lengths.split(",")], "requests_per_length": args.chat_requests},
+        "generation": {"rpm": args.generation_rpm, "duration": args.generation_seconds},
+    }
+
+    report = {
+        "meta": {
+            "started_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "mock_upstream": {"gemini_latency": args.gemini_latency, "newsapi_latency": args.newsapi_latency, "seed": args.seed},
+            "options": {name: options[name] for name in scenarios},
+        },
+        "results": {},
+    }
+
+    quiet = open(os.devnull, "w") if not args.verbose else None
+    server = None
+    try:
+        with contextlib.redirect_stdout(quiet) if quiet else contextlib.nullcontext():
+            server = harness.AppServer().start()
+        for name in scenarios:
+            print(f"Running {name}...", flush=True)
+            with contextlib.redirect_stdout(quiet) if quiet else contextlib.nullcontext():
+                report["results"][name] = scenario_functions.SCENARIOS[name](server, mock, **options[name])
+            print(json.dumps(report["results"][name], indent=2))
+    finally:
+        with contextlib.redirect_stdout(quiet) if quiet else contextlib.nullcontext():
+            if server is not None:
+                server.stop()
+            mock.stop()
+        if quiet:
+            quiet.close()
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, datetime.datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
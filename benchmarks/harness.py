@@ -0,0 +1,123 @@
+"""
+Benchmark plumbing: environment setup, the app and mock upstream servers, a concurrent load driver
+and latency summaries
+"""
+import logging
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BENCH_GEMINI_KEY = "bench-gemini-key"
+BENCH_NEWSAPI_KEY = "bench-newsapi-key"
+UNLIMITED_RPM = 1_000_000  # Rate limit for scenarios that measure the app rather than the quota
+
+
+def prepare_environment(mock_url, work_dir):
+    """
+    Points the app at the mock upstream and at a scratch article store. Must run before `app` is
+    imported, because the app and its modules read their settings at import time.
+    """
+    os.environ.update({
+        "GEMINI_API_BASE_URL": mock_url,
+        "NEWSAPI_BASE_URL": mock_url,
+        "GEMINI_API_KEY": BENCH_GEMINI_KEY,
+        "NEWSAPI_API_KEY": BENCH_NEWSAPI_KEY,
+        "ARTICLE_STORE_PATH": os.path.join(work_dir, "articles.db"),
+        "FEED_SHARED_STORE": "false",
+        "RATE_LIMIT_SHARED_DB_PATH": "",
+        "UPSTREAM_PREWARM": "false",
+        "GEMINI_RATE_LIMIT_PER_MINUTE": str(UNLIMITED_RPM),
+        "NEWSAPI_RATE_LIMIT_PER_MINUTE": str(UNLIMITED_RPM),
+    })
+
+
+def set_rate_limits(rpm):
+    """Applies a per-key Gemini and NewsAPI quota to calls made from now on."""
+    from news_backend import rate_limit
+    rate_limit.RATE_LIMITS_PER_MINUTE["gemini"] = rpm
+    rate_limit.RATE_LIMITS_PER_MINUTE["newsapi"] = rpm
+    rate_limit.reset()
+
+
+class AppServer:
+    """The real app from create_app(), served by werkzeug's threaded server on a free local port."""
+    def __init__(self):
+        from werkzeug.serving import make_server
+        import app as debunkd_app
+
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)  # No access log line per request
+        self.module = debunkd_app
+        self.app = debunkd_app.create_app()
+        self._server = make_server("127.0.0.1", 0, self.app, threaded=True)
+        self.base_url = f"http://127.0.0.1:{self._server.server_port}"
+        self._thread = threading.Thread(target=self._server.serve_forever, name="bench_app_server", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.module.stop_workers()
+        self._server.shutdown()
+
+
+# --- Load Driver ---
+
+def run_load(send, total, concurrency):
+    """
+    Calls send(session, i) for i in range(total) from `concurrency` threads, each with its own keep-alive
+    session. `send` returns (status_code, tag). Returns ([(seconds, status_code, tag)], wall_seconds).
+    """
+    local = threading.local()
+
+    def one(i):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        started = time.perf_counter()
+        try:
+            status, tag = send(session, i)
+        except requests.exceptions.RequestException:
+            status, tag = 0, "connection_error"
+        return time.perf_counter() - started, status, tag
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bench_client") as pool:
+        samples = list(pool.map(one, range(total)))
+    return samples, time.perf_counter() - started
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+def summarize(samples, wall_seconds=None, ok_statuses=(200, 304)):
+    """Request count, error count, throughput and latency percentiles (ms) for load samples."""
+    latencies = sorted(seconds * 1000 for seconds, status, _ in samples)
+    errors = sum(1 for _, status, _ in samples if status not in ok_statuses)
+    summary = {
+        "requests": len(samples),
+        "errors": errors,
+        "mean_ms": round(sum(latencies) / len(latencies), 2) if latencies else None,
+        "p50_ms": round(percentile(latencies, 0.50), 2) if latencies else None,
+        "p95_ms": round(percentile(latencies, 0.95), 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99), 2) if latencies else None,
+        "max_ms": round(latencies[-1], 2) if latencies else None,
+    }
+    if wall_seconds:
+        summary["requests_per_second"] = round(len(samples) / wall_seconds, 1)
+    return summary
+
+
+def summarize_by_tag(samples, ok_statuses=(200, 304)):
+    tags = {}
+    for sample in samples:
+        tags.setdefault(sample[2], []).append(sample)
+    return {tag: summarize(tag_samples, ok_statuses=ok_statuses) for tag, tag_samples in sorted(tags.items())}
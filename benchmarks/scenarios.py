@@ -0,0 +1,195 @@
+"""
+Benchmark scenarios. Each takes the running AppServer and the MockUpstream and returns a JSON-ready dict.
+"""
+import random
+import time
+import uuid
+
+import requests
+
+from benchmarks.harness import run_load, set_rate_limits, summarize, summarize_by_tag, UNLIMITED_RPM
+from news_backend import key_pool, rate_limit
+from news_backend.mock_upstream import SyntheticContent
+
+SEARCH_QUERIES = (
+    "Is it true that {topic} causes {effect}?",
+    "Latest news on {topic}",
+    "Did the {topic} report say {effect}?",
+    "What happened with {topic} this week",
+    "Can {topic} really cure {effect}",
+)
+TOPICS = ("coffee", "the city council", "solar panels", "the election", "vitamin C", "ocean plastic", "5G towers")
+EFFECTS = ("cancer", "higher taxes", "memory loss", "power cuts", "colds", "flooding")
+
+
+def synthetic_article(content, section, index):
+    title = content.headline()
+    return {
+        "id": f"bench-{section}-{index}-{uuid.uuid4().hex[:8]}",
+        "title": title,
+        "summary": content.sentence(25),
+        "category": "General",
+        "category_color": "#9E9E9E",
+        "image_url": "https://placehold.co/300x200/9E9E9E/FFFFFF?text=General",
+        "original_url": "",
+        "summary_detail": " ".join(content.sentence(20) for _ in range(6)),
+        "key_insights": [content.sentence() for _ in range(4)],
+        "viewpoints": [content.sentence() for _ in range(3)],
+        "sources": [{"name": content.headline(), "url": "https://example.org/source"} for _ in range(3)],
+    }
+
+
+def seed_feed(server, articles_per_section, seed=0):
+    """Publishes synthetic articles straight into the feed store, so the feed benchmark needs no generation."""
+    content = SyntheticContent(random.Random(seed))
+    for section in server.module.section_configs:
+        articles = [synthetic_article(content, section, i) for i in range(articles_per_section)]
+        server.module.feed_store.append_articles(section, articles)
+    return server.module.feed_store.current().version
+
+
+def feed(server, mock, concurrency_levels=(1, 8, 32), requests_per_level=500, articles_per_section=15):
+    """GET /api/get_feed_articles throughput and latency: full payload, card fields, and ETag revalidation."""
+    set_rate_limits(UNLIMITED_RPM)
+    seed_feed(server, articles_per_section)
+    url = f"{server.base_url}/api/get_feed_articles"
+    etag = requests.get(url).headers.get("ETag")  # For the encoding this client negotiates
+    variants = {
+        "full": lambda session, i: (session.get(url).status_code, "full"),
+        "card": lambda session, i: (session.get(url, params={"fields": "card"}).status_code, "card"),
+        "revalidate": lambda session, i: (session.get(url, headers={"If-None-Match": etag}).status_code, "revalidate"),
+    }
+    results = {"articles_per_section": articles_per_section, "runs": {}}
+    for variant, send in variants.items():
+        for concurrency in concurrency_levels:
+            samples, wall = run_load(send, requests_per_level, concurrency)
+            results["runs"][f"{variant}@{concurrency}"] = {"variant": variant, "concurrency": concurrency, **summarize(samples, wall)}
+    return results
+
+
+def search(server, mock, total=40, concurrency=4):
+    """
+    GET /api/search_articles latency per classification path. The path is known from the local
+    classifier (run here, in-process) plus the kind of article that comes back.
+    """
+    from news_backend import debunked, query_classifier
+
+    set_rate_limits(UNLIMITED_RPM)
+    rng = random.Random(1)
+    queries = [
+        rng.choice(SEARCH_QUERIES).format(topic=rng.choice(TOPICS), effect=rng.choice(EFFECTS)) + f" ({i})"
+        for i in range(total)  # Unique, so neither single-flight nor the response cache hides upstream calls
+    ]
+    url = f"{server.base_url}/api/search_articles"
+
+    def send(session, i):
+        query = queries[i]
+        classifier = "local" if query_classifier.classify(query) is not None else debunked.SEARCH_PIPELINE_MODE
+        response = session.get(url, params={"query": query})
+        status = response.status_code
+        if status == 200:
+            kind = "news" if response.json()["results"][0].get("original_url") else "general"
+        elif "interpret" in response.text:
+            kind, status = "uninterpretable", 200  # The app's answer for this path, not a failure
+        else:
+            kind = f"error_{status}"
+        return status, f"{classifier}/{kind}"
+
+    samples, wall = run_load(send, total, concurrency)
+    return {"overall": summarize(samples, wall), "paths": summarize_by_tag(samples)}
+
+
+def chat(server, mock, history_lengths=(0, 4, 16, 64), requests_per_length=20, concurrency=4):
+    """POST /api/chatbot_message latency as the conversation history grows."""
+    set_rate_limits(UNLIMITED_RPM)
+    content = SyntheticContent(random.Random(2))
+    url = f"{server.base_url}/api/chatbot_message"
+    results = {}
+    for length in history_lengths:
+        history = [
+            {"role": "user" if turn % 2 == 0 else "model", "parts": [{"text": content.sentence(40)}]}
+            for turn in range(length)
+        ]
+
+        def send(session, i, history=history):
+            response = session.post(url, json={"message": content.sentence(12), "history": history})
+            return response.status_code, f"history_{length}"
+
+        samples, wall = run_load(send, requests_per_length, concurrency)
+        results[f"history_{length}"] = {"history_length": length, **summarize(samples, wall)}
+    return results
+
+
+def generation(server, mock, rpm=15, duration=60.0, max_articles_per_section=1000):
+    """
+    Articles per minute the background generator publishes under a per-key RPM quota. The generator
+    starts on full buckets, so the first burst of articles costs no waiting. That burst is reported
+    on its own, and `articles_per_minute` is timed only once the Gemini bucket has run dry.
+    """
+    set_rate_limits(rpm)
+    module = server.module
+    saved_max_articles = module.MAX_ARTICLES_PER_SECTION
+    module.MAX_ARTICLES_PER_SECTION = max_articles_per_section  # Keep generating for the whole run
+
+    def published():
+        snapshot = module.feed_store.current()
+        return sum(len(articles) for articles in snapshot.sections.values())
+
+    def bucket_drained():
+        # True once the generator would have to wait for a Gemini token
+        with rate_limit.traffic_class(rate_limit.BACKGROUND):
+            return key_pool.estimate_wait("gemini", module.GEMINI_API_KEY) > 0
+
+    before_articles = published()
+    before_calls = mock.stats()
+    started = time.monotonic()
+    first_article_seconds = None
+    burst_seconds = None
+    burst_articles = None
+    module.start_background_generation(module.GEMINI_API_KEY, module.NEWSAPI_API_KEY)
+    try:
+        # Burst: runs until the bucket is empty, or for at most `duration` if it never empties
+        while time.monotonic() - started < duration:
+            time.sleep(0.25)
+            if first_article_seconds is None and published() > before_articles:
+                first_article_seconds = round(time.monotonic() - started, 2)
+            if bucket_drained():
+                burst_seconds = round(time.monotonic() - started, 2)
+                burst_articles = published() - before_articles
+                break
+        # Steady state: `duration` seconds paced by the quota alone
+        steady_started = time.monotonic()
+        steady_before = published()
+        while time.monotonic() - steady_started < duration:
+            time.sleep(0.25)
+            if first_article_seconds is None and published() > before_articles:
+                first_article_seconds = round(time.monotonic() - started, 2)
+        steady_articles = published() - steady_before
+        steady_elapsed = time.monotonic() - steady_started
+    finally:
+        module.stop_background_generation()
+        module.MAX_ARTICLES_PER_SECTION = saved_max_articles
+    elapsed = time.monotonic() - started
+
+    articles = published() - before_articles
+    after_calls = mock.stats()
+    return {
+        "rpm": rpm,
+        "duration_seconds": round(elapsed, 1),
+        "articles": articles,
+        "articles_per_minute": round(steady_articles * 60 / steady_elapsed, 2),
+        "articles_per_minute_with_burst": round(articles * 60 / elapsed, 2),
+        "burst_drained": burst_seconds is not None,
+        "burst_seconds": burst_seconds,
+        "burst_articles": burst_articles,
+        "first_article_seconds": first_article_seconds,
+        "upstream_calls": {key: after_calls[key] - before_calls[key] for key in after_calls},
+    }
+
+
+SCENARIOS = {
+    "feed": feed,
+    "search": search,
+    "chat": chat,
+    "generation": generation,
+}
@@ -0,0 +1,34 @@
+"""
+Gunicorn settings for DeBunk-D: `gunicorn -c gunicorn.conf.py wsgi:app`
+"""
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+# Threaded workers: SSE streams and search jobs hold a thread each while they wait on upstreams
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 32))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+# Import the app in each worker, after the fork, so no SQLite connection or lock is shared between workers
+preload_app = False
+
+# --- Multi-worker defaults (read by the app when each worker imports it) ---
+if workers > 1:
+    os.environ.setdefault('FEED_SHARED_STORE', 'true')
+    os.environ.setdefault('RATE_LIMIT_SHARED_DB_PATH', 'debunkd_rate_limits.db')
+# Leave threads free for ordinary requests
+os.environ.setdefault('FEED_STREAM_MAX_SUBSCRIBERS', str(max(1, threads // 2)))
+
+
+# --- Worker Lifecycle Hooks ---
+
+def post_worker_init(worker):
+    import app
+    app.start_workers()
+
+
+def worker_exit(server, worker):
+    import app
+    app.stop_workers()
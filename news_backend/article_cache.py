@@ -0,0 +1,113 @@
+"""
+Byte-bounded in-memory article cache with LRU/LFU eviction, backed by the on-disk article store
+"""
+import collections
+import os
+import sys
+import threading
+
+ARTICLE_CACHE_MAX_BYTES = int(os.environ.get('ARTICLE_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+ARTICLE_CACHE_POLICY = os.environ.get('ARTICLE_CACHE_POLICY', 'lru').lower()
+
+EVICTION_POLICIES = ("lru", "lfu")
+
+
+def approx_size(value):
+    """Rough deep size in bytes of JSON-like data (dicts, lists, strings, numbers)."""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(approx_size(k) + approx_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(approx_size(v) for v in value)
+    return size
+
+
+class ArticleCache:
+    """
+    Maps article id -> article, keeping at most `max_bytes` (approximate deep size) in memory.
+    When over budget, the least recently used ('lru') or least frequently used ('lfu', ties broken
+    by recency) entries are evicted. get() falls back to `backing_store` (an ArticleStore) on a miss.
+    Every article the app caches is also written to that store, so permalinks keep resolving after
+    eviction as long as the store is enabled.
+    """
+    def __init__(self, max_bytes, policy="lru", backing_store=None):
+        if policy not in EVICTION_POLICIES:
+            raise ValueError(f"Unknown article cache eviction policy '{policy}'. Use one of {EVICTION_POLICIES}.")
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.backing_store = backing_store
+        self._entries = collections.OrderedDict()  # id -> [article, size, uses]; oldest use first
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+    def _evict(self):
+        # Caller must hold _lock.
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            if self.policy == "lfu":
+                article_id = min(self._entries, key=lambda k: self._entries[k][2])
+            else:
+                article_id = next(iter(self._entries))
+            _, size, _ = self._entries.pop(article_id)
+            self._bytes -= size
+            self.counters["evictions"] += 1
+
+    def _starting_uses(self):
+        # Caller must hold _lock. Under LFU a new entry starts level with the coldest one (and, being the
+        # most recent, is evicted after it), rather than at 0 where it would always be evicted first.
+        if self.policy != "lfu" or not self._entries:
+            return 0
+        return min(entry[2] for entry in self._entries.values())
+
+    def put(self, article):
+        """Caches an article under its 'id'."""
+        size = approx_size(article)
+        with self._lock:
+            previous = self._entries.pop(article["id"], None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[article["id"]] = [article, size, previous[2] if previous else self._starting_uses()]
+            self._bytes += size
+            self._evict()
+
+    def get(self, article_id, default=None):
+        with self._lock:
+            entry = self._entries.get(article_id)
+            if entry is not None:
+                entry[2] += 1
+                self._entries.move_to_end(article_id)
+                self.counters["hits"] += 1
+                return entry[0]
+
+        article = self.backing_store.get_article(article_id) if self.backing_store is not None else None
+        with self._lock:
+            self.counters["disk_hits" if article is not None else "misses"] += 1
+        if article is None:
+            return default
+        self.put(article)
+        return article
+
+    def __contains__(self, article_id):
+        with self._lock:
+            return article_id in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+            entries = len(self._entries)
+            size = self._bytes
+        hits = counters["hits"] + counters["disk_hits"]
+        lookups = hits + counters["misses"]
+        return {
+            **counters,
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "policy": self.policy,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "memory_hit_rate": round(counters["hits"] / lookups, 3) if lookups else 0.0,
+        }
@@ -0,0 +1,271 @@
+"""
+SQLite-backed store for generated articles, feed section membership, headline queues and worker progress
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+ARTICLE_STORE_PATH = os.environ.get('ARTICLE_STORE_PATH', 'debunkd_articles.db')
+ARTICLE_STORE_FLUSH_INTERVAL_SECONDS = float(os.environ.get('ARTICLE_STORE_FLUSH_INTERVAL_SECONDS', 0.5))
+# Articles in no feed section (search results) are deleted this long after they were last saved; 0 keeps them
+ARTICLE_STORE_RETENTION_SECONDS = float(os.environ.get('ARTICLE_STORE_RETENTION_SECONDS', 7 * 24 * 3600))
+ARTICLE_STORE_PRUNE_INTERVAL_SECONDS = float(os.environ.get('ARTICLE_STORE_PRUNE_INTERVAL_SECONDS', 3600))
+
+
+class ArticleStore:
+    """
+    Write-behind persistence for the feed. Writers only queue changes (cheap enough to call while
+    holding cache_lock, and queued in call order); a flusher thread commits everything pending in
+    one transaction every `flush_interval` seconds. Headline queues and state values are coalesced,
+    so only their latest value is written. With an empty `db_path` every method is a no-op.
+    """
+    def __init__(self, db_path, flush_interval=ARTICLE_STORE_FLUSH_INTERVAL_SECONDS,
+                 retention_seconds=ARTICLE_STORE_RETENTION_SECONDS, prune_interval=ARTICLE_STORE_PRUNE_INTERVAL_SECONDS):
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.retention_seconds = retention_seconds
+        self.prune_interval = prune_interval
+        self._last_prune = 0.0
+        self._lock = threading.Lock()  # Guards the pending writes
+        self._db_lock = threading.Lock()  # Serializes use of the connection (and the order of flushes)
+        self._db = None
+        self._flusher = None
+        self._closing = threading.Event()
+        self._pending_articles = {}  # id -> article
+        self._pending_members = []  # (section, article_id, feed version) in append order
+        self._pending_headlines = {}  # section -> headline list
+        self._pending_state = {}  # key -> value
+        self.counters = {"flushes": 0, "rows_written": 0, "errors": 0, "pruned": 0}
+        if db_path:
+            self._open_db()
+
+    def _open_db(self):
+        # Other processes may share the file (FEED_SHARED_STORE), so wait on their write locks instead of failing
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS articles ("
+            "id TEXT PRIMARY KEY, saved_at REAL NOT NULL, body BLOB NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS section_articles ("
+            "seq INTEGER PRIMARY KEY, section TEXT NOT NULL, article_id TEXT NOT NULL, "
+            "version INTEGER NOT NULL DEFAULT 0, UNIQUE (section, article_id))"
+        )
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(section_articles)")}
+        if "version" not in columns:  # Databases created before feed versions were persisted
+            self._db.execute("ALTER TABLE section_articles ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        self._db.execute("CREATE INDEX IF NOT EXISTS articles_saved_at ON articles (saved_at)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS headline_queues (section TEXT PRIMARY KEY, headlines TEXT NOT NULL)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS worker_state (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._db.commit()
+
+    @property
+    def enabled(self):
+        return self._db is not None
+
+    def _queued(self):
+        # Caller must hold _lock.
+        if self._flusher is None and not self._closing.is_set():
+            self._flusher = threading.Thread(target=self._flush_loop, name="article_store_flusher", daemon=True)
+            self._flusher.start()
+
+    def put_articles(self, articles):
+        """Queues full articles (keyed by their 'id') for persistence."""
+        if not self.enabled:
+            return
+        with self._lock:
+            for article in articles:
+                self._pending_articles[article["id"]] = article
+            self._queued()
+
+    def append_to_section(self, section, article_ids, version=0):
+        """Queues section membership; `version` is the feed version that published the articles."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._pending_members.extend((section, article_id, version) for article_id in article_ids)
+            self._queued()
+
+    def set_headline_queue(self, section, headlines):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._pending_headlines[section] = list(headlines)
+            self._queued()
+
+    def set_state(self, key, value):
+        """Queues a JSON-serializable worker-progress value."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._pending_state[key] = value
+            self._queued()
+
+    def flush(self):
+        """Writes everything queued so far in a single transaction. Returns the number of rows written."""
+        if not self.enabled:
+            return 0
+        with self._db_lock:
+            with self._lock:
+                articles, self._pending_articles = self._pending_articles, {}
+                members, self._pending_members = self._pending_members, []
+                headlines, self._pending_headlines = self._pending_headlines, {}
+                state, self._pending_state = self._pending_state, {}
+            rows = len(articles) + len(members) + len(headlines) + len(state)
+            if not rows:
+                return 0
+            now = time.time()
+            try:
+                with self._db:
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO articles (id, saved_at, body) VALUES (?, ?, ?)",
+                        [(article_id, now, zlib.compress(json.dumps(article).encode("utf-8")))
+                         for article_id, article in articles.items()]
+                    )
+                    self._db.executemany("INSERT OR IGNORE INTO section_articles (section, article_id, version) VALUES (?, ?, ?)", members)
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO headline_queues (section, headlines) VALUES (?, ?)",
+                        [(section, json.dumps(queue)) for section, queue in headlines.items()]
+                    )
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO worker_state (key, value) VALUES (?, ?)",
+                        [(key, json.dumps(value)) for key, value in state.items()]
+                    )
+            except sqlite3.Error as e:
+                print(f"ERROR: Article store flush of {rows} rows failed: {e}. Keeping them queued for the next flush.")
+                self.counters["errors"] += 1
+                self._requeue(articles, members, headlines, state)
+                return 0
+            self.counters["flushes"] += 1
+            self.counters["rows_written"] += rows
+            return rows
+
+    def _requeue(self, articles, members, headlines, state):
+        """Puts the rows of a failed flush back in front of anything queued since; newer values win."""
+        with self._lock:
+            self._pending_articles = {**articles, **self._pending_articles}
+            self._pending_members = members + self._pending_members
+            self._pending_headlines = {**headlines, **self._pending_headlines}
+            self._pending_state = {**state, **self._pending_state}
+
+    def prune(self):
+        """Deletes articles outside every feed section that are older than `retention_seconds`. Returns the count."""
+        if not self.enabled or self.retention_seconds <= 0:
+            return 0
+        cutoff = time.time() - self.retention_seconds
+        with self._db_lock:
+            try:
+                with self._db:
+                    deleted = self._db.execute(
+                        "DELETE FROM articles WHERE saved_at < ? AND id NOT IN (SELECT article_id FROM section_articles)",
+                        (cutoff,)
+                    ).rowcount
+            except sqlite3.Error as e:
+                print(f"ERROR: Article store prune failed: {e}")
+                self.counters["errors"] += 1
+                return 0
+            self.counters["pruned"] += deleted
+        if deleted:
+            print(f"DEBUG: Pruned {deleted} search articles older than {self.retention_seconds:.0f} seconds from the article store.")
+        return deleted
+
+    def _flush_loop(self):
+        while not self._closing.wait(self.flush_interval):
+            self.flush()
+            if time.monotonic() - self._last_prune >= self.prune_interval:
+                self._last_prune = time.monotonic()
+                self.prune()
+
+    def get_article(self, article_id):
+        """
+        Reads one article, or None. Articles still waiting for a flush come from the queue, so an
+        article can always be read back as soon as it has been put.
+        """
+        if not self.enabled:
+            return None
+        # Holding _db_lock means no flush is in progress: each row is either queued or committed
+        with self._db_lock:
+            with self._lock:
+                article = self._pending_articles.get(article_id)
+            if article is not None:
+                return article
+            row = self._db.execute("SELECT body FROM articles WHERE id = ?", (article_id,)).fetchone()
+        return json.loads(zlib.decompress(row[0])) if row else None
+
+    def load(self):
+        """
+        Returns the persisted feed as {"articles": {id: article}, "sections": {section: [article ids]},
+        "headlines": {section: [headlines]}, "state": {key: value}, "version": latest feed version}.
+        Section ids are in append order.
+        Only articles that belong to a section are loaded; others (e.g. search results) are read on demand
+        with get_article().
+        """
+        saved = {"articles": {}, "sections": {}, "headlines": {}, "state": {}, "version": 0}
+        if not self.enabled:
+            return saved
+        self.flush()
+        with self._db_lock:
+            for article_id, body in self._db.execute(
+                "SELECT id, body FROM articles WHERE id IN (SELECT article_id FROM section_articles)"
+            ):
+                saved["articles"][article_id] = json.loads(zlib.decompress(body))
+            for section, article_id in self._db.execute("SELECT section, article_id FROM section_articles ORDER BY seq"):
+                saved["sections"].setdefault(section, []).append(article_id)
+            for section, headlines in self._db.execute("SELECT section, headlines FROM headline_queues"):
+                saved["headlines"][section] = json.loads(headlines)
+            for key, value in self._db.execute("SELECT key, value FROM worker_state"):
+                saved["state"][key] = json.loads(value)
+            saved["version"] = self._db.execute("SELECT COALESCE(MAX(version), 0) FROM section_articles").fetchone()[0]
+        return saved
+
+    def load_section_changes(self, after_version):
+        """
+        Returns [(version, {section: [articles]})] for every feed version newer than `after_version`, oldest
+        first. Replicas use it to follow the feed the leader publishes.
+        """
+        if not self.enabled:
+            return []
+        with self._db_lock:
+            rows = self._db.execute(
+                "SELECT s.version, s.section, a.body FROM section_articles s JOIN articles a ON a.id = s.article_id "
+                "WHERE s.version > ? ORDER BY s.version, s.seq",
+                (after_version,)
+            ).fetchall()
+        changes = []
+        for version, section, body in rows:
+            if not changes or changes[-1][0] != version:
+                changes.append((version, {}))
+            changes[-1][1].setdefault(section, []).append(json.loads(zlib.decompress(body)))
+        return changes
+
+    def get_or_create_state(self, key, default):
+        """Returns the stored value for `key`, first storing `default` if there is none (atomic across processes)."""
+        if not self.enabled:
+            return default
+        with self._db_lock:
+            with self._db:
+                self._db.execute("INSERT OR IGNORE INTO worker_state (key, value) VALUES (?, ?)", (key, json.dumps(default)))
+                row = self._db.execute("SELECT value FROM worker_state WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0])
+
+    def close(self):
+        """Stops the flusher, writes anything still pending and closes the database."""
+        if not self.enabled:
+            return
+        self._closing.set()
+        if self._flusher is not None:
+            self._flusher.join(self.flush_interval + 5)
+        self.flush()
+        with self._db_lock:
+            self._db.close()
+            self._db = None
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._pending_articles) + len(self._pending_members) + len(self._pending_headlines) + len(self._pending_state)
+        return {**self.counters, "enabled": self.enabled, "pending": pending}
@@ -10,6 +10,12 @@ import traceback
 import collections # Import collections for deque
 import threading # Import threading for lock
 import uuid # Import the uuid module
+from news_backend import upstream
+from news_backend import key_pool
+from news_backend import resilience
+from news_backend import response_cache
+from news_backend import query_classifier
+from news_backend.rate_limit import RateLimitExceeded
 
 # --- Environment Variables & API Clients ---
 load_dotenv()
@@ -19,11 +25,6 @@ NEWSAPI_API_KEY = os.environ.get('NEWSAPI_API_KEY')
 
 API_CALL_DELAY = 6
 
-RATE_LIMIT_MAX_CALLS_PER_MINUTE = 15
-RATE_LIMIT_INTERVAL_SECONDS = 60
-api_call_timestamps = collections.deque()
-api_call_lock = threading.Lock()
-
 # --- Allowed Categories for AI Classification ---
 ALLOWED_ARTICLE_CATEGORIES = [
     "Events", "Environment", "Politics", "Health", "Science",
@@ -40,33 +41,89 @@ class Article(NamedTuple):
     title: str
 
 # --- Rate Limiting Function ---
-def enforce_rate_limit():
-    global api_call_timestamps
-    with api_call_lock:
-        while api_call_timestamps and api_call_timestamps[0] < time.time() - RATE_LIMIT_INTERVAL_SECONDS:
-            api_call_timestamps.popleft()
-
-        if len(api_call_timestamps) >= RATE_LIMIT_MAX_CALLS_PER_MINUTE:
-            time_to_wait = api_call_timestamps[0] + RATE_LIMIT_INTERVAL_SECONDS - time.time()
-            if time_to_wait > 0:
-                print(f"DEBUG: Rate limit hit. Waiting for {time_to_wait:.2f} seconds before next API call.")
-                time.sleep(time_to_wait)
-                while api_call_timestamps and api_call_timestamps[0] < time.time() - RATE_LIMIT_INTERVAL_SECONDS:
-                    api_call_timestamps.popleft()
-        
-        api_call_timestamps.append(time.time())
+def enforce_rate_limit(upstream="gemini", api_key=None, timeout=None):
+    """
+    Takes a token from the (upstream, api_key) bucket, waiting without holding any shared lock, and
+    returns the key to call with: for a server key, the least-loaded healthy key of its pool.
+    Raises RateLimitExceeded if the calling thread's rate_limit.deadline() passes first, and
+    CircuitOpenError (without spending a token) while the upstream's circuit breaker is open.
+    """
+    resilience.get_breaker(upstream).check()
+    wait_estimate = key_pool.estimate_wait(upstream, api_key)
+    if wait_estimate > 0:
+        print(f"DEBUG: Rate limit hit for {upstream}. Waiting up to {wait_estimate:.2f} seconds before next API call.")
+    return key_pool.acquire(upstream, api_key, timeout)
 
 # --- Helper Functions for LLM Interaction (Revised for JSON Schema) ---
-def call_gemini_api_with_json_schema(prompt_text, response_schema, gem_api_key):
+def _collect_streamed_result(response, on_partial):
+    """
+    Reads a streamGenerateContent response, calling on_partial(text_so_far) as chunks arrive,
+    and returns the result in the same shape as a non-streamed generateContent response.
+    """
+    text_parts = []
+    for chunk in upstream.iter_sse_json(response):
+        candidates = chunk.get("candidates") or []
+        parts = candidates[0].get("content", {}).get("parts", []) if candidates else []
+        chunk_text = "".join(part.get("text", "") for part in parts)
+        if chunk_text:
+            text_parts.append(chunk_text)
+            on_partial("".join(text_parts))
+    if not text_parts:
+        return {}
+    return {"candidates": [{"content": {"parts": [{"text": "".join(text_parts)}]}}]}
+
+def parse_partial_json(text):
+    """
+    Best-effort parse of a JSON document that is still being streamed: closes any open string,
+    array and object, dropping a trailing incomplete member if needed. Returns None if nothing parses yet.
+    """
+    candidate = text
+    for _ in range(4):
+        closers = []
+        in_string = False
+        escaped = False
+        for ch in candidate:
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif ch == '\\':
+                    escaped = True
+                elif ch == '"':
+                    in_string = False
+            elif ch == '"':
+                in_string = True
+            elif ch == '{':
+                closers.append('}')
+            elif ch == '[':
+                closers.append(']')
+            elif ch in '}]' and closers:
+                closers.pop()
+
+        completed = candidate
+        if in_string:
+            if escaped:
+                completed = completed[:-1]
+            completed += '"'
+        completed = re.sub(r"[,:\s]+$", "", completed)
+        try:
+            return json.loads(completed + "".join(reversed(closers)))
+        except json.JSONDecodeError:
+            cut = candidate.rfind(',')
+            if cut <= 0:
+                return None
+            candidate = candidate[:cut]
+    return None
+
+def call_gemini_api_with_json_schema(prompt_text, response_schema, gem_api_key, on_partial=None):
+    """
+    Calls Gemini with a JSON response schema and returns the parsed output, or {"error": ...}.
+    If on_partial is given, the response is streamed and on_partial(text_so_far) is called per chunk.
+    """
     api_key = gem_api_key
     if not api_key:
         print("ERROR: Gemini API key is missing for LLM call.")
         return {"error": "Gemini API key is missing."}
 
-    headers = {'Content-Type': 'application/json'}
-    params = {'key': api_key}
-    GEMINI_API_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent"
-
     payload = {
         "contents": [
             {
@@ -80,17 +137,33 @@ def call_gemini_api_with_json_schema(prompt_text, response_schema, gem_api_key):
         }
     }
 
-    enforce_rate_limit()
+    # Identical prompt+schema payloads are served from cache without spending a quota slot.
+    cache_key = response_cache.make_key(upstream.GEMINI_MODEL, payload)
+    cached_output = response_cache.gemini_response_cache.get(cache_key)
+    if cached_output is not None:
+        print("DEBUG: Serving structured Gemini response from cache.")
+        return cached_output
+
+    api_key = enforce_rate_limit("gemini", api_key)
     try:
-        response = requests.post(GEMINI_API_URL, headers=headers, params=params, json=payload, timeout=90)
-        response.raise_for_status()
-        result = response.json()
+        if on_partial is None:
+            response = upstream.gemini_generate(payload, api_key, timeout=90)
+            response.raise_for_status()
+            result = response.json()
+        else:
+            response = upstream.gemini_stream_generate(payload, api_key, timeout=90)
+            response.raise_for_status()
+            try:
+                result = _collect_streamed_result(response, on_partial)
+            finally:
+                response.close()
 
         if result.get("candidates") and result["candidates"][0].get("content") and result["candidates"][0]["content"].get("parts"):
             try:
                 # The LLM's structured output is a JSON string inside parts[0]["text"].
                 # We need to parse that inner string.
                 parsed_json_output = json.loads(result["candidates"][0]["content"]["parts"][0]["text"])
+                response_cache.gemini_response_cache.put(cache_key, parsed_json_output)
                 return parsed_json_output
             except json.JSONDecodeError as e:
                 print(f"JSON decode error for LLM structured output: {e} - Raw text: {result['candidates'][0]['content']['parts'][0]['text']}")
@@ -111,6 +184,8 @@ def call_gemini_api_with_json_schema(prompt_text, response_schema, gem_api_key):
     except requests.exceptions.RequestException as req_err:
         print(f"An unexpected request error occurred during Gemini API call: {req_err}")
         return {"error": f"Request error: {req_err}"}
+    except RateLimitExceeded:
+        raise
     except Exception as e:
         print(f"An unexpected error occurred in call_gemini_api_with_json_schema: {e}")
         return {"error": f"An unexpected error: {e}"}
@@ -122,13 +197,9 @@ def get_news_headlines(gem_api_key, news_api_key, count=12):
         print("ERROR: NewsAPI key is missing for headline fetching.")
         return {"error": "NewsAPI key is missing."}
 
-    url = ('https://newsapi.org/v2/top-headlines?'
-           'country=us&'
-           f'apiKey={current_newsapi_key}')
-
-    enforce_rate_limit()
+    enforce_rate_limit("newsapi", current_newsapi_key)
     try:
-        response_url = requests.get(url, timeout=10)
+        response_url = upstream.newsapi_get('top-headlines', {'country': 'us'}, current_newsapi_key, timeout=10)
         response_url.raise_for_status()
         rsp_json = response_url.json()
     except requests.exceptions.RequestException as e:
@@ -159,13 +230,11 @@ def get_news_headlines(gem_api_key, news_api_key, count=12):
         f"Sources:\n{source_urls_for_gemini}"
     )
     
-    enforce_rate_limit()
+    gem_api_key = enforce_rate_limit("gemini", gem_api_key)
     try:
-        response_gemini_headlines = requests.post(
-            "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent",
-            headers={'Content-Type': 'application/json'},
-            params={'key': gem_api_key},
-            json={"contents": [{"role": "user", "parts": [{"text": headlines_prompt}]}]},
+        response_gemini_headlines = upstream.gemini_generate(
+            {"contents": [{"role": "user", "parts": [{"text": headlines_prompt}]}]},
+            gem_api_key,
             timeout=60
         )
         response_gemini_headlines.raise_for_status()
@@ -185,6 +254,8 @@ def get_news_headlines(gem_api_key, news_api_key, count=12):
         print(f"Error generating news headlines: {e}")
         traceback.print_exc()
         return {"error": f"Error generating news headlines: {e}"}
+    except RateLimitExceeded:
+        raise
     except Exception as e:
         print(f"An unexpected error occurred in get_news_headlines: {e}")
         return {"error": f"An unexpected error: {e}"}
@@ -196,13 +267,11 @@ def get_misconception_headlines(gem_api_key, count=12):
         f"Only provide the statements, separated by commas, with no other text. "
         f"Format: [misconception1], [misconception2], ...\n"
     )
-    enforce_rate_limit()
+    gem_api_key = enforce_rate_limit("gemini", gem_api_key)
     try:
-        response_gemini_misconception = requests.post(
-            "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent",
-            headers={'Content-Type': 'application/json'},
-            params={'key': gem_api_key},
-            json={"contents": [{"role": "user", "parts": [{"text": misconception_titles_prompt}]}]},
+        response_gemini_misconception = upstream.gemini_generate(
+            {"contents": [{"role": "user", "parts": [{"text": misconception_titles_prompt}]}]},
+            gem_api_key,
             timeout=60
         )
         response_gemini_misconception.raise_for_status()
@@ -221,6 +290,8 @@ def get_misconception_headlines(gem_api_key, count=12):
         print(f"Error generating misconception headlines: {e}")
         traceback.print_exc()
         return {"error": f"Error generating misconception headlines: {e}"}
+    except RateLimitExceeded:
+        raise
     except Exception as e:
         print(f"An unexpected error occurred in get_misconception_headlines: {e}")
         return {"error": f"An unexpected error: {e}"}
@@ -231,13 +302,11 @@ def get_issue_headlines(gem_api_key, count=12):
         f"Only provide the issue titles, separated by commas, with no other text. "
         f"Format: [issue1], [issue2], ...\n"
     )
-    enforce_rate_limit()
+    gem_api_key = enforce_rate_limit("gemini", gem_api_key)
     try:
-        response_gemini_issue = requests.post(
-            "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent",
-            headers={'Content-Type': 'application/json'},
-            params={'key': gem_api_key},
-            json={"contents": [{"role": "user", "parts": [{"text": issue_titles_prompt}]}]},
+        response_gemini_issue = upstream.gemini_generate(
+            {"contents": [{"role": "user", "parts": [{"text": issue_titles_prompt}]}]},
+            gem_api_key,
             timeout=60
         )
         response_gemini_issue.raise_for_status()
@@ -256,12 +325,14 @@ def get_issue_headlines(gem_api_key, count=12):
         print(f"Error generating issue headlines: {e}")
         traceback.print_exc()
         return {"error": f"Error generating issue headlines: {e}"}
+    except RateLimitExceeded:
+        raise
     except Exception as e:
         print(f"An unexpected error occurred in get_issue_headlines: {e}")
         return {"error": f"An unexpected error: {e}"}
 
 # --- Full Article Creation Functions (now extract full_content fields) ---
-def create_full_news_article(headline, raw_articles_for_source, gem_api_key):
+def create_full_news_article(headline, raw_articles_for_source, gem_api_key, on_partial=None):
     source_urls_for_gemini = "\n".join([article.url for article in raw_articles_for_source]) if raw_articles_for_source else "No specific sources provided."
 
     prompt_text = (
@@ -301,7 +372,7 @@ def create_full_news_article(headline, raw_articles_for_source, gem_api_key):
     }
 
     print(f"DEBUG: Generating full news article for '{headline}' with AI classification and detailed content.")
-    generated_data = call_gemini_api_with_json_schema(prompt_text, response_schema, gem_api_key)
+    generated_data = call_gemini_api_with_json_schema(prompt_text, response_schema, gem_api_key, on_partial=on_partial)
 
     if generated_data and not generated_data.get("error"):
         title = generated_data.get("title", headline)
@@ -481,50 +552,77 @@ def create_full_issue_article(issue_title, gem_api_key):
         print(f"Error generating full issue article for '{issue_title}': {generated_data.get('error', 'Unknown error')}")
         return None
 
-# --- search_debunked (Updated to use JSON schema for news/fact-check) ---
-def search_debunked(query, gem_api_key, news_api_key):
-    enforce_rate_limit()
-    try:
-        response_classification = requests.post(
-            "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent",
-            headers={'Content-Type': 'application/json'},
-            params={'key': gem_api_key},
-            json={"contents": [{"role": "user", "parts": [{"text": f"Classify the following text/question as 'news', 'general', or 'not english'. Respond with 'n' for news, 'g' for general, or 'c' for not a word.: {query}"}]}]},
-            timeout=60
-        )
-        response_classification.raise_for_status()
-        result_classification = response_classification.json()
-        classification = result_classification["candidates"][0]["content"]["parts"][0]["text"].strip().lower()
-    except Exception as e:
-        print(f"Error in search_debunked (classification): {e}")
-        traceback.print_exc()
-        raise Exception(f"AI classification failed: {e}")
+# --- Batched Article Creation Functions (one Gemini call for N headlines) ---
+ARTICLE_FIELD_INSTRUCTIONS = (
+    "DO NOT refer to yourself as an AI model. DO NOT use any Markdown formatting like italics, bolding, or headings within the generated text content. "
+    "The 'title' should be a concise and engaging article title, not just the headline. "
+    "The 'summary' should be a brief, one-sentence overview. "
+    "The 'summary_detail' should be a comprehensive, multi-paragraph explanation. Ensure it is at least 3 distinct paragraphs, with each paragraph separated by two newline characters (\\n\\n) to ensure proper visual separation, and provides thorough detail. "
+    "The 'key_findings' should be a list of crucial facts, each as a separate string item. Each item must contain actual text, not just an empty string. "
+    "The 'verified_sources' should be a list of objects, each with a 'name' (string) and 'url' (string) for the sources used. Each source must have a valid name and URL. "
+)
+
+BATCH_ARTICLE_KINDS = {
+    "news": {
+        "task": "Create a detailed, in-depth news story for each of the following headlines. Generate a plausible, well-researched news story for each headline.",
+        "viewpoints": "at least 2-3 distinct perspectives or contrasting opinions on the topic",
+        "placeholder_source": "'News Agency' with a placeholder URL like 'https://example.com/news'",
+        "categories": ALLOWED_ARTICLE_CATEGORIES,
+        "id_prefix": "debunkd-news",
+        "image_color": "007bff",
+    },
+    "misconception": {
+        "task": "For each of the following misconceptions, write a detailed article debunking it.",
+        "viewpoints": "at least 2-3 distinct common arguments for and against the misconception, or contrasting interpretations of the evidence",
+        "placeholder_source": "'Fact-Check Org' with a placeholder URL like 'https://example.com/factcheck'",
+        "categories": ALLOWED_MISCONCEPTION_ISSUE_CATEGORIES,
+        "id_prefix": "debunkd-misconception",
+        "image_color": "FF8C00",
+    },
+    "issue": {
+        "task": "For each of the following important issues, write a detailed overview.",
+        "viewpoints": "at least 2-3 distinct angles or contrasting opinions/solutions related to the issue",
+        "placeholder_source": "'Research Institute' with a placeholder URL like 'https://example.com/research'",
+        "categories": ALLOWED_MISCONCEPTION_ISSUE_CATEGORIES,
+        "id_prefix": "debunkd-issue",
+        "image_color": "1A202C",
+    },
+}
+
+def _normalize_headline(headline):
+    return re.sub(r"[^\w]+", " ", str(headline)).strip().lower()
+
+def _create_full_articles_batch(kind, headlines, gem_api_key):
+    """
+    Generates one article per headline in a single Gemini call. Returns a list aligned with
+    `headlines`: the article dict, or None for any headline the model skipped or answered badly.
+    """
+    if not headlines:
+        return []
+    config = BATCH_ARTICLE_KINDS[kind]
+    numbered_headlines = "\n".join(f"{i + 1}. {headline}" for i, headline in enumerate(headlines))
 
-    if "c" in classification:
-        raise Exception("We were not able to interpret your search. Please try explaining more clearly.")
-    elif "g" in classification:
-        # Fact-Check / General Article Generation
-        prompt_text = (
-            f"For the topic '{query}', generate a detailed, in-depth fact-check in JSON format. "
-            f"Classify this fact-check into ONE of the following categories: {', '.join(ALLOWED_MISCONCEPTION_ISSUE_CATEGORIES)}. "
-            f"DO NOT refer to yourself as an AI model. DO NOT use any Markdown formatting like italics, bolding, or headings within the generated text content. "
-            f"The 'title' should be a concise and engaging article title based on the query, not just the query itself. "
-            f"The 'summary' should be a brief, one-sentence overview. "
-            f"The 'summary_detail' should be a comprehensive, multi-paragraph explanation of the fact-check. Ensure it is at least 3 distinct paragraphs, with each paragraph separated by two newline characters (\\n\\n) to ensure proper visual separation, and provides thorough detail. "
-            f"The 'key_findings' should be a list of crucial facts, each as a separate string item. "
-            f"The 'viewpoints' should provide at least 2-3 distinct common arguments for and against the topic, or contrasting interpretations of the evidence, each as a separate string item. " # Enhanced instruction
-            f"The 'verified_sources' should be a list of objects, each with a 'name' and 'url' for the sources used.\n\n"
-            f"Provide the output in JSON format with the following structure:"
-        )
+    prompt_text = (
+        f"{config['task']} "
+        f"Return a JSON array with exactly one object per item, in the same order, and set each object's 'headline' field to the exact item text it answers. "
+        f"Classify each article into ONE of the following categories: {', '.join(config['categories'])}. "
+        f"{ARTICLE_FIELD_INSTRUCTIONS}"
+        f"The 'viewpoints' should provide {config['viewpoints']}, each as a separate string item. Each item must contain actual text, not just an empty string or a colon. "
+        f"If no specific sources are available, provide plausible, general sources like {config['placeholder_source']}.\n\n"
+        f"Items:\n{numbered_headlines}"
+    )
 
-        response_schema = {
+    response_schema = {
+        "type": "ARRAY",
+        "items": {
             "type": "OBJECT",
             "properties": {
+                "headline": {"type": "STRING"},
                 "title": {"type": "STRING"},
                 "summary": {"type": "STRING"},
                 "category": {
                     "type": "STRING",
-                    "enum": ALLOWED_MISCONCEPTION_ISSUE_CATEGORIES
+                    "enum": config["categories"]
                 },
                 "full_content": {
                     "type": "OBJECT",
@@ -536,105 +634,372 @@ def search_debunked(query, gem_api_key, news_api_key):
                     }
                 }
             },
-            "required": ["title", "summary", "category", "full_content"]
+            "required": ["headline", "title", "summary", "category", "full_content"]
         }
+    }
 
-        print(f"DEBUG: Generating general fact-check for '{query}' with AI classification and detailed content.")
-        generated_data = call_gemini_api_with_json_schema(prompt_text, response_schema, gem_api_key)
-
-        if generated_data and not generated_data.get("error"):
-            title = generated_data.get("title", f"Fact-Check: {query}")
-            summary = generated_data.get("summary", "")
-            category = generated_data.get("category", "General")
-            full_content = generated_data.get("full_content", {})
-
-            summary_detail = full_content.get("summary_detail", "")
-            key_findings = full_content.get("key_findings", [])
-            viewpoints = full_content.get("viewpoints", [])
-            verified_sources = full_content.get("verified_sources", [])
-
-            article_id = f"debunkd-search-general-{uuid.uuid4()}"
-            clean_category_for_image = category.replace(' ', '+')
-            image_url = f"https://placehold.co/300x200/5C6BC0/FFFFFF?text={clean_category_for_image}"
-
-            article_obj = {
-                "id": article_id,
-                "title": title,
-                "summary": summary,
-                "category": category,
-                "image_url": image_url,
-                "original_url": "",
-                "summary_detail": summary_detail,
-                "key_insights": key_findings,
-                "viewpoints": viewpoints,
-                "sources": verified_sources
-            }
-            print(f"DEBUG: Generated Search (General) Article: Title='{article_obj['title']}', Category='{article_obj['category']}'")
-            return article_obj
+    print(f"DEBUG: Generating {len(headlines)} {kind} articles in one batched call.")
+    generated_data = call_gemini_api_with_json_schema(prompt_text, response_schema, gem_api_key)
+    if isinstance(generated_data, dict):
+        print(f"Error generating batched {kind} articles: {generated_data.get('error', 'Unexpected response shape')}")
+        return [None] * len(headlines)
+
+    # Map items back to headlines by their echoed 'headline', falling back to position.
+    index_by_headline = {_normalize_headline(h): i for i, h in enumerate(headlines)}
+    assigned = [None] * len(headlines)
+    unmatched = []
+    for position, item in enumerate(generated_data or []):
+        if not isinstance(item, dict):
+            continue
+        index = index_by_headline.get(_normalize_headline(item.get("headline", "")))
+        if index is not None and assigned[index] is None:
+            assigned[index] = item
         else:
-            print(f"Error generating general fact-check: {generated_data.get('error', 'Unknown error')}")
-            raise Exception(f"Error generating general fact-check: {generated_data.get('error', 'Unknown error')}")
+            unmatched.append((position, item))
+    for position, item in unmatched:
+        if position < len(assigned) and assigned[position] is None:
+            assigned[position] = item
+
+    articles = []
+    for headline, item in zip(headlines, assigned):
+        full_content = item.get("full_content") if item else None
+        if not item or not item.get("summary") or not isinstance(full_content, dict) or not full_content.get("summary_detail"):
+            print(f"WARNING: Batched {kind} generation returned no usable article for '{headline}'.")
+            articles.append(None)
+            continue
+
+        category = item.get("category", "General")
+        articles.append({
+            "id": f"{config['id_prefix']}-{uuid.uuid4()}",
+            "title": item.get("title") or headline,
+            "summary": item.get("summary", ""),
+            "category": category,
+            "image_url": f"https://placehold.co/300x200/{config['image_color']}/FFFFFF?text={category.replace(' ', '+')}",
+            "original_url": "",
+            "summary_detail": full_content.get("summary_detail", ""),
+            "key_insights": full_content.get("key_findings", []),
+            "viewpoints": full_content.get("viewpoints", []),
+            "sources": full_content.get("verified_sources", [])
+        })
+
+    print(f"DEBUG: Batched {kind} generation produced {sum(1 for a in articles if a)}/{len(headlines)} articles.")
+    return articles
+
+def create_full_news_articles_batch(headlines, gem_api_key):
+    return _create_full_articles_batch("news", headlines, gem_api_key)
+
+def create_full_misconception_articles_batch(misconception_titles, gem_api_key):
+    return _create_full_articles_batch("misconception", misconception_titles, gem_api_key)
+
+def create_full_issue_articles_batch(issue_titles, gem_api_key):
+    return _create_full_articles_batch("issue", issue_titles, gem_api_key)
+
+# --- Search Helpers ---
+def normalize_search_query(query):
+    """
+    Canonical form of a search query used to coalesce trivially different searches:
+    case, surrounding punctuation and repeated whitespace are ignored.
+    """
+    normalized = re.sub(r"\s+", " ", query).strip().lower()
+    return normalized.strip(" \t\"'.,!?;:")
+
+# --- Search Pipeline Configuration ---
+# 'structured' gets classification and the NewsAPI keyword from one JSON-schema call;
+# 'legacy' keeps the original free-text classification call followed by a keyword call.
+SEARCH_PIPELINE_MODES = ("structured", "legacy")
+SEARCH_PIPELINE_MODE = os.environ.get('SEARCH_PIPELINE_MODE', 'structured').lower()
+if SEARCH_PIPELINE_MODE not in SEARCH_PIPELINE_MODES:
+    print(f"WARNING: Unknown SEARCH_PIPELINE_MODE '{SEARCH_PIPELINE_MODE}'. Using 'structured' (choose from {SEARCH_PIPELINE_MODES}).")
+    SEARCH_PIPELINE_MODE = "structured"
+
+search_stage_timings = {}
+search_stage_timings_lock = threading.Lock()
+
+def record_search_stage(mode, stage, seconds):
+    with search_stage_timings_lock:
+        stage_stats = search_stage_timings.setdefault(mode, {}).setdefault(
+            stage, {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+        )
+        stage_stats["count"] += 1
+        stage_stats["total_seconds"] += seconds
+        stage_stats["max_seconds"] = max(stage_stats["max_seconds"], seconds)
+
+def get_search_stage_timings():
+    """Per-mode, per-stage latency summary (count, average and max seconds)."""
+    with search_stage_timings_lock:
+        return {
+            mode: {
+                stage: {
+                    "count": s["count"],
+                    "avg_seconds": round(s["total_seconds"] / s["count"], 3),
+                    "max_seconds": round(s["max_seconds"], 3)
+                }
+                for stage, s in stages.items()
+            }
+            for mode, stages in search_stage_timings.items()
+        }
 
-    elif "n" in classification:
-        # News Search
-        keyword_prompt = f"Create a single, concise keyword search term for news articles based on the following text. Provide only the keyword(s) without any additional formatting, punctuation, or conversational text. User query: {query}"
-        enforce_rate_limit()
-        try:
-            response_gemini_keyword = requests.post(
-                "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent",
-                headers={'Content-Type': 'application/json'},
-                params={'key': gem_api_key},
-                json={"contents": [{"role": "user", "parts": [{"text": keyword_prompt}]}]},
-                timeout=60
-            )
-            response_gemini_keyword.raise_for_status()
-            result_keyword = response_gemini_keyword.json()
-            keyword_search_term = result_keyword["candidates"][0]["content"]["parts"][0]["text"].strip()
-        except Exception as e:
-            print(f"Error generating search keyword: {e}")
-            traceback.print_exc()
-            raise Exception(f"Error generating search keyword: {e}")
-
-        news_api_url = (f'https://newsapi.org/v2/everything?'
-                        f'q={keyword_search_term}&'
-                        f'sortBy=popularity&'
-                        f'apiKey={news_api_key}')
-
-        enforce_rate_limit()
-        try:
-            response_newsapi = requests.get(news_api_url, timeout=10)
-            response_newsapi.raise_for_status()
-            rsp_json = response_newsapi.json()
-        except requests.exceptions.RequestException as e:
-            print(f"Error fetching news articles from NewsAPI for search: {e}")
-            traceback.print_exc()
-            raise Exception(f"Error fetching news articles from NewsAPI: {e}")
-
-        articles_for_source = []
-        if rsp_json['totalResults'] == 0:
-            raise Exception("Sorry, I didn't find any news articles for that search term. Please try a different query.")
-        else:
-            for article in rsp_json['articles'][:5]:
-                articles_for_source.append(Article(url=article['url'], title=article.get('title', 'No Title')))
+def _classify_query_legacy(query, gem_api_key):
+    gem_api_key = enforce_rate_limit("gemini", gem_api_key)
+    try:
+        response_classification = upstream.gemini_generate(
+            {"contents": [{"role": "user", "parts": [{"text": f"Classify the following text/question as 'news', 'general', or 'not english'. Respond with 'n' for news, 'g' for general, or 'c' for not a word.: {query}"}]}]},
+            gem_api_key,
+            timeout=60
+        )
+        response_classification.raise_for_status()
+        result_classification = response_classification.json()
+        return result_classification["candidates"][0]["content"]["parts"][0]["text"].strip().lower()
+    except RateLimitExceeded:
+        raise
+    except Exception as e:
+        print(f"Error in search_debunked (classification): {e}")
+        traceback.print_exc()
+        raise Exception(f"AI classification failed: {e}")
+
+def _extract_keyword_legacy(query, gem_api_key):
+    keyword_prompt = f"Create a single, concise keyword search term for news articles based on the following text. Provide only the keyword(s) without any additional formatting, punctuation, or conversational text. User query: {query}"
+    gem_api_key = enforce_rate_limit("gemini", gem_api_key)
+    try:
+        response_gemini_keyword = upstream.gemini_generate(
+            {"contents": [{"role": "user", "parts": [{"text": keyword_prompt}]}]},
+            gem_api_key,
+            timeout=60
+        )
+        response_gemini_keyword.raise_for_status()
+        result_keyword = response_gemini_keyword.json()
+        return result_keyword["candidates"][0]["content"]["parts"][0]["text"].strip()
+    except RateLimitExceeded:
+        raise
+    except Exception as e:
+        print(f"Error generating search keyword: {e}")
+        traceback.print_exc()
+        raise Exception(f"Error generating search keyword: {e}")
+
+SEARCH_CLASSIFICATION_CODES = {"news": "n", "general": "g", "uninterpretable": "c"}
+
+def _classify_and_extract_keyword_structured(query, gem_api_key):
+    """
+    Returns (classification_code, keyword) from a single JSON-schema call, or None if the
+    call failed so the caller can fall back to the legacy path.
+    """
+    prompt_text = (
+        f"Classify the following search query. Use 'news' if it asks about current events or recent news, "
+        f"'general' if it is a general question, claim or topic to fact-check, and 'uninterpretable' if it is "
+        f"not a meaningful English query. If it is 'news', also provide 'news_search_keyword': a single, concise "
+        f"keyword search term for finding news articles, without any additional formatting, punctuation, or "
+        f"conversational text. Otherwise leave 'news_search_keyword' empty.\n\nQuery: {query}"
+    )
+    response_schema = {
+        "type": "OBJECT",
+        "properties": {
+            "classification": {"type": "STRING", "enum": list(SEARCH_CLASSIFICATION_CODES)},
+            "news_search_keyword": {"type": "STRING"}
+        },
+        "required": ["classification"]
+    }
+    generated_data = call_gemini_api_with_json_schema(prompt_text, response_schema, gem_api_key)
+    if not isinstance(generated_data, dict) or generated_data.get("error"):
+        error = generated_data.get("error") if isinstance(generated_data, dict) else f"unexpected output {generated_data!r}"
+        print(f"WARNING: Structured search classification failed: {error}. Falling back to legacy pipeline.")
+        return None
 
-        if not articles_for_source:
-            raise Exception("No relevant articles found to generate a news report.")
+    classification = SEARCH_CLASSIFICATION_CODES.get(generated_data.get("classification"))
+    if classification is None:
+        print(f"WARNING: Structured search classification returned unexpected data: {generated_data}. Falling back to legacy pipeline.")
+        return None
+    return classification, (generated_data.get("news_search_keyword") or "").strip()
 
-        generated_news_article = create_full_news_article(
-            articles_for_source[0].title,
-            articles_for_source,
-            gem_api_key
+def _generate_general_fact_check(query, gem_api_key, on_partial=None):
+    # Fact-Check / General Article Generation
+    prompt_text = (
+        f"For the topic '{query}', generate a detailed, in-depth fact-check in JSON format. "
+        f"Classify this fact-check into ONE of the following categories: {', '.join(ALLOWED_MISCONCEPTION_ISSUE_CATEGORIES)}. "
+        f"DO NOT refer to yourself as an AI model. DO NOT use any Markdown formatting like italics, bolding, or headings within the generated text content. "
+        f"The 'title' should be a concise and engaging article title based on the query, not just the query itself. "
+        f"The 'summary' should be a brief, one-sentence overview. "
+        f"The 'summary_detail' should be a comprehensive, multi-paragraph explanation of the fact-check. Ensure it is at least 3 distinct paragraphs, with each paragraph separated by two newline characters (\\n\\n) to ensure proper visual separation, and provides thorough detail. "
+        f"The 'key_findings' should be a list of crucial facts, each as a separate string item. "
+        f"The 'viewpoints' should provide at least 2-3 distinct common arguments for and against the topic, or contrasting interpretations of the evidence, each as a separate string item. " # Enhanced instruction
+        f"The 'verified_sources' should be a list of objects, each with a 'name' and 'url' for the sources used.\n\n"
+        f"Provide the output in JSON format with the following structure:"
+    )
+
+    response_schema = {
+        "type": "OBJECT",
+        "properties": {
+            "title": {"type": "STRING"},
+            "summary": {"type": "STRING"},
+            "category": {
+                "type": "STRING",
+                "enum": ALLOWED_MISCONCEPTION_ISSUE_CATEGORIES
+            },
+            "full_content": {
+                "type": "OBJECT",
+                "properties": {
+                    "summary_detail": {"type": "STRING"},
+                    "key_findings": {"type": "ARRAY", "items": {"type": "STRING"}},
+                    "viewpoints": {"type": "ARRAY", "items": {"type": "STRING"}},
+                    "verified_sources": {"type": "ARRAY", "items": {"type": "OBJECT", "properties": {"name": {"type": "STRING"}, "url": {"type": "STRING"}}}}
+                }
+            }
+        },
+        "required": ["title", "summary", "category", "full_content"]
+    }
+
+    print(f"DEBUG: Generating general fact-check for '{query}' with AI classification and detailed content.")
+    generated_data = call_gemini_api_with_json_schema(prompt_text, response_schema, gem_api_key, on_partial=on_partial)
+
+    if generated_data and not generated_data.get("error"):
+        title = generated_data.get("title", f"Fact-Check: {query}")
+        summary = generated_data.get("summary", "")
+        category = generated_data.get("category", "General")
+        full_content = generated_data.get("full_content", {})
+
+        summary_detail = full_content.get("summary_detail", "")
+        key_findings = full_content.get("key_findings", [])
+        viewpoints = full_content.get("viewpoints", [])
+        verified_sources = full_content.get("verified_sources", [])
+
+        article_id = f"debunkd-search-general-{uuid.uuid4()}"
+        clean_category_for_image = category.replace(' ', '+')
+        image_url = f"https://placehold.co/300x200/5C6BC0/FFFFFF?text={clean_category_for_image}"
+
+        article_obj = {
+            "id": article_id,
+            "title": title,
+            "summary": summary,
+            "category": category,
+            "image_url": image_url,
+            "original_url": "",
+            "summary_detail": summary_detail,
+            "key_insights": key_findings,
+            "viewpoints": viewpoints,
+            "sources": verified_sources
+        }
+        print(f"DEBUG: Generated Search (General) Article: Title='{article_obj['title']}', Category='{article_obj['category']}'")
+        return article_obj
+    else:
+        print(f"Error generating general fact-check: {generated_data.get('error', 'Unknown error')}")
+        raise Exception(f"Error generating general fact-check: {generated_data.get('error', 'Unknown error')}")
+
+def _fetch_news_sources_for_search(keyword_search_term, news_api_key):
+    enforce_rate_limit("newsapi", news_api_key)
+    try:
+        response_newsapi = upstream.newsapi_get(
+            'everything',
+            {'q': keyword_search_term, 'sortBy': 'popularity'},
+            news_api_key,
+            timeout=10
         )
-        
-        if generated_news_article:
-            generated_news_article['original_url'] = articles_for_source[0].url if articles_for_source else generated_news_article.get('original_url', '')
-            
-            if not generated_news_article.get('title'):
-                generated_news_article['title'] = f"News Report: {query}"
-            print(f"DEBUG: Generated Search (News) Article: Title='{generated_news_article['title']}', Category='{generated_news_article['category']}'")
-            return generated_news_article
+        response_newsapi.raise_for_status()
+        rsp_json = response_newsapi.json()
+    except requests.exceptions.RequestException as e:
+        print(f"Error fetching news articles from NewsAPI for search: {e}")
+        traceback.print_exc()
+        raise Exception(f"Error fetching news articles from NewsAPI: {e}")
+
+    articles_for_source = []
+    if rsp_json['totalResults'] == 0:
+        raise Exception("Sorry, I didn't find any news articles for that search term. Please try a different query.")
+    else:
+        for article in rsp_json['articles'][:5]:
+            articles_for_source.append(Article(url=article['url'], title=article.get('title', 'No Title')))
+
+    if not articles_for_source:
+        raise Exception("No relevant articles found to generate a news report.")
+    return articles_for_source
+
+def _generate_news_search_article(query, articles_for_source, gem_api_key, on_partial=None):
+    generated_news_article = create_full_news_article(
+        articles_for_source[0].title,
+        articles_for_source,
+        gem_api_key,
+        on_partial=on_partial
+    )
+
+    if generated_news_article:
+        generated_news_article['original_url'] = articles_for_source[0].url if articles_for_source else generated_news_article.get('original_url', '')
+
+        if not generated_news_article.get('title'):
+            generated_news_article['title'] = f"News Report: {query}"
+        print(f"DEBUG: Generated Search (News) Article: Title='{generated_news_article['title']}', Category='{generated_news_article['category']}'")
+        return generated_news_article
+    else:
+        raise Exception("Failed to generate a detailed news report for your query.")
+
+# --- search_debunked (Updated to use JSON schema for news/fact-check) ---
+def search_debunked(query, gem_api_key, news_api_key, mode=None, on_event=None):
+    """
+    Classifies the query and returns a generated fact-check or news article.
+    If on_event is given it is called as on_event(name, data) with 'stage' progress events and,
+    while the article is generated, 'partial_article' events carrying the fields parsed so far.
+    """
+    mode = mode or SEARCH_PIPELINE_MODE
+    if mode not in SEARCH_PIPELINE_MODES:
+        print(f"WARNING: Unknown search pipeline mode '{mode}'. Using 'structured'.")
+        mode = "structured"
+    keyword_search_term = None
+
+    def emit(name, data):
+        if on_event is not None:
+            on_event(name, data)
+
+    def _emit_partial(text_so_far):
+        partial = parse_partial_json(text_so_far)
+        if isinstance(partial, dict):
+            emit("partial_article", partial)
+
+    on_partial = _emit_partial if on_event is not None else None
+
+    stage_start = time.monotonic()
+    local_result = query_classifier.classify(query)
+    if local_result is not None:
+        # Confident local classification skips the LLM classification call entirely.
+        classification, confidence = local_result
+        if classification == "n":
+            keyword_search_term = query_classifier.extract_news_keyword(query)
+        print(f"DEBUG: Local classifier labelled '{query}' as '{classification}' ({confidence:.2f}).")
+        mode = "local"
+        record_search_stage(mode, "classify", time.monotonic() - stage_start)
+    elif mode == "structured":
+        structured_result = _classify_and_extract_keyword_structured(query, gem_api_key)
+        if structured_result is None:
+            mode = "legacy"
         else:
-            raise Exception("Failed to generate a detailed news report for your query.")
+            classification, keyword_search_term = structured_result
+            record_search_stage(mode, "classify_and_keyword", time.monotonic() - stage_start)
+    if mode == "legacy":
+        stage_start = time.monotonic()  # A failed structured call is not part of the legacy timing
+        classification = _classify_query_legacy(query, gem_api_key)
+        record_search_stage(mode, "classify", time.monotonic() - stage_start)
+
+    if "c" in classification:
+        raise Exception("We were not able to interpret your search. Please try explaining more clearly.")
+    elif "g" in classification:
+        emit("stage", {"stage": "classified", "classification": "general"})
+        stage_start = time.monotonic()
+        article = _generate_general_fact_check(query, gem_api_key, on_partial=on_partial)
+        record_search_stage(mode, "generate_fact_check", time.monotonic() - stage_start)
+        return article
+    elif "n" in classification:
+        # News Search
+        emit("stage", {"stage": "classified", "classification": "news"})
+        if not keyword_search_term:
+            stage_start = time.monotonic()
+            keyword_search_term = _extract_keyword_legacy(query, gem_api_key)
+            record_search_stage(mode, "keyword", time.monotonic() - stage_start)
+        emit("stage", {"stage": "keyword", "keyword": keyword_search_term})
+
+        stage_start = time.monotonic()
+        articles_for_source = _fetch_news_sources_for_search(keyword_search_term, news_api_key)
+        record_search_stage(mode, "newsapi", time.monotonic() - stage_start)
+        emit("stage", {"stage": "sources", "sources": [{"title": a.title, "url": a.url} for a in articles_for_source]})
+
+        stage_start = time.monotonic()
+        article = _generate_news_search_article(query, articles_for_source, gem_api_key, on_partial=on_partial)
+        record_search_stage(mode, "generate_news", time.monotonic() - stage_start)
+        return article
     else:
         raise Exception("Unexpected classification from AI.")
     
@@ -643,13 +1008,11 @@ def learn_chat(history, question, gem_api_key):
 
     contents_for_model = [{"role": "user", "parts": [{"text": context_message}]}] + history + [{"role": "user", "parts": [{"text": question}]}]
 
-    enforce_rate_limit()
+    gem_api_key = enforce_rate_limit("gemini", gem_api_key)
     try:
-        response = requests.post(
-            "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent",
-            headers={'Content-Type': 'application/json'},
-            params={'key': gem_api_key},
-            json={"contents": contents_for_model},
+        response = upstream.gemini_generate(
+            {"contents": contents_for_model},
+            gem_api_key,
             timeout=60
         )
         response.raise_for_status()
@@ -667,6 +1030,8 @@ def learn_chat(history, question, gem_api_key):
         print(f"Error in learn_chat: {e}")
         traceback.print_exc()
         return "Sorry, I'm having trouble responding right now. Please try again.", history + [{"role": "user", "parts": [{"text": question}]}]
+    except RateLimitExceeded:
+        raise
     except Exception as e:
         print(f"An unexpected error occurred in learn_chat: {e}")
         return "Sorry, I'm having trouble responding right now. Please try again.", history + [{"role": "user", "parts": [{"text": question}]}]
\ No newline at end of file
@@ -0,0 +1,280 @@
+"""
+Copy-on-write store of immutable, versioned feed snapshots
+"""
+import gzip
+import json
+import os
+import threading
+import time
+import uuid
+from types import MappingProxyType
+from typing import Mapping, NamedTuple
+
+try:
+    import orjson  # Optional: several times faster JSON encoding
+except ImportError:
+    orjson = None
+
+try:
+    import brotli  # Optional: enables the 'br' payload variant
+except ImportError:
+    brotli = None
+
+FEED_CHANGE_LOG_SIZE = int(os.environ.get('FEED_CHANGE_LOG_SIZE', 256))
+FEED_PAGE_SIZE = int(os.environ.get('FEED_PAGE_SIZE', 12))
+FEED_MAX_PAGE_SIZE = int(os.environ.get('FEED_MAX_PAGE_SIZE', 100))
+FEED_COMPRESSION_MIN_BYTES = int(os.environ.get('FEED_COMPRESSION_MIN_BYTES', 1024))
+GZIP_LEVEL = 9  # Payloads are compressed once per version, so favour ratio over speed
+BROTLI_QUALITY = 9
+
+# Fields the feed grid needs to draw an article card
+CARD_FIELDS = ("id", "title", "summary", "category", "category_color")
+
+
+def article_card(article):
+    """Projects a full article down to the fields of its feed card."""
+    return {field: article.get(field) for field in CARD_FIELDS}
+
+
+def dumps(value):
+    """Compact JSON text, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(value).decode("utf-8")
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def json_object(fields, raw_fields=None):
+    """Serializes `fields` as a JSON object, splicing in `raw_fields` whose values are already JSON text."""
+    parts = [f"{dumps(key)}:{dumps(value)}" for key, value in fields.items()]
+    parts += [f"{dumps(key)}:{text}" for key, text in (raw_fields or {}).items()]
+    return "{" + ",".join(parts) + "}"
+
+
+def encode_payload(text):
+    """Returns {content_encoding: bytes} with the identity, gzip and (if available) brotli variants of `text`."""
+    raw = text.encode("utf-8")
+    variants = {"identity": raw}
+    if len(raw) >= FEED_COMPRESSION_MIN_BYTES:
+        variants["gzip"] = gzip.compress(raw, compresslevel=GZIP_LEVEL, mtime=0)
+        if brotli is not None:
+            variants["br"] = brotli.compress(raw, quality=BROTLI_QUALITY)
+    return variants
+
+
+class FeedChange(NamedTuple):
+    version: int
+    sections: Mapping[str, tuple]  # section name -> (added ids, removed ids); only changed sections
+
+
+class FeedSnapshot(NamedTuple):
+    version: int
+    sections: Mapping[str, tuple]  # section name -> tuple of article dicts, oldest first
+    initial_generation_complete: bool
+    published_at: float
+    etag: str  # Strong validator: unique per (store instance, version)
+    cards: Mapping[str, tuple]  # section name -> pre-serialized card JSON per article, parallel to `sections`
+    changes: tuple  # FeedChange entries for the most recent versions, oldest first
+
+
+class FeedStore:
+    """
+    Readers call current() and get an immutable snapshot without taking any lock. Writers are
+    serialized by a private lock, build the next snapshot from the current one and swap the
+    reference in a single assignment, so a reader never waits on a writer or the generator.
+
+    Every version also records which article ids it added to or removed from each section, keeping
+    the last `change_log_size` versions so clients can sync deltas instead of the whole feed.
+
+    Versions are normally assigned in sequence, but a replica can publish with explicit versions
+    so that every process serving a shared feed hands out the same versions and ETags.
+    `initial_generation_complete` is derived from `section_targets` (minimum articles per section).
+
+    Article dicts inside a snapshot are shared between versions and must be treated as read-only.
+    """
+    def __init__(self, section_names, change_log_size=FEED_CHANGE_LOG_SIZE, section_targets=None):
+        self._write_lock = threading.Lock()
+        self._published = threading.Condition()  # Notified after every publish; used by wait_for_version()
+        self._payload_lock = threading.Lock()  # Guards _payloads and _payload_key_locks only; held briefly
+        self._payload_key_locks = {}  # key -> lock held while that key's body is built and compressed
+        self._payloads = (0, {})  # (version, {key: encode_payload() result}) for the latest version only
+        self.change_log_size = change_log_size
+        self.section_targets = dict(section_targets or {})
+        # ETags carry an instance id so they stay unique if versions ever restart at 0 (see restore()).
+        self.instance_id = uuid.uuid4().hex[:12]
+        self._snapshot = self._empty_snapshot(section_names, 0)
+
+    def _empty_snapshot(self, section_names, version):
+        return FeedSnapshot(
+            version=version,
+            sections=MappingProxyType({name: () for name in section_names}),
+            initial_generation_complete=False,
+            published_at=time.time(),
+            etag=self._etag(version),
+            cards=MappingProxyType({name: () for name in section_names}),
+            changes=()
+        )
+
+    def _etag(self, version):
+        return f"feed-{self.instance_id}-{version}"
+
+    def current(self):
+        return self._snapshot
+
+    def _is_complete(self, sections):
+        return bool(self.section_targets) and all(
+            len(sections[name]) >= target for name, target in self.section_targets.items()
+        )
+
+    def _publish(self, sections, version=None):
+        # Caller must hold _write_lock.
+        previous = self._snapshot
+        if version is None:
+            version = previous.version + 1
+        elif version <= previous.version:
+            raise ValueError(f"Feed version {version} is not newer than the current version {previous.version}.")
+        new_sections = dict(previous.sections)
+        new_cards = dict(previous.cards)
+        changed = {}
+        for name, articles in (sections or {}).items():
+            articles = tuple(articles)
+            old_ids = {a["id"] for a in previous.sections[name]}
+            new_ids = {a["id"] for a in articles}
+            added = tuple(a["id"] for a in articles if a["id"] not in old_ids)
+            removed = tuple(a["id"] for a in previous.sections[name] if a["id"] not in new_ids)
+            if added or removed:
+                changed[name] = (added, removed)
+            new_sections[name] = articles
+            # Cards are serialized once per article and reused by every later version.
+            known_cards = dict(zip((a["id"] for a in previous.sections[name]), previous.cards[name]))
+            new_cards[name] = tuple(
+                known_cards.get(a["id"]) or dumps(article_card(a)) for a in articles
+            )
+        # Every version gets an entry (possibly empty) so the log has no gaps.
+        changes = (previous.changes + (FeedChange(version, MappingProxyType(changed)),))[-self.change_log_size:]
+        snapshot = FeedSnapshot(
+            version=version,
+            sections=MappingProxyType(new_sections),
+            initial_generation_complete=self._is_complete(new_sections),
+            published_at=time.time(),
+            etag=self._etag(version),
+            cards=MappingProxyType(new_cards),
+            changes=changes
+        )
+        self._snapshot = snapshot
+        with self._published:
+            self._published.notify_all()
+        return snapshot
+
+    def append_articles(self, section, articles, version=None):
+        """Publishes a new version with `articles` appended to `section`."""
+        return self.append({section: articles}, version)
+
+    def append(self, appends, version=None):
+        """Publishes one new version appending {section: articles}. `version` defaults to the next one."""
+        appends = {name: tuple(articles) for name, articles in appends.items() if articles}
+        if not appends:
+            return self._snapshot
+        with self._write_lock:
+            return self._publish({name: self._snapshot.sections[name] + articles for name, articles in appends.items()}, version)
+
+    def restore(self, sections, version, instance_id=None):
+        """
+        Replaces the whole feed with persisted state, e.g. on a warm start: publishes `sections` as
+        `version` under `instance_id`, so clients' ETags and versions stay valid across restarts.
+        The change log starts empty, so older clients get a resync.
+        """
+        with self._write_lock:
+            if instance_id:
+                self.instance_id = instance_id
+            names = self._snapshot.sections.keys()
+            self._snapshot = self._empty_snapshot(names, version - 1)
+            self._payloads = (version, {})
+            self._snapshot = self._publish(sections, version)._replace(changes=())
+            return self._snapshot
+
+    def encoded_payload(self, snapshot, key, build):
+        """
+        Returns encode_payload(build(snapshot)), memoized per (snapshot version, key) so each response body is
+        serialized and compressed once per version no matter how many clients request it. Each key is built
+        under its own lock, so one slow body never holds up requests for another. Callers should use a small,
+        fixed set of keys.
+        """
+        version, payloads = self._payloads
+        if version == snapshot.version and key in payloads:
+            return payloads[key]
+        with self._payload_lock:
+            version, payloads = self._payloads
+            if version < snapshot.version:
+                self._payloads = (snapshot.version, {})
+            key_lock = self._payload_key_locks.setdefault(key, threading.Lock())
+        if version > snapshot.version:
+            return encode_payload(build(snapshot))  # Caller holds a superseded snapshot: don't cache it
+
+        with key_lock:
+            version, payloads = self._payloads
+            if version == snapshot.version and key in payloads:
+                return payloads[key]  # Built by the request we waited for
+            encoded = encode_payload(build(snapshot))
+            with self._payload_lock:
+                version, payloads = self._payloads
+                if version == snapshot.version:
+                    payloads[key] = encoded
+            return encoded
+
+    def wait_for_version(self, after, timeout=None):
+        """Blocks until a version newer than `after` is published or `timeout` elapses, then returns the current snapshot."""
+        with self._published:
+            self._published.wait_for(lambda: self._snapshot.version > after, timeout)
+        return self._snapshot
+
+    def section_size(self, section):
+        return len(self._snapshot.sections[section])
+
+    def changes_since(self, since):
+        """
+        Returns (snapshot, delta) where delta maps each section to {"added": [articles], "removed": [ids]}
+        for everything published after version `since`. delta is None when the change log no longer
+        reaches back that far (or `since` is from the future), meaning the client must resync in full.
+        """
+        snapshot = self._snapshot
+        if since == snapshot.version:
+            return snapshot, {name: {"added": [], "removed": []} for name in snapshot.sections}
+        if since > snapshot.version or not snapshot.changes or snapshot.changes[0].version > since + 1:
+            return snapshot, None
+
+        added = {name: {} for name in snapshot.sections}  # dicts keep insertion order and dedupe ids
+        removed = {name: {} for name in snapshot.sections}
+        for change in snapshot.changes:
+            if change.version <= since:
+                continue
+            for name, (added_ids, removed_ids) in change.sections.items():
+                for article_id in removed_ids:
+                    if added[name].pop(article_id, None) is None:
+                        removed[name][article_id] = True
+                for article_id in added_ids:
+                    removed[name].pop(article_id, None)
+                    added[name][article_id] = True
+
+        delta = {}
+        for name, articles in snapshot.sections.items():
+            by_id = {a["id"]: a for a in articles if a["id"] in added[name]}
+            delta[name] = {
+                "added": [by_id[article_id] for article_id in added[name] if article_id in by_id],
+                "removed": list(removed[name]),
+            }
+        return snapshot, delta
+
+
+def render_page(snapshot, section, fields="card", cursor=0, limit=None):
+    """
+    Returns (json_text, next_cursor) for up to `limit` articles of `section` starting at `cursor`.
+    Card pages are joined from the pre-serialized cards without re-encoding anything.
+    The cursor is an opaque position; next_cursor is None on the last page.
+    """
+    end = len(snapshot.sections[section]) if limit is None else cursor + limit
+    if fields == "card":
+        text = "[" + ",".join(snapshot.cards[section][cursor:end]) + "]"
+    else:
+        text = dumps(list(snapshot.sections[section][cursor:end]))
+    next_cursor = str(end) if end < len(snapshot.sections[section]) else None
+    return text, next_cursor
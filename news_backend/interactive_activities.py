@@ -1,18 +1,44 @@
 """
-Interactive activities for Knowledge Hub lessons using Gemini API
+Interactive activities for Knowledge Hub lessons using Gemini API.
+Each call goes through the pooled upstream client with its own key (for the server key, a pool
+key), so retries, key cooldowns, the circuit breaker and the rate limit apply, and
+RateLimitExceeded propagates to the caller.
 """
-import google.generativeai as genai
-import time
+from news_backend import upstream
+from news_backend.debunked import enforce_rate_limit
+from news_backend.rate_limit import RateLimitExceeded
 
 API_CALL_DELAY = 1  # Delay between API calls in seconds
+ACTIVITY_MODEL = "gemini-1.5-flash"
+
+def generate_analysis(prompt, gemini_api_key):
+    """Sends an activity prompt to Gemini and returns {"success", "analysis"} or {"success", "error"}."""
+    api_key = enforce_rate_limit("gemini", gemini_api_key)  # Fails fast while the Gemini breaker is open
+    try:
+        response = upstream.gemini_generate(
+            {"contents": [{"role": "user", "parts": [{"text": prompt}]}]},
+            api_key,
+            timeout=60,
+            model=ACTIVITY_MODEL
+        )
+        response.raise_for_status()
+        result = response.json()
+        return {
+            "success": True,
+            "analysis": result["candidates"][0]["content"]["parts"][0]["text"]
+        }
+    except RateLimitExceeded:
+        raise
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }
 
 def analyze_bias(text, gemini_api_key):
     """
     Analyzes text for various types of bias
     """
-    genai.configure(api_key=gemini_api_key)
-    model = genai.GenerativeModel('gemini-1.5-flash')
-    
     prompt = f"""Analyze the following text for bias. Identify:
 1. Types of bias present (political, personal, commercial, cultural, etc.)
 2. Specific examples of biased language or framing
@@ -26,25 +52,12 @@ Text to analyze:
 Provide your analysis in a clear, educational format suitable for students learning about media literacy.
 Format your response with clear sections using markdown."""
     
-    try:
-        response = model.generate_content(prompt)
-        return {
-            "success": True,
-            "analysis": response.text
-        }
-    except Exception as e:
-        return {
-            "success": False,
-            "error": str(e)
-        }
+    return generate_analysis(prompt, gemini_api_key)
 
 def analyze_framing(headline, gemini_api_key):
     """
     Analyzes how a headline frames an issue
     """
-    genai.configure(api_key=gemini_api_key)
-    model = genai.GenerativeModel('gemini-1.5-flash')
-    
     prompt = f"""Analyze how this headline frames the issue:
 
 Headline: "{headline}"
@@ -61,25 +74,12 @@ Provide 2-3 alternative headlines that frame the same story differently, and exp
 
 Format your response clearly with sections using markdown."""
     
-    try:
-        response = model.generate_content(prompt)
-        return {
-            "success": True,
-            "analysis": response.text
-        }
-    except Exception as e:
-        return {
-            "success": False,
-            "error": str(e)
-        }
+    return generate_analysis(prompt, gemini_api_key)
 
 def verify_source(url, gemini_api_key):
     """
     Provides guidance on verifying a source
     """
-    genai.configure(api_key=gemini_api_key)
-    model = genai.GenerativeModel('gemini-1.5-flash')
-    
     prompt = f"""Provide a comprehensive guide for verifying this source:
 
 URL: {url}
@@ -96,25 +96,12 @@ Also explain what makes a source credible in general.
 
 Format your response as an actionable checklist using markdown."""
     
-    try:
-        response = model.generate_content(prompt)
-        return {
-            "success": True,
-            "analysis": response.text
-        }
-    except Exception as e:
-        return {
-            "success": False,
-            "error": str(e)
-        }
+    return generate_analysis(prompt, gemini_api_key)
 
 def analyze_deepfake_signs(description, gemini_api_key):
     """
     Analyzes a description of media for potential deepfake indicators
     """
-    genai.configure(api_key=gemini_api_key)
-    model = genai.GenerativeModel('gemini-1.5-flash')
-    
     prompt = f"""Based on this description of an image or video, analyze potential deepfake indicators:
 
 Description: {description}
@@ -130,25 +117,12 @@ Explain your reasoning in educational terms suitable for students learning to sp
 
 Format your response with clear sections using markdown."""
     
-    try:
-        response = model.generate_content(prompt)
-        return {
-            "success": True,
-            "analysis": response.text
-        }
-    except Exception as e:
-        return {
-            "success": False,
-            "error": str(e)
-        }
+    return generate_analysis(prompt, gemini_api_key)
 
 def analyze_algorithm_impact(social_media_description, gemini_api_key):
     """
     Analyzes how social media algorithms might affect content visibility
     """
-    genai.configure(api_key=gemini_api_key)
-    model = genai.GenerativeModel('gemini-1.5-flash')
-    
     prompt = f"""Analyze how social media algorithms might handle this content:
 
 Content description: {social_media_description}
@@ -164,25 +138,12 @@ Use real examples and explain in terms students can understand.
 
 Format your response with clear sections using markdown."""
     
-    try:
-        response = model.generate_content(prompt)
-        return {
-            "success": True,
-            "analysis": response.text
-        }
-    except Exception as e:
-        return {
-            "success": False,
-            "error": str(e)
-        }
+    return generate_analysis(prompt, gemini_api_key)
 
 def check_copyright_fair_use(use_case, gemini_api_key):
     """
     Evaluates whether a use case might qualify as fair use
     """
-    genai.configure(api_key=gemini_api_key)
-    model = genai.GenerativeModel('gemini-1.5-flash')
-    
     prompt = f"""Evaluate this use case for copyright fair use:
 
 Use case: {use_case}
@@ -203,14 +164,4 @@ Remember: This is educational analysis, not legal advice.
 
 Format your response with clear sections using markdown."""
     
-    try:
-        response = model.generate_content(prompt)
-        return {
-            "success": True,
-            "analysis": response.text
-        }
-    except Exception as e:
-        return {
-            "success": False,
-            "error": str(e)
-        }
\ No newline at end of file
+    return generate_analysis(prompt, gemini_api_key)
\ No newline at end of file
@@ -0,0 +1,172 @@
+"""
+Pool of server API keys per upstream, routing each call to the least-loaded healthy key
+"""
+import contextlib
+import os
+import threading
+import time
+
+from news_backend import rate_limit
+from news_backend.rate_limit import RateLimitExceeded, key_fingerprint
+
+# Comma-separated server Gemini keys; GEMINI_API_KEY, if set, joins the pool too
+GEMINI_API_KEYS = [key.strip() for key in os.environ.get('GEMINI_API_KEYS', '').split(',') if key.strip()]
+# How long a key sits out after a 429 that carries no Retry-After hint
+KEY_COOLDOWN_SECONDS = float(os.environ.get('KEY_COOLDOWN_SECONDS', 60))
+
+
+class KeyPool:
+    """
+    Server keys for one upstream. Each key has its own rate-limit bucket, and a key that gets a 429
+    cools down for the Retry-After period (or `cooldown_seconds`) while calls move to the other keys.
+    Any pool key passed to acquire() stands for the whole pool; keys outside it (user-supplied keys)
+    are used as given.
+    """
+    def __init__(self, upstream, keys, cooldown_seconds=KEY_COOLDOWN_SECONDS):
+        self.upstream = upstream
+        self.keys = list(dict.fromkeys(key for key in keys if key))
+        self.cooldown_seconds = cooldown_seconds
+        self._lock = threading.Lock()
+        self._cooldown_until = {key: 0.0 for key in self.keys}
+        self._in_flight = {key: 0 for key in self.keys}
+        self.counters = {key: {"calls": 0, "throttled": 0, "errors": 0} for key in self.keys}
+
+    def __contains__(self, api_key):
+        return api_key in self._cooldown_until
+
+    def _cooldown_remaining(self, key, now):
+        return max(0.0, self._cooldown_until[key] - now)
+
+    def _load(self, key, now):
+        # Sort key: shortest wait (cooldown or token), then fewest calls in flight, then fewest calls so far
+        with self._lock:
+            cooldown = self._cooldown_remaining(key, now)
+            in_flight = self._in_flight[key]
+            calls = self.counters[key]["calls"]
+        return (max(cooldown, rate_limit.estimate_wait(self.upstream, key)), in_flight, calls)
+
+    def choose(self, api_key):
+        """Returns the key to call with: `api_key` itself unless it is a pool key."""
+        if api_key not in self:
+            return api_key
+        now = time.monotonic()
+        return min(self.keys, key=lambda key: self._load(key, now))
+
+    def estimate_wait(self, api_key):
+        """Seconds until a call with `api_key` (or, for a pool key, the best pool key) could start."""
+        if api_key not in self:
+            return rate_limit.estimate_wait(self.upstream, api_key)
+        now = time.monotonic()
+        return min(self._load(key, now)[0] for key in self.keys)
+
+    def acquire(self, api_key, timeout=None):
+        """
+        Picks a key, waits out its cooldown and takes a rate-limit token for it, honouring the thread's
+        rate_limit.deadline(). Returns the chosen key. Raises RateLimitExceeded if that takes too long.
+        """
+        key = self.choose(api_key)
+        if key in self:
+            with self._lock:
+                cooldown = self._cooldown_remaining(key, time.monotonic())
+            if cooldown > 0:
+                remaining = rate_limit.time_remaining()
+                if timeout is not None:
+                    remaining = timeout if remaining is None else min(timeout, remaining)
+                if remaining is not None and remaining < cooldown:
+                    raise RateLimitExceeded(self.upstream, cooldown)
+                print(f"DEBUG: All {self.upstream} keys are cooling down. Waiting {cooldown:.1f} seconds.")
+                time.sleep(cooldown)
+                if timeout is not None:
+                    timeout = max(0.0, timeout - cooldown)
+        rate_limit.acquire(self.upstream, key, timeout)
+        if key in self:
+            with self._lock:  # Only once the token is taken, so timed-out acquisitions do not skew _load()
+                self.counters[key]["calls"] += 1
+        return key
+
+    @contextlib.contextmanager
+    def in_flight(self, api_key):
+        """Counts a call made with `api_key` as in flight for load balancing."""
+        if api_key not in self:
+            yield
+            return
+        with self._lock:
+            self._in_flight[api_key] += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight[api_key] -= 1
+
+    def report(self, api_key, status_code, retry_after=None):
+        """Records an upstream response status; a 429 puts the key into cooldown."""
+        if api_key not in self:
+            return
+        with self._lock:
+            if status_code == 429:
+                cooldown = retry_after if retry_after is not None else self.cooldown_seconds
+                self._cooldown_until[api_key] = max(self._cooldown_until[api_key], time.monotonic() + cooldown)
+                self.counters[api_key]["throttled"] += 1
+            elif status_code >= 500:
+                self.counters[api_key]["errors"] += 1
+        if status_code == 429:
+            print(f"WARNING: {self.upstream} key {key_fingerprint(api_key)} throttled; cooling down for {cooldown:.0f} seconds.")
+
+    def stats(self):
+        now = time.monotonic()
+        buckets = rate_limit.stats()
+        with self._lock:
+            return {
+                key_fingerprint(key): {
+                    **self.counters[key],
+                    "in_flight": self._in_flight[key],
+                    "cooldown_seconds": round(self._cooldown_remaining(key, now), 1),
+                    "healthy": self._cooldown_remaining(key, now) == 0,
+                    "tokens": buckets.get(f"{self.upstream}:{key_fingerprint(key)}", {}).get("tokens"),
+                }
+                for key in self.keys
+            }
+
+
+# --- Pool Registry ---
+pools = {
+    "gemini": KeyPool("gemini", GEMINI_API_KEYS + [os.environ.get('GEMINI_API_KEY')]),
+}
+
+
+def get_pool(upstream):
+    return pools.get(upstream)
+
+
+def acquire(upstream, api_key, timeout=None):
+    """Like rate_limit.acquire(), but returns the key to use, which may be another key of the same pool."""
+    pool = get_pool(upstream)
+    if pool is None:
+        rate_limit.acquire(upstream, api_key, timeout)
+        return api_key
+    return pool.acquire(api_key, timeout)
+
+
+def estimate_wait(upstream, api_key):
+    pool = get_pool(upstream)
+    return pool.estimate_wait(api_key) if pool is not None else rate_limit.estimate_wait(upstream, api_key)
+
+
+@contextlib.contextmanager
+def in_flight(upstream, api_key):
+    pool = get_pool(upstream)
+    if pool is None:
+        yield
+    else:
+        with pool.in_flight(api_key):
+            yield
+
+
+def report(upstream, api_key, status_code, retry_after=None):
+    pool = get_pool(upstream)
+    if pool is not None:
+        pool.report(api_key, status_code, retry_after)
+
+
+def stats():
+    return {upstream: pool.stats() for upstream, pool in pools.items()}
@@ -0,0 +1,114 @@
+"""
+Leader election between processes sharing one SQLite database, using a renewable lease
+"""
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+
+LEADER_LEASE_SECONDS = float(os.environ.get('LEADER_LEASE_SECONDS', 15))
+
+
+class LeaderElection:
+    """
+    At most one process holds the `name` lease at a time. The holder renews it every third of
+    `lease_seconds`; if it stops renewing (crash, hang, shutdown) another process takes over once
+    the lease expires. `on_elected` / `on_demoted` run on the election thread when this process
+    gains or loses the lease.
+    """
+    def __init__(self, db_path, name, lease_seconds=LEADER_LEASE_SECONDS, on_elected=None, on_demoted=None):
+        self.db_path = db_path
+        self.name = name
+        self.lease_seconds = lease_seconds
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.owner_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.is_leader = False
+        self._db = None
+        self._thread = None
+        self._stopping = threading.Event()
+        self.counters = {"elections_won": 0, "demotions": 0, "errors": 0}
+
+    def _connect(self):
+        # Opened on the election thread, after any fork by the WSGI server.
+        db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS leader_leases ("
+            "name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        return db
+
+    def _try_acquire(self):
+        """Takes or renews the lease if it is free, expired or already ours. Returns True if we hold it."""
+        now = time.time()
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            row = self._db.execute("SELECT owner, expires_at FROM leader_leases WHERE name = ?", (self.name,)).fetchone()
+            if row is None or row[0] == self.owner_id or row[1] < now:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO leader_leases (name, owner, expires_at) VALUES (?, ?, ?)",
+                    (self.name, self.owner_id, now + self.lease_seconds)
+                )
+                held = True
+            else:
+                held = False
+            self._db.execute("COMMIT")
+        except sqlite3.Error:
+            self._db.execute("ROLLBACK")
+            raise
+        return held
+
+    def _set_leader(self, leader):
+        if leader == self.is_leader:
+            return
+        self.is_leader = leader
+        self.counters["elections_won" if leader else "demotions"] += 1
+        print(f"DEBUG: Leader election '{self.name}': {self.owner_id} is {'now the leader' if leader else 'no longer the leader'}.")
+        callback = self.on_elected if leader else self.on_demoted
+        if callback is not None:
+            try:
+                callback()
+            except Exception as e:
+                print(f"ERROR: Leader election '{self.name}': callback failed: {e}")
+                traceback.print_exc()
+
+    def _run(self):
+        self._db = self._connect()
+        while not self._stopping.is_set():
+            try:
+                self._set_leader(self._try_acquire())
+            except sqlite3.Error as e:
+                # Can't prove we still hold the lease, so stop acting as leader.
+                print(f"WARNING: Leader election '{self.name}': lease check failed: {e}")
+                self.counters["errors"] += 1
+                self._set_leader(False)
+            self._stopping.wait(self.lease_seconds / 3)
+
+        if self.is_leader:
+            self._set_leader(False)
+            try:
+                self._db.execute("DELETE FROM leader_leases WHERE name = ? AND owner = ?", (self.name, self.owner_id))
+            except sqlite3.Error as e:
+                print(f"WARNING: Leader election '{self.name}': could not release the lease: {e}")
+        self._db.close()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name=f"leader_{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """Steps down (releasing the lease so another process can take over at once) and stops the thread."""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self):
+        return {**self.counters, "name": self.name, "owner": self.owner_id, "is_leader": self.is_leader}
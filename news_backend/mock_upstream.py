@@ -0,0 +1,377 @@
+"""
+Local stand-in for the Gemini and NewsAPI endpoints, for load tests and offline development.
+
+    python -m news_backend.mock_upstream --port 8090 --gemini-latency lognormal:0.8,0.4 --rate-429 0.05
+
+Then point the app at it with GEMINI_API_BASE_URL=http://127.0.0.1:8090 and
+NEWSAPI_BASE_URL=http://127.0.0.1:8090 (any API key works).
+"""
+import argparse
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from news_backend.rate_limit import TokenBucket
+
+MOCK_UPSTREAM_HOST = os.environ.get('MOCK_UPSTREAM_HOST', '127.0.0.1')
+MOCK_UPSTREAM_PORT = int(os.environ.get('MOCK_UPSTREAM_PORT', 8090))
+MOCK_GEMINI_LATENCY = os.environ.get('MOCK_GEMINI_LATENCY', 'lognormal:0.8,0.4')
+MOCK_NEWSAPI_LATENCY = os.environ.get('MOCK_NEWSAPI_LATENCY', 'uniform:0.05,0.2')
+MOCK_STREAM_CHUNK_DELAY_SECONDS = float(os.environ.get('MOCK_STREAM_CHUNK_DELAY_SECONDS', 0.05))
+MOCK_RATE_429 = float(os.environ.get('MOCK_RATE_429', 0))  # Share of calls answered with 429 at random
+MOCK_RATE_5XX = float(os.environ.get('MOCK_RATE_5XX', 0))  # Share of calls answered with 503 at random
+MOCK_RATE_LIMIT_PER_MINUTE = int(os.environ.get('MOCK_RATE_LIMIT_PER_MINUTE', 0))  # Per-key quota; 0 is unlimited
+MOCK_RETRY_DELAY_SECONDS = float(os.environ.get('MOCK_RETRY_DELAY_SECONDS', 5))  # retryDelay sent with a 429
+
+WORDS = (
+    "council", "report", "study", "climate", "energy", "vaccine", "budget", "election", "ocean", "market",
+    "school", "satellite", "river", "research", "policy", "health", "court", "city", "data", "community",
+)
+
+
+def parse_latency(spec):
+    """
+    Turns a latency spec into a function returning seconds: 'fixed:S', 'uniform:LOW,HIGH',
+    'normal:MEAN,SD', 'lognormal:MEDIAN,SIGMA' or 'exponential:MEAN'. Samples are never negative.
+    """
+    kind, _, args = spec.partition(":")
+    try:
+        values = [float(v) for v in args.split(",")] if args else []
+    except ValueError:
+        raise ValueError(f"Invalid latency spec '{spec}'.")
+    distributions = {
+        "fixed": (1, lambda rng, s: s),
+        "uniform": (2, lambda rng, low, high: rng.uniform(low, high)),
+        "normal": (2, lambda rng, mean, sd: rng.gauss(mean, sd)),
+        "lognormal": (2, lambda rng, median, sigma: rng.lognormvariate(math.log(median), sigma) if median > 0 else 0.0),
+        "exponential": (1, lambda rng, mean: rng.expovariate(1 / mean) if mean > 0 else 0.0),
+    }
+    if kind not in distributions or len(values) != distributions[kind][0]:
+        raise ValueError(f"Invalid latency spec '{spec}'. Use fixed:S, uniform:LOW,HIGH, normal:MEAN,SD, lognormal:MEDIAN,SIGMA or exponential:MEAN.")
+    sample = distributions[kind][1]
+    return lambda rng: max(0.0, sample(rng, *values))
+
+
+# --- Synthetic Content ---
+
+class SyntheticContent:
+    """Generates placeholder text and JSON that matches a Gemini responseSchema."""
+    def __init__(self, rng):
+        self.rng = rng
+
+    def words(self, count):
+        return " ".join(self.rng.choice(WORDS) for _ in range(count))
+
+    def sentence(self, count=12):
+        text = self.words(count)
+        return text[0].upper() + text[1:] + "."
+
+    def headline(self):
+        return self.sentence(self.rng.randint(6, 10)).rstrip(".").title()
+
+    def from_schema(self, schema, items=None, field=None):
+        """
+        A value valid for `schema`. A top-level ARRAY gets one element per entry in `items` (the
+        numbered items of a batch prompt) and echoes each into the element's 'headline' field.
+        """
+        kind = str(schema.get("type", "STRING")).upper()
+        if kind == "OBJECT":
+            return {name: self.from_schema(sub, field=name) for name, sub in schema.get("properties", {}).items()}
+        if kind == "ARRAY":
+            if items:
+                values = []
+                for item in items:
+                    value = self.from_schema(schema.get("items", {}))
+                    if isinstance(value, dict) and "headline" in value:
+                        value["headline"] = item
+                    values.append(value)
+                return values
+            return [self.from_schema(schema.get("items", {}), field=field) for _ in range(self.rng.randint(2, 4))]
+        if kind == "INTEGER":
+            return self.rng.randint(0, 100)
+        if kind == "NUMBER":
+            return round(self.rng.uniform(0, 100), 2)
+        if kind == "BOOLEAN":
+            return self.rng.random() < 0.5
+        if schema.get("enum"):
+            return self.rng.choice(schema["enum"])
+        if field == "url":
+            return f"https://example.org/{uuid.UUID(int=self.rng.getrandbits(128)).hex[:12]}"
+        if field in ("title", "name", "headline", "news_search_keyword"):
+            return self.headline()
+        return " ".join(self.sentence() for _ in range(self.rng.randint(2, 4)))
+
+    def text_for_prompt(self, prompt):
+        """Plain-text answers shaped like what the app's free-text prompts ask for."""
+        if "Respond with 'n' for news" in prompt:
+            return "n"
+        if "separated by commas" in prompt:
+            count = int(re.search(r"exactly (\d+)", prompt).group(1)) if re.search(r"exactly (\d+)", prompt) else 12
+            return ", ".join(self.headline() for _ in range(count))
+        if "keyword" in prompt.lower():
+            return self.words(2)
+        return "\n\n".join(self.sentence(self.rng.randint(10, 20)) for _ in range(self.rng.randint(2, 4)))
+
+    def news_article(self):
+        published = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() - self.rng.randint(0, 86400)))
+        return {
+            "source": {"id": None, "name": f"{self.words(1).title()} News"},
+            "author": f"{self.words(1).title()} {self.words(1).title()}",
+            "title": self.headline(),
+            "description": self.sentence(),
+            "url": f"https://example.org/news/{uuid.UUID(int=self.rng.getrandbits(128)).hex[:12]}",
+            "urlToImage": None,
+            "publishedAt": published,
+            "content": self.sentence(30),
+        }
+
+
+# --- Server ---
+
+class MockUpstream:
+    """
+    Serves POST /v1beta/models/<model>:generateContent and :streamGenerateContent (alt=sse) like
+    Gemini, and GET /v2/top-headlines and /v2/everything like NewsAPI. GET /mock/stats returns request
+    counts. Latency is sampled per call; 429s come from `rate_429` at random and from a per-key
+    `rate_limit_per_minute` quota, 503s from `rate_5xx`.
+    """
+    def __init__(self, gemini_latency=MOCK_GEMINI_LATENCY, newsapi_latency=MOCK_NEWSAPI_LATENCY,
+                 rate_429=MOCK_RATE_429, rate_5xx=MOCK_RATE_5XX, rate_limit_per_minute=MOCK_RATE_LIMIT_PER_MINUTE,
+                 retry_delay_seconds=MOCK_RETRY_DELAY_SECONDS, stream_chunk_delay=MOCK_STREAM_CHUNK_DELAY_SECONDS, seed=None):
+        self.latency = {"gemini": parse_latency(gemini_latency), "newsapi": parse_latency(newsapi_latency)}
+        self.rate_429 = rate_429
+        self.rate_5xx = rate_5xx
+        self.rate_limit_per_minute = rate_limit_per_minute
+        self.retry_delay_seconds = retry_delay_seconds
+        self.stream_chunk_delay = stream_chunk_delay
+        self._seed = seed
+        self._sequence = 0
+        self._quotas = {}
+        self._lock = threading.Lock()
+        self.counters = {"gemini": 0, "gemini_stream": 0, "newsapi": 0, "throttled": 0, "failed": 0}
+        self._server = None
+
+    def request_rng(self):
+        """A Random for one request; with a seed, the n-th request always gets the same one."""
+        if self._seed is None:
+            return random.Random()
+        with self._lock:
+            self._sequence += 1
+            sequence = self._sequence
+        return random.Random(f"{self._seed}:{sequence}")
+
+    def count(self, key):
+        with self._lock:
+            self.counters[key] += 1
+
+    def injected_failure(self, api_key, rng):
+        """None, or the status code (429/503) this call should fail with."""
+        if self.rate_limit_per_minute:
+            with self._lock:
+                bucket = self._quotas.get(api_key)
+                if bucket is None:
+                    bucket = self._quotas[api_key] = TokenBucket(self.rate_limit_per_minute)
+            if not bucket.try_acquire():
+                return 429
+        if rng.random() < self.rate_429:
+            return 429
+        if rng.random() < self.rate_5xx:
+            return 503
+        return None
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters)
+
+    def serve(self, host=MOCK_UPSTREAM_HOST, port=MOCK_UPSTREAM_PORT):
+        """Creates the HTTP server (port 0 picks a free port); call serve_forever() or start()."""
+        mock = self
+
+        class Handler(MockUpstreamHandler):
+            upstream = mock
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        return self._server
+
+    def start(self, host=MOCK_UPSTREAM_HOST, port=MOCK_UPSTREAM_PORT):
+        """Serves on a background thread and returns the base URL."""
+        server = self.serve(host, port)
+        threading.Thread(target=server.serve_forever, name="mock_upstream", daemon=True).start()
+        return f"http://{server.server_address[0]}:{server.server_address[1]}"
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+class MockUpstreamHandler(BaseHTTPRequestHandler):
+    upstream = None  # Set on the subclass created by MockUpstream.serve()
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real upstreams
+
+    def log_message(self, format, *args):
+        pass  # One line per request would swamp a load test
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _gemini_error(self, status):
+        self.upstream.count("throttled" if status == 429 else "failed")
+        if status == 429:
+            self._send_json(429, {"error": {
+                "code": 429,
+                "message": "Resource has been exhausted (e.g. check quota).",
+                "status": "RESOURCE_EXHAUSTED",
+                "details": [{"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": f"{self.upstream.retry_delay_seconds:g}s"}],
+            }})
+        else:
+            self._send_json(503, {"error": {"code": 503, "message": "The model is overloaded. Please try again later.", "status": "UNAVAILABLE"}})
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = {name: values[0] for name, values in parse_qs(url.query).items()}
+        if url.path == "/mock/stats":
+            self._send_json(200, self.upstream.stats())
+            return
+        if url.path not in ("/v2/top-headlines", "/v2/everything"):
+            self._send_json(404, {"status": "error", "code": "notFound", "message": f"No mock for {url.path}."})
+            return
+
+        api_key = query.get("apiKey") or self.headers.get("X-Api-Key")
+        if not api_key:
+            self._send_json(401, {"status": "error", "code": "apiKeyMissing", "message": "Your API key is missing."})
+            return
+        self.upstream.count("newsapi")
+        rng = self.upstream.request_rng()
+        time.sleep(self.upstream.latency["newsapi"](rng))
+        failure = self.upstream.injected_failure(api_key, rng)
+        if failure == 429:
+            self.upstream.count("throttled")
+            self._send_json(429, {"status": "error", "code": "rateLimited", "message": "You have made too many requests recently."})
+            return
+        if failure:
+            self.upstream.count("failed")
+            self._send_json(503, {"status": "error", "code": "unexpectedError", "message": "Service unavailable."})
+            return
+
+        content = SyntheticContent(rng)
+        page_size = max(1, min(100, int(query.get("pageSize", 20))))
+        self._send_json(200, {
+            "status": "ok",
+            "totalResults": page_size * 5,
+            "articles": [content.news_article() for _ in range(page_size)],
+        })
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        query = {name: values[0] for name, values in parse_qs(url.query).items()}
+        match = re.fullmatch(r"/v1(?:beta)?/models/[^/:]+:(generateContent|streamGenerateContent)", url.path)
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": {"code": 400, "message": "Invalid JSON payload.", "status": "INVALID_ARGUMENT"}})
+            return
+        if not match:
+            self._send_json(404, {"error": {"code": 404, "message": f"No mock for {url.path}.", "status": "NOT_FOUND"}})
+            return
+
+        api_key = query.get("key") or self.headers.get("x-goog-api-key")
+        if not api_key:
+            self._send_json(403, {"error": {"code": 403, "message": "Method doesn't allow unregistered callers.", "status": "PERMISSION_DENIED"}})
+            return
+        streaming = match.group(1) == "streamGenerateContent"
+        self.upstream.count("gemini_stream" if streaming else "gemini")
+        rng = self.upstream.request_rng()
+        time.sleep(self.upstream.latency["gemini"](rng))
+        failure = self.upstream.injected_failure(api_key, rng)
+        if failure:
+            self._gemini_error(failure)
+            return
+
+        text = self._generate_text(payload, rng)
+        if streaming:
+            self._stream_text(text)
+        else:
+            self._send_json(200, self._candidate_response(text))
+
+    def _generate_text(self, payload, rng):
+        content = SyntheticContent(rng)
+        prompt = " ".join(
+            part.get("text", "")
+            for message in payload.get("contents", [])[-1:]
+            for part in message.get("parts", [])
+        )
+        schema = payload.get("generationConfig", {}).get("responseSchema")
+        if schema is None:
+            return content.text_for_prompt(prompt)
+        items = re.findall(r"^\d+\. (.+)$", prompt.split("Items:", 1)[1], re.MULTILINE) if "Items:" in prompt else None
+        return json.dumps(content.from_schema(schema, items=items))
+
+    @staticmethod
+    def _candidate_response(text):
+        return {
+            "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP", "index": 0}],
+            "usageMetadata": {"promptTokenCount": 0, "candidatesTokenCount": len(text) // 4, "totalTokenCount": len(text) // 4},
+        }
+
+    def _stream_text(self, text):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")  # The stream has no length; its end is the connection closing
+        self.end_headers()
+        self.close_connection = True
+        chunk_size = max(1, len(text) // 8)
+        for start in range(0, len(text), chunk_size):
+            event = self._candidate_response(text[start:start + chunk_size])
+            self.wfile.write(f"data: {json.dumps(event)}\r\n\r\n".encode("utf-8"))
+            self.wfile.flush()
+            time.sleep(self.upstream.stream_chunk_delay)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Gemini and NewsAPI endpoints.")
+    parser.add_argument("--host", default=MOCK_UPSTREAM_HOST)
+    parser.add_argument("--port", type=int, default=MOCK_UPSTREAM_PORT)
+    parser.add_argument("--gemini-latency", default=MOCK_GEMINI_LATENCY, help="e.g. fixed:0.5, uniform:0.2,1, lognormal:0.8,0.4")
+    parser.add_argument("--newsapi-latency", default=MOCK_NEWSAPI_LATENCY)
+    parser.add_argument("--rate-429", type=float, default=MOCK_RATE_429, help="Share of calls answered with 429 at random.")
+    parser.add_argument("--rate-5xx", type=float, default=MOCK_RATE_5XX, help="Share of calls answered with 503 at random.")
+    parser.add_argument("--rate-limit-per-minute", type=int, default=MOCK_RATE_LIMIT_PER_MINUTE, help="Per-key quota; 0 is unlimited.")
+    parser.add_argument("--retry-delay", type=float, default=MOCK_RETRY_DELAY_SECONDS, help="retryDelay sent with each 429.")
+    parser.add_argument("--seed", help="Seed for repeatable content, latency and failures.")
+    args = parser.parse_args()
+
+    mock = MockUpstream(
+        gemini_latency=args.gemini_latency, newsapi_latency=args.newsapi_latency,
+        rate_429=args.rate_429, rate_5xx=args.rate_5xx, rate_limit_per_minute=args.rate_limit_per_minute,
+        retry_delay_seconds=args.retry_delay, seed=args.seed,
+    )
+    server = mock.serve(args.host, args.port)
+    print(f"DEBUG: Mock upstream listening on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
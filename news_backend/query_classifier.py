@@ -0,0 +1,179 @@
+"""
+Local, offline search-query classifier (news vs general vs uninterpretable).
+
+A naive Bayes model over character n-grams, nudged by a small cue-word lexicon, answers
+confident cases in microseconds. Low-confidence queries return None so the caller can fall
+back to the LLM classification.
+
+Retrain after editing the seed corpus with:
+    python -m news_backend.query_classifier train
+"""
+import json
+import math
+import os
+import re
+import sys
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+SEED_PATH = os.path.join(DATA_DIR, "query_classifier_seed.json")
+LEXICON_PATH = os.path.join(DATA_DIR, "query_classifier_lexicon.json")
+MODEL_PATH = os.path.join(DATA_DIR, "query_classifier_model.json")
+
+QUERY_CLASSIFIER_ENABLED = os.environ.get('QUERY_CLASSIFIER_ENABLED', 'true').lower() != 'false'
+QUERY_CLASSIFIER_MIN_CONFIDENCE = float(os.environ.get('QUERY_CLASSIFIER_MIN_CONFIDENCE', 0.9))
+
+CLASS_CODES = {"news": "n", "general": "g"}
+NGRAM_SIZES = (2, 3, 4)
+LEXICON_WEIGHT = 1.5   # Logit shift per matched cue phrase
+LIKELIHOOD_SCALE = 20.0 # Tempers naive Bayes overconfidence: scale applied to the mean per-n-gram log-likelihood
+
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "in", "on", "at", "to", "for", "with", "by", "about", "from",
+    "is", "are", "was", "were", "be", "been", "what", "who", "whom", "which", "when", "where", "why", "how",
+    "did", "does", "do", "has", "have", "had", "this", "that", "these", "those", "it", "its", "there",
+    "latest", "news", "recent", "recently", "today", "today's", "tonight", "yesterday", "breaking", "update",
+    "updates", "current", "happened", "happening", "week", "month", "year", "last", "night", "new", "story",
+}
+
+
+def _normalize(text):
+    return re.sub(r"\s+", " ", text.lower()).strip()
+
+
+def _ngrams(text):
+    padded = f" {_normalize(text)} "
+    for n in NGRAM_SIZES:
+        for i in range(len(padded) - n + 1):
+            yield padded[i:i + n]
+
+
+def train(seed_path=SEED_PATH, model_path=MODEL_PATH):
+    """Fits n-gram counts from the seed corpus and writes them to the model data file."""
+    with open(seed_path, encoding="utf-8") as f:
+        seed = json.load(f)
+
+    counts = {}
+    totals = {}
+    for label, examples in seed.items():
+        label_counts = {}
+        for example in examples:
+            for gram in _ngrams(example):
+                label_counts[gram] = label_counts.get(gram, 0) + 1
+        counts[label] = dict(sorted(label_counts.items()))
+        totals[label] = sum(label_counts.values())
+
+    vocabulary = set()
+    for label_counts in counts.values():
+        vocabulary.update(label_counts)
+
+    model = {
+        "ngram_sizes": list(NGRAM_SIZES),
+        "priors": {label: len(examples) for label, examples in seed.items()},
+        "totals": totals,
+        "vocabulary_size": len(vocabulary),
+        "counts": counts,
+    }
+    with open(model_path, "w", encoding="utf-8") as f:
+        json.dump(model, f, separators=(",", ":"), sort_keys=True)
+    return model
+
+
+class QueryClassifier:
+    def __init__(self, model, lexicon):
+        self.labels = list(model["counts"])
+        total_examples = sum(model["priors"].values())
+        self.log_priors = {label: math.log(model["priors"][label] / total_examples) for label in self.labels}
+        vocabulary_size = model["vocabulary_size"]
+        # Precompute Laplace-smoothed log-probabilities so scoring is only dictionary lookups.
+        self.log_probs = {}
+        self.unseen_log_prob = {}
+        for label in self.labels:
+            denominator = model["totals"][label] + vocabulary_size
+            self.log_probs[label] = {g: math.log((c + 1) / denominator) for g, c in model["counts"][label].items()}
+            self.unseen_log_prob[label] = math.log(1 / denominator)
+        # Longest phrases first so "how does" wins over "does" in the alternation.
+        self.lexicon = {
+            label: re.compile(
+                r"(?<!\w)(?:" + "|".join(re.escape(p) for p in sorted(phrases, key=len, reverse=True)) + r")(?!\w)"
+            )
+            for label, phrases in lexicon.items()
+        }
+
+    @classmethod
+    def load(cls, model_path=MODEL_PATH, lexicon_path=LEXICON_PATH):
+        with open(model_path, encoding="utf-8") as f:
+            model = json.load(f)
+        with open(lexicon_path, encoding="utf-8") as f:
+            lexicon = json.load(f)
+        return cls(model, lexicon)
+
+    def scores(self, query):
+        """Returns {label: probability} for the news/general labels."""
+        grams = list(_ngrams(query))
+        normalized = _normalize(query)
+        logits = {}
+        for label in self.labels:
+            log_probs = self.log_probs[label]
+            unseen = self.unseen_log_prob[label]
+            log_likelihood = sum(log_probs.get(g, unseen) for g in grams)
+            mean_log_likelihood = log_likelihood / len(grams) if grams else 0.0
+            pattern = self.lexicon.get(label)
+            lexicon_hits = len(pattern.findall(normalized)) if pattern else 0
+            logits[label] = self.log_priors[label] + LIKELIHOOD_SCALE * mean_log_likelihood + LEXICON_WEIGHT * lexicon_hits
+
+        max_logit = max(logits.values())
+        exp_logits = {label: math.exp(logit - max_logit) for label, logit in logits.items()}
+        total = sum(exp_logits.values())
+        return {label: value / total for label, value in exp_logits.items()}
+
+    def classify(self, query, min_confidence=QUERY_CLASSIFIER_MIN_CONFIDENCE):
+        """
+        Returns (code, confidence) with code 'n', 'g' or 'c' when confident, else None.
+        'c' (uninterpretable) is only returned for queries without any letters; anything subtler is left to the LLM.
+        """
+        if not re.search(r"[^\W\d_]", query):
+            return "c", 1.0
+        probabilities = self.scores(query)
+        label = max(probabilities, key=probabilities.get)
+        confidence = probabilities[label]
+        if confidence < min_confidence:
+            return None
+        return CLASS_CODES[label], confidence
+
+
+def extract_news_keyword(query, max_terms=4):
+    """Builds a NewsAPI search term from the query's content words, dropping stopwords and news cue words."""
+    words = re.findall(r"[\w'-]+", query.lower())
+    content_words = [w for w in words if w not in STOPWORDS]
+    return " ".join(content_words[:max_terms])
+
+
+_default_classifier = None
+
+
+def classify(query):
+    """
+    Classifies with the shipped model. Returns None when the classifier is disabled,
+    its data files are missing, or it is not confident enough.
+    """
+    global _default_classifier
+    if not QUERY_CLASSIFIER_ENABLED:
+        return None
+    if _default_classifier is None:
+        try:
+            _default_classifier = QueryClassifier.load()
+        except (OSError, ValueError) as e:
+            print(f"WARNING: Local query classifier unavailable: {e}")
+            return None
+    return _default_classifier.classify(query)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "train":
+        trained = train()
+        print(f"Wrote {MODEL_PATH} ({trained['vocabulary_size']} n-grams).")
+    else:
+        classifier = QueryClassifier.load()
+        for line in sys.stdin:
+            if line.strip():
+                print(line.strip(), "->", classifier.classify(line.strip()), classifier.scores(line.strip()))
@@ -0,0 +1,479 @@
+"""
+Per-key, per-upstream token-bucket rate limiter with fair FIFO waiting and interactive/background priority classes
+"""
+import collections
+import contextlib
+import hashlib
+import math
+import os
+import sqlite3
+import threading
+import time
+
+# --- Rate Limit Configuration (requests per minute, per API key) ---
+RATE_LIMITS_PER_MINUTE = {
+    "gemini": int(os.environ.get('GEMINI_RATE_LIMIT_PER_MINUTE', 15)),
+    "newsapi": int(os.environ.get('NEWSAPI_RATE_LIMIT_PER_MINUTE', 15)),
+}
+MAX_TRACKED_BUCKETS = int(os.environ.get('RATE_LIMIT_MAX_TRACKED_BUCKETS', 1024))
+# When set, bucket state lives in this SQLite file so every process sharing it draws from the same budget
+RATE_LIMIT_SHARED_DB_PATH = os.environ.get('RATE_LIMIT_SHARED_DB_PATH', '')
+SHARED_POLL_INTERVAL_SECONDS = 0.05  # Shortest sleep between attempts on a shared bucket
+# Share of each bucket's capacity that only interactive callers may spend
+RATE_LIMIT_INTERACTIVE_RESERVE = float(os.environ.get('RATE_LIMIT_INTERACTIVE_RESERVE', 0.2))
+
+# --- Traffic Classes ---
+INTERACTIVE = "interactive"  # A user is waiting on the call (search, chat, activities)
+BACKGROUND = "background"  # Feed generation and other work nobody is waiting on
+TRAFFIC_CLASSES = (INTERACTIVE, BACKGROUND)
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a token could not be acquired before the caller's deadline."""
+    def __init__(self, upstream, retry_after):
+        super().__init__(f"Rate limit for {upstream} reached. Retry in {retry_after:.1f} seconds.")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+def reserved_tokens(capacity, reserve=None):
+    """Tokens of a bucket's `capacity` held back for interactive callers (always leaves background at least one)."""
+    reserve = RATE_LIMIT_INTERACTIVE_RESERVE if reserve is None else reserve
+    return max(0, min(capacity - 1, math.ceil(capacity * reserve)))
+
+
+class ClassCounters:
+    """Per-traffic-class acquisition counts and wait times for one bucket. Caller provides locking."""
+    def __init__(self):
+        self.counters = {traffic_class: {"acquired": 0, "timeouts": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0}
+                         for traffic_class in TRAFFIC_CLASSES}
+
+    def record(self, traffic_class, waited, acquired):
+        counters = self.counters[traffic_class]
+        counters["acquired" if acquired else "timeouts"] += 1
+        counters["wait_seconds"] += waited
+        counters["max_wait_seconds"] = max(counters["max_wait_seconds"], waited)
+
+    def stats(self, queued):
+        return {
+            traffic_class: {
+                "queued": queued[traffic_class],
+                "acquired": counters["acquired"],
+                "timeouts": counters["timeouts"],
+                "avg_wait_seconds": round(counters["wait_seconds"] / max(1, counters["acquired"] + counters["timeouts"]), 3),
+                "max_wait_seconds": round(counters["max_wait_seconds"], 3),
+            }
+            for traffic_class, counters in self.counters.items()
+        }
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at `rate_per_minute`. Waiters queue per traffic class in FIFO
+    order and sleep outside the lock; only the head waiter may take the next token. Interactive
+    waiters always go ahead of background ones, and background callers may not spend the last
+    `reserve` tokens, so a user's request never queues behind a backlog of background work.
+    """
+    def __init__(self, rate_per_minute, capacity=None, reserve=None):
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.reserve = reserved_tokens(self.capacity, reserve)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.last_used = self.updated
+        self._lock = threading.Lock()
+        self._queues = {traffic_class: collections.deque() for traffic_class in TRAFFIC_CLASSES}
+        self._class_counters = ClassCounters()
+
+    def _refill(self, now):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate_per_second)
+            self.updated = now
+
+    def _floor(self, traffic_class):
+        # Tokens that must remain in the bucket for a caller of this class to take one
+        return 1 + (self.reserve if traffic_class == BACKGROUND else 0)
+
+    def _time_until_token(self, traffic_class):
+        floor = self._floor(traffic_class)
+        if self.tokens >= floor:
+            return 0.0
+        return (floor - self.tokens) / self.rate_per_second
+
+    def _queued_ahead(self, traffic_class):
+        # Waiters a new caller of this class would queue behind
+        if traffic_class == INTERACTIVE:
+            return len(self._queues[INTERACTIVE])
+        return len(self._queues[INTERACTIVE]) + len(self._queues[BACKGROUND])
+
+    def _head(self):
+        for traffic_class in TRAFFIC_CLASSES:
+            if self._queues[traffic_class]:
+                return self._queues[traffic_class][0]
+        return None
+
+    def _wake_head(self):
+        head = self._head()
+        if head is not None:
+            head.set()
+
+    def try_acquire(self, traffic_class=INTERACTIVE):
+        """Takes a token only if one is available right now to this class and nobody is queued ahead."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            acquired = not self._queued_ahead(traffic_class) and self.tokens >= self._floor(traffic_class)
+            if acquired:
+                self.tokens -= 1
+                self.last_used = now
+            self._class_counters.record(traffic_class, 0.0, acquired)
+            return acquired
+
+    def estimate_wait(self, traffic_class=INTERACTIVE):
+        """Seconds until a new caller of this class would get a token, counting everyone queued ahead of it."""
+        with self._lock:
+            self._refill(time.monotonic())
+            deficit = self._queued_ahead(traffic_class) + self._floor(traffic_class) - self.tokens
+            return max(0.0, deficit / self.rate_per_second)
+
+    def acquire(self, timeout=None, traffic_class=INTERACTIVE):
+        """
+        Blocks until a token is available or `timeout` seconds pass.
+        Returns True if a token was taken, False on timeout.
+        """
+        started = time.monotonic()
+        deadline = None if timeout is None else started + timeout
+        waiter = threading.Event()
+        queue = self._queues[traffic_class]
+        with self._lock:
+            # An interactive waiter becomes the head at once; a background head that was waiting finds
+            # it has been overtaken when it next wakes and waits to be woken again.
+            queue.append(waiter)
+
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                is_head = self._head() is waiter
+                if is_head and self.tokens >= self._floor(traffic_class):
+                    self.tokens -= 1
+                    self.last_used = now
+                    queue.popleft()
+                    self._wake_head()
+                    self._class_counters.record(traffic_class, now - started, True)
+                    return True
+
+                remaining = None if deadline is None else deadline - now
+                if remaining is not None and remaining <= 0:
+                    queue.remove(waiter)
+                    if is_head:
+                        self._wake_head()
+                    self._class_counters.record(traffic_class, now - started, False)
+                    return False
+
+                wait_for = self._time_until_token(traffic_class) if is_head else None
+                if remaining is not None:
+                    wait_for = remaining if wait_for is None else min(wait_for, remaining)
+                waiter.clear()
+
+            # Sleep outside the lock; the previous head wakes us when we reach the front.
+            waiter.wait(wait_for)
+
+    def stats(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            queued = {traffic_class: len(queue) for traffic_class, queue in self._queues.items()}
+            return {
+                "tokens": round(self.tokens, 2),
+                "capacity": self.capacity,
+                "reserve": self.reserve,
+                "rate_per_minute": round(self.rate_per_second * 60, 2),
+                "waiters": sum(queued.values()),
+                "classes": self._class_counters.stats(queued),
+            }
+
+
+class SharedTokenBucket:
+    """
+    Token bucket whose state is a row in a SQLite database shared between processes; each take is an
+    atomic read-refill-decrement in an IMMEDIATE transaction. Threads of one process queue on a local
+    lock, so waiting is FIFO-ish within a process but not across processes. The interactive reserve
+    holds across processes; background callers also stand aside while this process has interactive
+    callers waiting, but cannot see other processes' queues.
+    """
+    _connections = {}
+    _connections_lock = threading.Lock()
+
+    def __init__(self, db_path, bucket_key, rate_per_minute, capacity=None, reserve=None):
+        self.db_path = db_path
+        self.bucket_key = bucket_key
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.reserve = reserved_tokens(self.capacity, reserve)
+        self._waiting = {traffic_class: 0 for traffic_class in TRAFFIC_CLASSES}
+        self._class_counters = ClassCounters()
+        self._counters_lock = threading.Lock()
+        self._queue_locks = {traffic_class: threading.Lock() for traffic_class in TRAFFIC_CLASSES}  # Threads of this process take turns at the head
+
+    @classmethod
+    def _connection(cls, db_path):
+        # One connection per (process, database); recreated in a forked child.
+        key = (os.getpid(), db_path)
+        with cls._connections_lock:
+            entry = cls._connections.get(key)
+            if entry is None:
+                db = sqlite3.connect(db_path, check_same_thread=False, timeout=30, isolation_level=None)
+                db.execute("PRAGMA journal_mode=WAL")
+                db.execute(
+                    "CREATE TABLE IF NOT EXISTS rate_limit_buckets ("
+                    "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+                )
+                entry = (db, threading.Lock())
+                cls._connections[key] = entry
+        return entry
+
+    def _floor(self, traffic_class):
+        return 1 + (self.reserve if traffic_class == BACKGROUND else 0)
+
+    def _record(self, traffic_class, waited, acquired):
+        with self._counters_lock:
+            self._class_counters.record(traffic_class, waited, acquired)
+
+    def _update(self, take, floor=1):
+        """
+        Refills the shared bucket and, if `take` and at least `floor` tokens are available, takes one.
+        Returns (taken, tokens).
+        """
+        db, db_lock = self._connection(self.db_path)
+        with db_lock:
+            now = time.time()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                row = db.execute("SELECT tokens, updated_at FROM rate_limit_buckets WHERE key = ?", (self.bucket_key,)).fetchone()
+                tokens = float(self.capacity) if row is None else min(
+                    self.capacity, row[0] + max(0.0, now - row[1]) * self.rate_per_second
+                )
+                taken = take and tokens >= floor
+                if taken:
+                    tokens -= 1
+                db.execute(
+                    "INSERT OR REPLACE INTO rate_limit_buckets (key, tokens, updated_at) VALUES (?, ?, ?)",
+                    (self.bucket_key, tokens, now)
+                )
+                db.execute("COMMIT")
+            except sqlite3.Error:
+                db.execute("ROLLBACK")
+                raise
+        return taken, tokens
+
+    def _peek(self):
+        """Current token count, refilled in memory from a plain read; writes nothing and takes no write lock."""
+        db, db_lock = self._connection(self.db_path)
+        with db_lock:
+            row = db.execute("SELECT tokens, updated_at FROM rate_limit_buckets WHERE key = ?", (self.bucket_key,)).fetchone()
+        if row is None:
+            return float(self.capacity)
+        return min(self.capacity, row[0] + max(0.0, time.time() - row[1]) * self.rate_per_second)
+
+    def _queued_ahead(self, traffic_class):
+        if traffic_class == INTERACTIVE:
+            return self._waiting[INTERACTIVE]
+        return self._waiting[INTERACTIVE] + self._waiting[BACKGROUND]
+
+    def try_acquire(self, traffic_class=INTERACTIVE):
+        acquired = not self._queued_ahead(traffic_class) and self._update(take=True, floor=self._floor(traffic_class))[0]
+        self._record(traffic_class, 0.0, acquired)
+        return acquired
+
+    def estimate_wait(self, traffic_class=INTERACTIVE):
+        tokens = self._peek()
+        deficit = self._queued_ahead(traffic_class) + self._floor(traffic_class) - tokens
+        return max(0.0, deficit / self.rate_per_second)
+
+    def acquire(self, timeout=None, traffic_class=INTERACTIVE):
+        started = time.monotonic()
+        deadline = None if timeout is None else started + timeout
+        floor = self._floor(traffic_class)
+        queue_lock = self._queue_locks[traffic_class]
+        with self._counters_lock:  # Read by every background waiter, so a lost update would stall them for good
+            self._waiting[traffic_class] += 1
+        taken = False
+        try:
+            if not queue_lock.acquire(timeout=-1 if timeout is None else max(0.0, timeout)):
+                return False
+            try:
+                while True:
+                    # Background stands aside while interactive callers in this process are waiting
+                    if traffic_class == INTERACTIVE or not self._waiting[INTERACTIVE]:
+                        taken, tokens = self._update(take=True, floor=floor)
+                        if taken:
+                            return True
+                        wait_for = max(SHARED_POLL_INTERVAL_SECONDS, (floor - tokens) / self.rate_per_second)
+                    else:
+                        wait_for = SHARED_POLL_INTERVAL_SECONDS
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            return False
+                        wait_for = min(wait_for, remaining)
+                    time.sleep(wait_for)
+            finally:
+                queue_lock.release()
+        finally:
+            with self._counters_lock:
+                self._waiting[traffic_class] -= 1
+            self._record(traffic_class, time.monotonic() - started, taken)
+
+    def stats(self):
+        tokens = self._peek()
+        with self._counters_lock:
+            classes = self._class_counters.stats(dict(self._waiting))
+        return {
+            "tokens": round(tokens, 2),
+            "capacity": self.capacity,
+            "reserve": self.reserve,
+            "rate_per_minute": round(self.rate_per_second * 60, 2),
+            "waiters": sum(self._waiting.values()),
+            "classes": classes,
+            "shared": True,
+        }
+
+
+# --- Bucket Registry ---
+_buckets = {}
+_buckets_lock = threading.Lock()
+_local = threading.local()
+
+
+def key_fingerprint(api_key):
+    """Short, non-reversible identifier for an API key so raw keys are never used as dict keys or logged."""
+    if not api_key:
+        return "anonymous"
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+
+
+def _evict_idle_buckets():
+    # Drop buckets that are full and unused; they carry no state worth keeping.
+    for bucket_key, bucket in list(_buckets.items()):
+        stats = bucket.stats()
+        if stats["waiters"] == 0 and stats["tokens"] >= bucket.capacity:
+            del _buckets[bucket_key]
+
+
+def reset():
+    """Forgets every bucket, so new limits in RATE_LIMITS_PER_MINUTE apply to the next call (benchmarks)."""
+    with _buckets_lock:
+        _buckets.clear()
+
+
+def get_bucket(upstream, api_key):
+    bucket_key = (upstream, key_fingerprint(api_key))
+    bucket = _buckets.get(bucket_key)
+    if bucket is None:
+        with _buckets_lock:
+            bucket = _buckets.get(bucket_key)
+            if bucket is None:
+                if len(_buckets) >= MAX_TRACKED_BUCKETS:
+                    _evict_idle_buckets()
+                if RATE_LIMIT_SHARED_DB_PATH:
+                    bucket = SharedTokenBucket(RATE_LIMIT_SHARED_DB_PATH, f"{upstream}:{bucket_key[1]}", RATE_LIMITS_PER_MINUTE[upstream])
+                else:
+                    bucket = TokenBucket(RATE_LIMITS_PER_MINUTE[upstream])
+                _buckets[bucket_key] = bucket
+    return bucket
+
+
+@contextlib.contextmanager
+def deadline(seconds):
+    """
+    Caps how long rate-limited calls made by this thread may wait for a token.
+    Calls that cannot get a token in time raise RateLimitExceeded instead of stalling.
+    """
+    previous = getattr(_local, "deadline", None)
+    new_deadline = time.monotonic() + seconds
+    _local.deadline = new_deadline if previous is None else min(previous, new_deadline)
+    try:
+        yield
+    finally:
+        _local.deadline = previous
+
+
+def time_remaining():
+    """Seconds left before the calling thread's `deadline()`, or None if it has none."""
+    thread_deadline = getattr(_local, "deadline", None)
+    return None if thread_deadline is None else max(0.0, thread_deadline - time.monotonic())
+
+
+@contextlib.contextmanager
+def traffic_class(name):
+    """
+    Marks rate-limited calls made by this thread as INTERACTIVE or BACKGROUND. Threads that never set
+    a class are treated as interactive, so request handlers need no marking.
+    """
+    if name not in TRAFFIC_CLASSES:
+        raise ValueError(f"Unknown traffic class '{name}'. Use one of {TRAFFIC_CLASSES}.")
+    previous = getattr(_local, "traffic_class", None)
+    _local.traffic_class = name
+    try:
+        yield
+    finally:
+        _local.traffic_class = previous
+
+
+def current_traffic_class():
+    return getattr(_local, "traffic_class", None) or INTERACTIVE
+
+
+def acquire(upstream, api_key, timeout=None):
+    """
+    Waits for a token for (upstream, api_key) as the thread's traffic class. Honours the thread's
+    `deadline()` if one is set. Raises RateLimitExceeded if no token is available in time.
+    """
+    thread_deadline = getattr(_local, "deadline", None)
+    if thread_deadline is not None:
+        remaining = max(0.0, thread_deadline - time.monotonic())
+        timeout = remaining if timeout is None else min(timeout, remaining)
+
+    bucket = get_bucket(upstream, api_key)
+    caller_class = current_traffic_class()
+    if timeout is not None and timeout <= 0:
+        acquired = bucket.try_acquire(caller_class)
+    else:
+        acquired = bucket.acquire(timeout, caller_class)
+    if not acquired:
+        raise RateLimitExceeded(upstream, bucket.estimate_wait(caller_class))
+
+
+def try_acquire(upstream, api_key):
+    """Non-blocking variant of acquire(). Returns True if a token was taken."""
+    return get_bucket(upstream, api_key).try_acquire(current_traffic_class())
+
+
+def estimate_wait(upstream, api_key):
+    """Seconds until the calling thread's traffic class could take a token for (upstream, api_key)."""
+    return get_bucket(upstream, api_key).estimate_wait(current_traffic_class())
+
+
+def stats():
+    with _buckets_lock:
+        items = list(_buckets.items())
+    return {f"{upstream}:{fingerprint}": bucket.stats() for (upstream, fingerprint), bucket in items}
+
+
+def class_stats():
+    """Queue depth and wait times per traffic class, summed over every tracked bucket."""
+    totals = {traffic_class: {"queued": 0, "acquired": 0, "timeouts": 0, "avg_wait_seconds": 0.0, "max_wait_seconds": 0.0}
+              for traffic_class in TRAFFIC_CLASSES}
+    wait_seconds = {traffic_class: 0.0 for traffic_class in TRAFFIC_CLASSES}
+    for bucket_stats in stats().values():
+        for traffic_class, counters in bucket_stats["classes"].items():
+            total = totals[traffic_class]
+            for key in ("queued", "acquired", "timeouts"):
+                total[key] += counters[key]
+            wait_seconds[traffic_class] += counters["avg_wait_seconds"] * (counters["acquired"] + counters["timeouts"])
+            total["max_wait_seconds"] = max(total["max_wait_seconds"], counters["max_wait_seconds"])
+    for traffic_class, total in totals.items():
+        calls = total["acquired"] + total["timeouts"]
+        total["avg_wait_seconds"] = round(wait_seconds[traffic_class] / calls, 3) if calls else 0.0
+    return totals
@@ -0,0 +1,151 @@
+"""
+Retry backoff and per-upstream circuit breakers for Gemini and NewsAPI calls
+"""
+import os
+import random
+import threading
+import time
+
+from news_backend.rate_limit import RateLimitExceeded
+
+UPSTREAM_MAX_RETRIES = int(os.environ.get('UPSTREAM_MAX_RETRIES', 2))
+UPSTREAM_RETRY_BASE_DELAY_SECONDS = float(os.environ.get('UPSTREAM_RETRY_BASE_DELAY_SECONDS', 0.5))
+# Longest we sleep before a retry; a Retry-After longer than this is not retried at all
+UPSTREAM_RETRY_MAX_DELAY_SECONDS = float(os.environ.get('UPSTREAM_RETRY_MAX_DELAY_SECONDS', 10))
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get('BREAKER_FAILURE_THRESHOLD', 5))
+BREAKER_RESET_SECONDS = float(os.environ.get('BREAKER_RESET_SECONDS', 30))
+
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+
+BREAKER_CLOSED = "closed"
+BREAKER_OPEN = "open"
+BREAKER_HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RateLimitExceeded):
+    """
+    Raised instead of calling an upstream whose breaker is open. It is a RateLimitExceeded so
+    request handlers answer 429 with a Retry-After rather than waiting on a failing upstream.
+    """
+    def __init__(self, upstream, retry_after):
+        Exception.__init__(self, f"{upstream} is failing; calls are paused for {retry_after:.1f} seconds.")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+def backoff_delay(attempt, retry_after=None):
+    """
+    Seconds to sleep before retry number `attempt` (0-based): the upstream's Retry-After when it gave
+    one, otherwise "full jitter" exponential backoff, so concurrent callers do not retry in lockstep.
+    """
+    if retry_after is not None:
+        return retry_after
+    return random.uniform(0, min(UPSTREAM_RETRY_MAX_DELAY_SECONDS, UPSTREAM_RETRY_BASE_DELAY_SECONDS * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures (connection errors, timeouts, 5xx) and
+    fails calls fast for `reset_seconds`. Then one probe call is let through (half-open): success
+    closes the breaker, failure opens it again.
+    """
+    def __init__(self, upstream, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_seconds=BREAKER_RESET_SECONDS):
+        self.upstream = upstream
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = BREAKER_CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self.counters = {"opened": 0, "short_circuited": 0, "failures": 0, "successes": 0, "retries": 0}
+
+    def _open(self, now):
+        # Caller must hold _lock.
+        self.state = BREAKER_OPEN
+        self.opened_at = now
+        self._probe_in_flight = False
+        self.counters["opened"] += 1
+        print(f"WARNING: Circuit breaker for {self.upstream} opened after {self.consecutive_failures} consecutive failures.")
+
+    def time_until_retry(self):
+        """Seconds until the breaker lets a call through; 0 when closed or ready to probe."""
+        with self._lock:
+            if self.state == BREAKER_OPEN:
+                return max(0.0, self.opened_at + self.reset_seconds - time.monotonic())
+            if self.state == BREAKER_HALF_OPEN and self._probe_in_flight:
+                return self.reset_seconds
+            return 0.0
+
+    def before_call(self):
+        """Raises CircuitOpenError if the call must not go out now."""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == BREAKER_OPEN and now - self.opened_at >= self.reset_seconds:
+                self.state = BREAKER_HALF_OPEN
+            if self.state == BREAKER_HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return
+            if self.state != BREAKER_CLOSED:
+                self.counters["short_circuited"] += 1
+                wait = self.opened_at + self.reset_seconds - now if self.state == BREAKER_OPEN else self.reset_seconds
+                raise CircuitOpenError(self.upstream, max(0.0, wait))
+
+    def check(self):
+        """Like before_call() but never claims the half-open probe; for callers about to spend quota."""
+        wait = self.time_until_retry()
+        if wait > 0:
+            with self._lock:
+                self.counters["short_circuited"] += 1
+            raise CircuitOpenError(self.upstream, wait)
+
+    def record_success(self):
+        with self._lock:
+            self.counters["successes"] += 1
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+            if self.state != BREAKER_CLOSED:
+                print(f"DEBUG: Circuit breaker for {self.upstream} closed.")
+            self.state = BREAKER_CLOSED
+
+    def record_failure(self):
+        with self._lock:
+            self.counters["failures"] += 1
+            self.consecutive_failures += 1
+            now = time.monotonic()
+            if self.state == BREAKER_HALF_OPEN or (self.state == BREAKER_CLOSED and self.consecutive_failures >= self.failure_threshold):
+                self._open(now)
+
+    def record_retry(self):
+        with self._lock:
+            self.counters["retries"] += 1
+
+    def stats(self):
+        retry_in = self.time_until_retry()
+        with self._lock:
+            return {
+                **self.counters,
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "retry_in_seconds": round(retry_in, 1),
+            }
+
+
+# --- Breaker Registry ---
+breakers = {
+    "gemini": CircuitBreaker("gemini"),
+    "newsapi": CircuitBreaker("newsapi"),
+}
+
+
+def get_breaker(upstream):
+    return breakers[upstream]
+
+
+def time_until_retry(upstream):
+    breaker = breakers.get(upstream)
+    return breaker.time_until_retry() if breaker is not None else 0.0
+
+
+def stats():
+    return {upstream: breaker.stats() for upstream, breaker in breakers.items()}
@@ -0,0 +1,144 @@
+"""
+Content-addressed cache for structured Gemini responses (in-memory LRU + optional SQLite tier)
+"""
+import collections
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+GEMINI_CACHE_TTL_SECONDS = float(os.environ.get('GEMINI_CACHE_TTL_SECONDS', 6 * 60 * 60))
+GEMINI_CACHE_MAX_ENTRIES = int(os.environ.get('GEMINI_CACHE_MAX_ENTRIES', 512))
+GEMINI_CACHE_DB_PATH = os.environ.get('GEMINI_CACHE_DB_PATH', '')
+DISK_PRUNE_EVERY_N_WRITES = 100
+
+
+def make_key(model, payload):
+    """
+    Hashes everything that determines the model's output: model name, prompt contents,
+    response schema and the rest of generationConfig.
+    """
+    canonical = json.dumps({"model": model, "payload": payload}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    TTL + LRU cache of JSON-serializable values. Values are stored as JSON text so every hit
+    returns a fresh copy that callers are free to mutate.
+    """
+    def __init__(self, ttl_seconds, max_entries, db_path=""):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self._entries = collections.OrderedDict()  # key -> (expires_at, json_text)
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._db = None
+        self._disk_writes = 0
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+        if db_path:
+            self._open_db()
+
+    def _open_db(self):
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS response_cache ("
+            "key TEXT PRIMARY KEY, expires_at REAL NOT NULL, body BLOB NOT NULL)"
+        )
+        self._db.commit()
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _disk_get(self, key, now):
+        if self._db is None:
+            return None
+        with self._db_lock:
+            row = self._db.execute("SELECT expires_at, body FROM response_cache WHERE key = ?", (key,)).fetchone()
+            if row and row[0] <= now:
+                self._db.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+        if not row:
+            return None
+        return row[0], zlib.decompress(row[1]).decode("utf-8")
+
+    def _disk_put(self, key, expires_at, text):
+        if self._db is None:
+            return
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO response_cache (key, expires_at, body) VALUES (?, ?, ?)",
+                (key, expires_at, zlib.compress(text.encode("utf-8")))
+            )
+            self._disk_writes += 1
+            if self._disk_writes % DISK_PRUNE_EVERY_N_WRITES == 0:
+                self._db.execute("DELETE FROM response_cache WHERE expires_at <= ?", (time.time(),))
+            self._db.commit()
+
+    def _memory_put(self, key, expires_at, text):
+        with self._lock:
+            self._entries[key] = (expires_at, text)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.counters["evictions"] += 1
+
+    def get(self, key):
+        """Returns the cached value for `key`, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.counters["memory_hits"] += 1
+                    return json.loads(entry[1])
+                del self._entries[key]
+                self.counters["expired"] += 1
+
+        disk_entry = self._disk_get(key, now)
+        if disk_entry is not None:
+            self._memory_put(key, *disk_entry)
+            self._count("disk_hits")
+            return json.loads(disk_entry[1])
+
+        self._count("misses")
+        return None
+
+    def put(self, key, value):
+        expires_at = time.time() + self.ttl_seconds
+        text = json.dumps(value)
+        self._memory_put(key, expires_at, text)
+        self._disk_put(key, expires_at, text)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM response_cache")
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+            size = len(self._entries)
+        hits = counters["memory_hits"] + counters["disk_hits"]
+        lookups = hits + counters["misses"]
+        return {
+            **counters,
+            "entries": size,
+            "max_entries": self.max_entries,
+            "disk_tier": bool(self._db is not None),
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+gemini_response_cache = ResponseCache(GEMINI_CACHE_TTL_SECONDS, GEMINI_CACHE_MAX_ENTRIES, GEMINI_CACHE_DB_PATH)
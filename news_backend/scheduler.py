@@ -0,0 +1,155 @@
+"""
+Priority job scheduler with a bounded worker pool, gated by the rate-limit budget
+"""
+import heapq
+import itertools
+import threading
+import time
+import traceback
+
+from news_backend import key_pool
+from news_backend import rate_limit
+from news_backend import resilience
+
+
+class ScheduledTask:
+    def __init__(self, name, fn, args, kwargs, priority, run_at, budgets):
+        self.name = name
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.run_at = run_at
+        # (upstream, api_key) pairs whose rate-limit buckets must have a token before the task runs
+        self.budgets = budgets or []
+        self.deferrals = 0
+
+
+class JobScheduler:
+    """
+    Runs tasks from a priority queue (lower number runs first) on `num_workers` threads.
+    A task whose rate-limit budget is exhausted (or whose upstream's circuit breaker is open) is
+    deferred until it can run instead of occupying a worker, as is a task that raises
+    RateLimitExceeded part-way through. Idle workers wait on a condition rather than sleeping on a timer.
+    Workers draw from the rate-limit buckets as `traffic_class`, so a background scheduler yields
+    its budget to interactive requests.
+    """
+    def __init__(self, name, num_workers, traffic_class=rate_limit.INTERACTIVE):
+        self.name = name
+        self.num_workers = num_workers
+        self.traffic_class = traffic_class
+        self._queue = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._workers = []
+        self._running = 0
+        self._stopping = False
+        self.counters = {"scheduled": 0, "completed": 0, "failed": 0, "deferred": 0}
+
+    def schedule(self, name, fn, *args, priority=10, delay=0.0, budgets=None, **kwargs):
+        task = ScheduledTask(name, fn, args, kwargs, priority, time.monotonic() + delay, budgets)
+        with self._condition:
+            self._push(task)
+            self.counters["scheduled"] += 1
+        return task
+
+    def _push(self, task):
+        heapq.heappush(self._queue, (task.run_at, task.priority, next(self._sequence), task))
+        self._condition.notify()
+
+    def _next_ready_task(self):
+        """Pops the highest-priority task that is due, or returns the seconds until one is."""
+        now = time.monotonic()
+        ready = [entry for entry in self._queue if entry[0] <= now]
+        if not ready:
+            return None, (self._queue[0][0] - now if self._queue else None)
+        best = min(ready, key=lambda entry: (entry[1], entry[2]))
+        self._queue.remove(best)
+        heapq.heapify(self._queue)
+        return best[3], 0.0
+
+    def _worker_loop(self):
+        with rate_limit.traffic_class(self.traffic_class):
+            self._run_tasks()
+
+    def _run_tasks(self):
+        while True:
+            with self._condition:
+                while True:
+                    if self._stopping:
+                        return
+                    task, wait_for = self._next_ready_task()
+                    if task is not None:
+                        break
+                    self._condition.wait(wait_for)
+
+                if task.budgets:
+                    budget_wait = max(
+                        max(key_pool.estimate_wait(upstream, api_key), resilience.time_until_retry(upstream))
+                        for upstream, api_key in task.budgets
+                    )
+                    if budget_wait > 0:
+                        task.run_at = time.monotonic() + budget_wait
+                        task.deferrals += 1
+                        self.counters["deferred"] += 1
+                        self._push(task)
+                        continue
+                self._running += 1
+
+            try:
+                task.fn(*task.args, **task.kwargs)
+                outcome = "completed"
+            except rate_limit.RateLimitExceeded as e:
+                # Ran out of budget (or hit an open breaker) mid-task: run it again once the wait is over
+                print(f"DEBUG: {self.name}: Task '{task.name}' deferred: {e}")
+                with self._condition:
+                    self._running -= 1
+                    task.run_at = time.monotonic() + max(e.retry_after, 1.0)
+                    task.deferrals += 1
+                    self.counters["deferred"] += 1
+                    self._push(task)
+                continue
+            except Exception as e:
+                print(f"ERROR: {self.name}: Task '{task.name}' failed: {e}")
+                traceback.print_exc()
+                outcome = "failed"
+            with self._condition:
+                self._running -= 1
+                self.counters[outcome] += 1
+
+    def start(self):
+        with self._condition:
+            if self._workers:
+                return
+            self._stopping = False
+            for i in range(self.num_workers):
+                worker = threading.Thread(target=self._worker_loop, name=f"{self.name}_{i}", daemon=True)
+                self._workers.append(worker)
+                worker.start()
+        print(f"DEBUG: {self.name}: Started {self.num_workers} workers.")
+
+    def stop(self, timeout=5.0):
+        """Stops the workers after their current task; queued tasks are dropped."""
+        with self._condition:
+            self._stopping = True
+            self._queue.clear()
+            self._condition.notify_all()
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.join(timeout)
+        print(f"DEBUG: {self.name}: Stopped.")
+
+    def is_running(self):
+        return bool(self._workers) and not self._stopping
+
+    def stats(self):
+        with self._condition:
+            now = time.monotonic()
+            return {
+                **self.counters,
+                "queued": len(self._queue),
+                "ready": sum(1 for entry in self._queue if entry[0] <= now),
+                "running": self._running,
+                "workers": len(self._workers),
+                "traffic_class": self.traffic_class,
+            }
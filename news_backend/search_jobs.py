@@ -0,0 +1,137 @@
+"""
+Bounded background job table for searches that are submitted now and polled later
+"""
+import collections
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+SEARCH_JOBS_MAX_WORKERS = int(os.environ.get('SEARCH_JOBS_MAX_WORKERS', 4))
+SEARCH_JOBS_MAX_PENDING = int(os.environ.get('SEARCH_JOBS_MAX_PENDING', 32))
+SEARCH_JOBS_MAX_ENTRIES = int(os.environ.get('SEARCH_JOBS_MAX_ENTRIES', 500))
+SEARCH_JOBS_TTL_SECONDS = float(os.environ.get('SEARCH_JOBS_TTL_SECONDS', 15 * 60))
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+FINISHED_STATUSES = (JOB_SUCCEEDED, JOB_FAILED)
+
+
+class JobQueueFull(Exception):
+    """Raised when too many jobs are already waiting or running."""
+
+
+class JobTable:
+    """
+    Runs submitted functions on a bounded thread pool and keeps their status and result for
+    `ttl_seconds` after they finish. At most `max_pending` jobs may be unfinished, and at most
+    `max_entries` jobs are remembered (oldest finished jobs are dropped first).
+    """
+    def __init__(self, max_workers, max_pending, max_entries, ttl_seconds):
+        self.max_pending = max_pending
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_workers = max_workers
+        self._executor = None
+        self._jobs = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"submitted": 0, "rejected": 0, "succeeded": 0, "failed": 0, "expired": 0}
+        self.start()
+
+    def _prune(self, now):
+        for job_id, job in list(self._jobs.items()):
+            if job["status"] in FINISHED_STATUSES and now - job["finished_at"] > self.ttl_seconds:
+                del self._jobs[job_id]
+                self.counters["expired"] += 1
+        if len(self._jobs) >= self.max_entries:
+            for job_id, job in list(self._jobs.items()):
+                if len(self._jobs) < self.max_entries:
+                    break
+                if job["status"] in FINISHED_STATUSES:
+                    del self._jobs[job_id]
+
+    def _pending_count(self):
+        return sum(1 for job in self._jobs.values() if job["status"] not in FINISHED_STATUSES)
+
+    def submit(self, fn, *args, description=None):
+        """Queues fn(*args) and returns its job id. Raises JobQueueFull if the table is saturated."""
+        now = time.time()
+        with self._lock:
+            self._prune(now)
+            if self._executor is None:
+                self.counters["rejected"] += 1
+                raise JobQueueFull("Searches are unavailable while the server restarts. Please try again shortly.")
+            if self._pending_count() >= self.max_pending or len(self._jobs) >= self.max_entries:
+                self.counters["rejected"] += 1
+                raise JobQueueFull("Too many searches are in progress. Please try again shortly.")
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                "id": job_id,
+                "status": JOB_QUEUED,
+                "description": description,
+                "created_at": now,
+                "started_at": None,
+                "finished_at": None,
+                "result": None,
+                "error": None,
+            }
+            self.counters["submitted"] += 1
+            self._executor.submit(self._run, job_id, fn, args)
+        return job_id
+
+    def _run(self, job_id, fn, args):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job["status"] != JOB_QUEUED:
+                return  # Expired, or already failed by shutdown()
+            job["status"] = JOB_RUNNING
+            job["started_at"] = time.time()
+        try:
+            result = fn(*args)
+            update = {"status": JOB_SUCCEEDED, "result": result}
+        except Exception as e:
+            print(f"DEBUG: Search job {job_id} failed: {e}")
+            update = {"status": JOB_FAILED, "error": str(e)}
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(update, finished_at=time.time())
+            self.counters[update["status"]] += 1
+
+    def get(self, job_id):
+        """Returns a copy of the job record, or None if it is unknown or has expired."""
+        with self._lock:
+            self._prune(time.time())
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def stats(self):
+        with self._lock:
+            pending = self._pending_count()
+            return {**self.counters, "entries": len(self._jobs), "pending": pending}
+
+    def start(self):
+        """Creates the worker pool if there is none, e.g. after shutdown()."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="search_job")
+
+    def shutdown(self, wait=False):
+        """Stops the worker pool; queued jobs that never started are marked failed. start() makes a new pool."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is None:
+            return
+        executor.shutdown(wait=wait, cancel_futures=True)
+        now = time.time()
+        with self._lock:
+            for job in self._jobs.values():
+                if job["status"] == JOB_QUEUED:
+                    job.update(status=JOB_FAILED, error="The server stopped before this search started.", finished_at=now)
+                    self.counters[JOB_FAILED] += 1
+
+
+search_jobs = JobTable(SEARCH_JOBS_MAX_WORKERS, SEARCH_JOBS_MAX_PENDING, SEARCH_JOBS_MAX_ENTRIES, SEARCH_JOBS_TTL_SECONDS)
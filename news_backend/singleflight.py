@@ -0,0 +1,68 @@
+"""
+Single-flight coalescing: concurrent calls with the same key share one in-flight computation
+"""
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    The first caller for a key (the leader) runs the function; callers that arrive while it is
+    running wait for it and receive the same result, or the same exception.
+    """
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.counters = {"executions": 0, "coalesced": 0, "errors": 0}
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.counters["coalesced"] += 1
+                is_leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.counters["executions"] += 1
+                is_leader = True
+
+        if not is_leader:
+            print(f"DEBUG: {self.name}: Joining in-flight call for key {key!r}.")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except Exception as e:
+            call.error = e
+            with self._lock:
+                self.counters["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+            in_flight = len(self._calls)
+        total = counters["executions"] + counters["coalesced"]
+        return {
+            **counters,
+            "in_flight": in_flight,
+            "coalesced_ratio": round(counters["coalesced"] / total, 3) if total else 0.0,
+        }
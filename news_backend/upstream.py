@@ -0,0 +1,266 @@
+"""
+Pooled, keep-alive HTTP client shared by every Gemini and NewsAPI call
+"""
+import email.utils
+import json
+import os
+import re
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from news_backend import key_pool
+from news_backend import rate_limit
+from news_backend import resilience
+
+# --- Upstream Endpoints (point both at news_backend/mock_upstream.py for offline and load testing) ---
+DEFAULT_GEMINI_API_BASE_URL = "https://generativelanguage.googleapis.com"
+GEMINI_API_BASE_URL = os.environ.get('GEMINI_API_BASE_URL', DEFAULT_GEMINI_API_BASE_URL).rstrip('/')
+NEWSAPI_BASE_URL = os.environ.get('NEWSAPI_BASE_URL', 'https://newsapi.org').rstrip('/')
+GEMINI_MODEL = "gemini-2.0-flash"
+
+# --- Connection Pool Configuration ---
+UPSTREAM_POOL_SIZE = int(os.environ.get('UPSTREAM_POOL_SIZE', 10))
+UPSTREAM_KEEPALIVE = os.environ.get('UPSTREAM_KEEPALIVE', 'true').lower() != 'false'
+UPSTREAM_CONNECT_TIMEOUT = float(os.environ.get('UPSTREAM_CONNECT_TIMEOUT', 5))
+UPSTREAM_READ_TIMEOUT = float(os.environ.get('UPSTREAM_READ_TIMEOUT', 60))
+UPSTREAM_PREWARM = os.environ.get('UPSTREAM_PREWARM', 'false').lower() == 'true'
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def _host_key(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def _build_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=UPSTREAM_POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    if not UPSTREAM_KEEPALIVE:
+        session.headers['Connection'] = 'close'
+    return session
+
+
+def get_session(url):
+    """
+    Returns the pooled session for the host of the given URL, creating it on first use.
+    """
+    host = _host_key(url)
+    session = _sessions.get(host)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(host)
+            if session is None:
+                session = _build_session()
+                _sessions[host] = session
+    return session
+
+
+def request(method, url, timeout=None, **kwargs):
+    """
+    Sends a request through the pooled session for the URL's host.
+    `timeout` is the read timeout; the connect timeout is always UPSTREAM_CONNECT_TIMEOUT.
+    """
+    read_timeout = timeout if timeout is not None else UPSTREAM_READ_TIMEOUT
+    return get_session(url).request(method, url, timeout=(UPSTREAM_CONNECT_TIMEOUT, read_timeout), **kwargs)
+
+
+def gemini_url(method="generateContent", model=None):
+    return f"{GEMINI_API_BASE_URL}/v1beta/models/{model or GEMINI_MODEL}:{method}"
+
+
+def _error_body(response):
+    """The parsed JSON body of an error response, or {} if it has none."""
+    if not response.headers.get('Content-Type', '').startswith('application/json'):
+        return {}
+    try:
+        body = response.json()
+    except ValueError:
+        return {}
+    return body if isinstance(body, dict) else {}
+
+
+def _error_details(response):
+    details = _error_body(response).get("error", {})
+    details = details.get("details", []) if isinstance(details, dict) else []
+    return details if isinstance(details, list) else []
+
+
+def retry_after_seconds(response):
+    """
+    Seconds the upstream asked us to wait, from a Retry-After header (seconds or HTTP date) or a
+    Gemini RetryInfo "retryDelay" in the error body. None if the response gives no hint.
+    """
+    header = response.headers.get('Retry-After')
+    if header:
+        try:
+            return max(0.0, float(header))
+        except ValueError:
+            parsed = email.utils.parsedate_tz(header)
+            if parsed is not None:
+                return max(0.0, email.utils.mktime_tz(parsed) - time.time())
+    for detail in _error_details(response):
+        match = re.fullmatch(r"([\d.]+)s", str(detail.get("retryDelay", "")))
+        if match:
+            return float(match.group(1))
+    return None
+
+
+def quota_exhausted(response):
+    """
+    True for a 429 that retrying cannot fix soon: a Gemini per-day quota violation, or NewsAPI's
+    rateLimited / maximumResultsReached codes (its limits are per day on most plans).
+    """
+    if response.status_code != 429:
+        return False
+    if _error_body(response).get("code") in ("rateLimited", "maximumResultsReached"):
+        return True
+    for detail in _error_details(response):
+        for violation in detail.get("violations", []) if isinstance(detail.get("violations"), list) else []:
+            if "PerDay" in str(violation.get("quotaId", "")):
+                return True
+    return False
+
+
+def _send(upstream_name, api_key, send):
+    """
+    Calls send(api_key) through the upstream's circuit breaker, retrying connection errors, timeouts,
+    429s and 5xx with jittered exponential backoff (or the upstream's Retry-After). Each retry takes a
+    new rate-limit token, and for a pooled key may move to another key. A retry is skipped when its
+    delay (backoff, key cooldown or open breaker, whichever is longest) would pass
+    UPSTREAM_RETRY_MAX_DELAY_SECONDS or the thread's rate_limit.deadline(); the last
+    response is then returned (or the last error raised) for the caller to handle as before.
+    """
+    breaker = resilience.get_breaker(upstream_name)
+    attempt = 0
+    while True:
+        breaker.before_call()
+        error, response, retry_after = None, None, None
+        try:
+            with key_pool.in_flight(upstream_name, api_key):
+                response = send(api_key)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            breaker.record_failure()
+            error = e
+        except requests.exceptions.RequestException:
+            breaker.record_failure()  # Not retried, but must still settle a half-open probe
+            raise
+        else:
+            if response.status_code >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            if response.status_code in (429, 503):
+                retry_after = retry_after_seconds(response)
+            key_pool.report(upstream_name, api_key, response.status_code, retry_after)
+            if response.status_code not in resilience.RETRYABLE_STATUS_CODES or quota_exhausted(response):
+                return response
+
+        # The retry also waits for a key (a 429 may have cooled down every pool key) and for the breaker
+        delay = max(
+            resilience.backoff_delay(attempt, retry_after),
+            key_pool.estimate_wait(upstream_name, api_key),
+            breaker.time_until_retry(),
+        )
+        budget = resilience.UPSTREAM_RETRY_MAX_DELAY_SECONDS
+        remaining = rate_limit.time_remaining()
+        if remaining is not None:
+            budget = min(budget, remaining)
+        if attempt >= resilience.UPSTREAM_MAX_RETRIES or delay > budget or (remaining is not None and delay >= remaining):
+            if error is not None:
+                raise error
+            return response
+
+        reason = error if error is not None else f"HTTP {response.status_code}"
+        print(f"DEBUG: {upstream_name} call failed ({reason}); retry {attempt + 1} in {delay:.2f} seconds.")
+        if response is not None:
+            response.close()
+        breaker.record_retry()
+        time.sleep(delay)
+        attempt += 1
+        api_key = key_pool.acquire(upstream_name, api_key, timeout=max(0.0, budget - delay))
+
+
+def gemini_generate(payload, api_key, timeout=60, model=None):
+    """POSTs a generateContent payload to Gemini (with retries) and returns the raw response."""
+    return _send("gemini", api_key, lambda key: request(
+        "POST",
+        gemini_url(model=model),
+        timeout=timeout,
+        headers={'Content-Type': 'application/json'},
+        params={'key': key},
+        json=payload
+    ))
+
+
+def gemini_stream_generate(payload, api_key, timeout=60):
+    """
+    POSTs a payload to Gemini's streamGenerateContent (SSE) endpoint and returns the open,
+    streaming response. Iterate it with iter_sse_json(). Only the request is retried, never a
+    stream that has started.
+    """
+    return _send("gemini", api_key, lambda key: request(
+        "POST",
+        gemini_url("streamGenerateContent"),
+        timeout=timeout,
+        headers={'Content-Type': 'application/json'},
+        params={'key': key, 'alt': 'sse'},
+        json=payload,
+        stream=True
+    ))
+
+
+def iter_sse_json(response):
+    """Yields the JSON payload of each `data:` line of a server-sent-events response."""
+    for line in response.iter_lines(decode_unicode=True):
+        if line and line.startswith("data:"):
+            data = line[len("data:"):].strip()
+            if data and data != "[DONE]":
+                yield json.loads(data)
+
+
+def newsapi_get(endpoint, params, api_key, timeout=10):
+    """GETs a NewsAPI v2 endpoint ('top-headlines', 'everything') (with retries) and returns the raw response."""
+    return _send("newsapi", api_key, lambda key: request(
+        "GET",
+        f"{NEWSAPI_BASE_URL}/v2/{endpoint}",
+        timeout=timeout,
+        params={**params, 'apiKey': key}
+    ))
+
+
+def prewarm(background=True):
+    """
+    Opens a connection to each upstream host so the first real call skips DNS and the TLS handshake.
+    """
+    def _warm(base_url):
+        try:
+            get_session(base_url).head(base_url, timeout=(UPSTREAM_CONNECT_TIMEOUT, 5))
+            print(f"DEBUG: Pre-warmed upstream connection to {base_url}.")
+        except requests.exceptions.RequestException as e:
+            print(f"WARNING: Failed to pre-warm upstream connection to {base_url}: {e}")
+
+    threads = []
+    for base_url in (GEMINI_API_BASE_URL, NEWSAPI_BASE_URL):
+        if background:
+            t = threading.Thread(target=_warm, args=(base_url,), name="upstream_prewarm", daemon=True)
+            t.start()
+            threads.append(t)
+        else:
+            _warm(base_url)
+    return threads
+
+
+def close_all():
+    """Closes every pooled session and drops its connections."""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
@@ -8,6 +8,32 @@ document.addEventListener('DOMContentLoaded', () => {
     const feedMessage = document.getElementById('feed-message');
 
     const SAVED_ARTICLES_KEY = 'debunkd_saved_articles'; // Key for localStorage
+    const FEED_CACHE_KEY = 'debunkd_feed_cache'; // Key for sessionStorage: { etag, data }
+
+    // Last feed payload and its ETag, so reloads and refreshes can revalidate instead of refetching
+    let cachedFeed = loadCachedFeed();
+
+    function loadCachedFeed() {
+        try {
+            const stored = JSON.parse(sessionStorage.getItem(FEED_CACHE_KEY));
+            return stored && stored.etag && stored.data ? stored : null;
+        } catch (e) {
+            return null;
+        }
+    }
+
+    function storeCachedFeed(etag, data) {
+        cachedFeed = etag ? { etag, data } : null;
+        try {
+            if (cachedFeed) {
+                sessionStorage.setItem(FEED_CACHE_KEY, JSON.stringify(cachedFeed));
+            } else {
+                sessionStorage.removeItem(FEED_CACHE_KEY);
+            }
+        } catch (e) {
+            console.warn("WARNING: Could not persist feed cache:", e);
+        }
+    }
 
     // Helper to get API keys from session storage or default to empty string
     function getUserApiKeys() {
@@ -46,6 +72,7 @@ document.addEventListener('DOMContentLoaded', () => {
         const articleCard = document.createElement('a');
         articleCard.href = `/article/${article.id}`;
         articleCard.classList.add('article-card');
+        articleCard.dataset.articleId = article.id;
 
         const categoryClass = article.category ? article.category.toLowerCase().replace(' ', '-') : 'general';
 
@@ -78,7 +105,141 @@ document.addEventListener('DOMContentLoaded', () => {
                 }
             });
         } else {
-            gridElement.innerHTML = '<p class="info-message">No articles available in this section yet. Please refresh or check back later.</p>';
+            gridElement.innerHTML = EMPTY_SECTION_HTML;
+        }
+    }
+
+    // Applies a /api/feed/changes delta to the rendered grids and the cached payload, touching only changed cards
+    function applyFeedChanges(changes) {
+        let changed = false;
+        Object.entries(changes.sections).forEach(([sectionName, delta]) => {
+            const gridElement = sectionGrids[sectionName];
+            const cachedArticles = cachedFeed.data[sectionName] || [];
+            if (!gridElement || (delta.added.length === 0 && delta.removed.length === 0)) {
+                return;
+            }
+            changed = true;
+
+            // New articles are appended at the end of a section: if pages are still unloaded,
+            // "Load More" will reach them, so only a fully loaded section shows them now.
+            const fullyLoaded = !(cachedFeed.data.next_cursors || {})[sectionName];
+            const loadedIds = new Set(cachedArticles.map(a => a.id));
+            const added = fullyLoaded ? delta.added.filter(a => !loadedIds.has(a.id)) : [];
+
+            const removedIds = new Set(delta.removed);
+            removedIds.forEach(id => {
+                const card = gridElement.querySelector(`[data-article-id="${CSS.escape(id)}"]`);
+                if (card) card.remove();
+            });
+            if (added.length > 0 && !gridElement.querySelector('.article-card')) {
+                gridElement.innerHTML = ''; // Drop the empty-section placeholder
+            }
+            added.forEach(article => {
+                const articleCard = createArticleCard(article);
+                if (articleCard) {
+                    gridElement.appendChild(articleCard);
+                }
+            });
+            if (!gridElement.querySelector('.article-card')) {
+                gridElement.innerHTML = EMPTY_SECTION_HTML;
+            }
+
+            cachedFeed.data[sectionName] = cachedArticles.filter(a => !removedIds.has(a.id)).concat(added);
+        });
+
+        cachedFeed.data.version = changes.version;
+        cachedFeed.data.initial_generation_complete = changes.initial_generation_complete;
+        storeCachedFeed(`"${changes.card_etag}"`, cachedFeed.data);
+        return changed;
+    }
+
+    // Returns the synced feed payload via the delta endpoint, or null if a full fetch is needed
+    async function syncFeedChanges() {
+        if (!cachedFeed || !feedRendered || cachedFeed.data.version === undefined || !cachedFeed.data.instance) {
+            return null;
+        }
+        const params = new URLSearchParams({ since: cachedFeed.data.version, instance: cachedFeed.data.instance });
+        const response = await fetch(`/api/feed/changes?${params}`, { cache: 'no-store' });
+        if (!response.ok) {
+            console.warn("WARNING: Feed delta sync failed with status", response.status);
+            return null;
+        }
+        const changes = await response.json();
+        if (changes.resync) {
+            console.log("DEBUG: Feed delta sync not possible, falling back to a full fetch.");
+            return null;
+        }
+        const changed = applyFeedChanges(changes);
+        console.log("DEBUG: Applied feed delta up to version", changes.version);
+        return { data: cachedFeed.data, changed };
+    }
+
+    const EMPTY_SECTION_HTML = '<p class="info-message">No articles available in this section yet. Please refresh or check back later.</p>';
+
+    let feedRendered = false;
+
+    const sectionGrids = {
+        latest_news: latestNewsGrid,
+        general_misconceptions: generalMisconceptionsGrid,
+        important_issues: importantIssuesGrid
+    };
+
+    function renderFeed(data) {
+        renderArticles(data.latest_news, latestNewsGrid);
+        renderArticles(data.general_misconceptions, generalMisconceptionsGrid);
+        renderArticles(data.important_issues, importantIssuesGrid);
+        updateLoadMoreButtons(data.next_cursors || {});
+        feedRendered = true;
+    }
+
+    function updateLoadMoreButtons(nextCursors) {
+        document.querySelectorAll('.load-more-btn').forEach(button => {
+            button.style.display = nextCursors[button.dataset.section] ? 'inline-block' : 'none';
+        });
+    }
+
+    // Fetches the next page of card projections for one section and appends it
+    async function loadMoreArticles(sectionName, button) {
+        const cursor = cachedFeed && (cachedFeed.data.next_cursors || {})[sectionName];
+        if (!cursor) return;
+        button.disabled = true;
+        try {
+            const params = new URLSearchParams({ fields: 'card', section: sectionName, cursor: cursor });
+            const response = await fetch(`/api/get_feed_articles?${params}`, { headers: getUserApiKeys(), cache: 'no-store' });
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+            const page = await response.json();
+            const gridElement = sectionGrids[sectionName];
+            const loadedIds = new Set(cachedFeed.data[sectionName].map(a => a.id));
+            const newCards = page.items.filter(a => !loadedIds.has(a.id));
+            newCards.forEach(article => {
+                const articleCard = createArticleCard(article);
+                if (articleCard) gridElement.appendChild(articleCard);
+            });
+            cachedFeed.data[sectionName] = cachedFeed.data[sectionName].concat(newCards);
+            cachedFeed.data.next_cursors[sectionName] = page.next_cursor;
+            storeCachedFeed(cachedFeed.etag, cachedFeed.data);
+            updateLoadMoreButtons(cachedFeed.data.next_cursors);
+        } catch (error) {
+            console.error('Error loading more articles:', error);
+            showFeedMessage('Could not load more articles. Please try again.', true);
+        } finally {
+            button.disabled = false;
+        }
+    }
+
+    function reportFeedState(data, unchanged) {
+        const allSectionsLoaded = data.latest_news.length > 0 &&
+                                  data.general_misconceptions.length > 0 &&
+                                  data.important_issues.length > 0;
+
+        if (data.initial_generation_complete === false || !allSectionsLoaded) {
+            showFeedMessage("Generating initial articles. Please wait a moment or refresh.", false, 5000);
+        } else if (unchanged) {
+            showFeedMessage("Feed is up to date.", false, 3000);
+        } else {
+            showFeedMessage("Feed updated!", false, 3000);
         }
     }
 
@@ -95,34 +256,44 @@ document.addEventListener('DOMContentLoaded', () => {
         console.log("DEBUG: Attempting to fetch articles...");
 
         try {
-            const url = `/api/get_feed_articles`;
-            const headers = getUserApiKeys();
-            const response = await fetch(url, { headers: headers });
-
-            console.log("DEBUG: Fetch request complete. Response status:", response.status);
-
-            if (!response.ok) {
-                const errorText = await response.text();
-                throw new Error(`HTTP error! status: ${response.status}, message: ${errorText}`);
+            const synced = await syncFeedChanges();
+            if (synced) {
+                reportFeedState(synced.data, !synced.changed);
+                return;
             }
 
-            const data = await response.json();
-            console.log("DEBUG: Data received from API:", data);
-
-            renderArticles(data.latest_news, latestNewsGrid);
-            renderArticles(data.general_misconceptions, generalMisconceptionsGrid);
-            renderArticles(data.important_issues, importantIssuesGrid);
+            // Card projection only: full article bodies are fetched on /article/<id>
+            const url = `/api/get_feed_articles?fields=card`;
+            const headers = getUserApiKeys();
+            if (cachedFeed) {
+                headers['If-None-Match'] = cachedFeed.etag;
+            }
+            // The ETag is managed here, so bypass the HTTP cache to always see the 304
+            const response = await fetch(url, { headers: headers, cache: 'no-store' });
 
-            const allSectionsLoaded = data.latest_news.length > 0 &&
-                                      data.general_misconceptions.length > 0 &&
-                                      data.important_issues.length > 0;
+            console.log("DEBUG: Fetch request complete. Response status:", response.status);
 
-            if (data.initial_generation_complete === false || !allSectionsLoaded) {
-                showFeedMessage("Generating initial articles. Please wait a moment or refresh.", false, 5000);
+            let data;
+            if (response.status === 304 && cachedFeed) {
+                data = cachedFeed.data;
+                console.log("DEBUG: Feed unchanged, reusing cached articles.");
+                if (!feedRendered) {
+                    renderFeed(data);
+                }
             } else {
-                showFeedMessage("Feed updated!", false, 3000);
+                if (!response.ok) {
+                    const errorText = await response.text();
+                    throw new Error(`HTTP error! status: ${response.status}, message: ${errorText}`);
+                }
+
+                data = await response.json();
+                console.log("DEBUG: Data received from API:", data);
+                storeCachedFeed(response.headers.get('ETag'), data);
+                renderFeed(data);
             }
 
+            reportFeedState(data, response.status === 304);
+
         } catch (error) {
             console.error('Error fetching feed articles:', error);
             showFeedMessage('An error occurred while fetching articles. Please check console.', true);
@@ -130,6 +301,7 @@ document.addEventListener('DOMContentLoaded', () => {
             if (loadingIndicator) loadingIndicator.style.display = 'none';
             if (refreshIcon) refreshIcon.style.display = 'inline-block';
             if (refreshFeedBtn) refreshFeedBtn.disabled = false;
+            subscribeToFeedStream();
         }
     }
 
@@ -138,6 +310,51 @@ document.addEventListener('DOMContentLoaded', () => {
         refreshFeedBtn.addEventListener('click', () => fetchArticles(null, true));
     }
 
-    // Initial fetch when the page loads
+    document.querySelectorAll('.load-more-btn').forEach(button => {
+        button.addEventListener('click', () => loadMoreArticles(button.dataset.section, button));
+    });
+
+    // Live updates: the server pushes a 'feed_changes' event for every published feed version
+    let feedStream = null;
+
+    function subscribeToFeedStream() {
+        if (feedStream || !window.EventSource || !cachedFeed || cachedFeed.data.version === undefined || !cachedFeed.data.instance) {
+            return;
+        }
+        // On reconnect the browser resumes from Last-Event-ID, which takes precedence over these parameters
+        const params = new URLSearchParams({ since: cachedFeed.data.version, instance: cachedFeed.data.instance });
+        feedStream = new EventSource(`/api/feed/stream?${params}`);
+
+        feedStream.addEventListener('feed_changes', (event) => {
+            const changes = JSON.parse(event.data);
+            if (!cachedFeed || changes.instance !== cachedFeed.data.instance || changes.version <= cachedFeed.data.version) {
+                return;
+            }
+            if (applyFeedChanges(changes)) {
+                reportFeedState(cachedFeed.data, false);
+            }
+        });
+
+        feedStream.addEventListener('resync', () => {
+            console.log("DEBUG: Feed stream requested a full resync.");
+            storeCachedFeed(null, null);
+            feedStream.close();
+            feedStream = null;
+            fetchArticles();
+        });
+
+        feedStream.onerror = () => {
+            if (feedStream && feedStream.readyState === EventSource.CLOSED) {
+                // Refused (e.g. subscriber cap reached): fall back to manual refresh
+                console.warn("WARNING: Live feed updates unavailable.");
+                feedStream = null;
+            }
+        };
+    }
+
+    // Show the last known feed immediately, then revalidate it
+    if (cachedFeed) {
+        renderFeed(cachedFeed.data);
+    }
     fetchArticles();
 });
\ No newline at end of file
@@ -54,34 +54,10 @@ document.addEventListener('DOMContentLoaded', () => {
         }
 
         try {
-            const response = await fetch(`/api/search_articles?query=${encodeURIComponent(query)}`, { headers: headers });
-            if (!response.ok) {
-                const errorData = await response.json();
-                if (response.status === 401) {
-                    window.showApiKeyPopup();
-                    searchResultsContainer.innerHTML = '<p class="error-message">API keys are missing or invalid. Please enter them to perform searches.</p>';
-                } else {
-                    throw new Error(`HTTP error! status: ${response.status} - ${errorData.message || response.statusText}`);
-                }
-            }
-            const data = await response.json();
-
-            if (data.results && data.results.length > 0) {
-                const article = data.results[0];
-                const searchResultSection = document.createElement('div');
-                searchResultSection.classList.add('feed-section');
-                searchResultSection.innerHTML = `
-                    <div class="page-header">
-                        <h1>Search Result for "${query}"</h1>
-                    </div>
-                    <div class="article-grid" id="search-result-grid"></div>
-                `;
-                const articleGrid = searchResultSection.querySelector('.article-grid');
-                articleGrid.appendChild(createSearchResultCard(article));
-                searchResultsContainer.appendChild(searchResultSection);
-
+            if (window.ReadableStream && window.TextDecoder) {
+                await streamSearch(query, headers);
             } else {
-                searchResultsContainer.innerHTML = '<p class="info-message">No results found for your query. Try a different search term.</p>';
+                await fetchSearch(query, headers);
             }
         } catch (error) {
             console.error('Error during search:', error);
@@ -92,6 +68,145 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
+    function createSearchResultSection(query) {
+        const searchResultSection = document.createElement('div');
+        searchResultSection.classList.add('feed-section');
+        searchResultSection.innerHTML = `
+            <div class="page-header">
+                <h1></h1>
+            </div>
+            <p class="info-message search-stage-message"></p>
+            <div class="article-grid" id="search-result-grid"></div>
+        `;
+        searchResultSection.querySelector('h1').textContent = `Search Result for "${query}"`;
+        searchResultsContainer.appendChild(searchResultSection);
+        return searchResultSection;
+    }
+
+    function renderSearchResult(data, query, searchResultSection = null) {
+        if (data.results && data.results.length > 0) {
+            const section = searchResultSection || createSearchResultSection(query);
+            const articleGrid = section.querySelector('.article-grid');
+            const stageMessage = section.querySelector('.search-stage-message');
+            if (stageMessage) stageMessage.remove();
+            articleGrid.innerHTML = '';
+            articleGrid.appendChild(createSearchResultCard(data.results[0]));
+        } else {
+            searchResultsContainer.innerHTML = '<p class="info-message">No results found for your query. Try a different search term.</p>';
+        }
+    }
+
+    async function fetchSearch(query, headers) {
+        const response = await fetch(`/api/search_articles?query=${encodeURIComponent(query)}`, { headers: headers });
+        if (!response.ok) {
+            const errorData = await response.json();
+            if (response.status === 401) {
+                window.showApiKeyPopup();
+                searchResultsContainer.innerHTML = '<p class="error-message">API keys are missing or invalid. Please enter them to perform searches.</p>';
+                return;
+            }
+            throw new Error(`HTTP error! status: ${response.status} - ${errorData.message || response.statusText}`);
+        }
+        renderSearchResult(await response.json(), query);
+    }
+
+    const STAGE_MESSAGES = {
+        started: () => 'Understanding your search...',
+        classified: (data) => data.classification === 'news' ? 'Looking for news coverage...' : 'Preparing a fact-check...',
+        keyword: (data) => `Searching news for "${data.keyword}"...`,
+        sources: (data) => `Found ${data.sources.length} source${data.sources.length === 1 ? '' : 's'}. Writing the article...`
+    };
+
+    // Streams /api/search_articles/stream and renders stage progress and article fields as they arrive.
+    async function streamSearch(query, headers) {
+        const response = await fetch(`/api/search_articles/stream?query=${encodeURIComponent(query)}`, {
+            headers: { ...headers, 'Accept': 'text/event-stream' }
+        });
+        if (!response.ok) {
+            if (response.status === 401) {
+                window.showApiKeyPopup();
+                searchResultsContainer.innerHTML = '<p class="error-message">API keys are missing or invalid. Please enter them to perform searches.</p>';
+                return;
+            }
+            if (response.status === 404) {
+                await fetchSearch(query, headers);
+                return;
+            }
+            const errorData = await response.json();
+            throw new Error(`HTTP error! status: ${response.status} - ${errorData.message || response.statusText}`);
+        }
+
+        const section = createSearchResultSection(query);
+        const stageMessage = section.querySelector('.search-stage-message');
+        const articleGrid = section.querySelector('.article-grid');
+        let previewCard = null;
+
+        function renderPartial(partial) {
+            if (!partial.title && !partial.summary) return;
+            if (!previewCard) {
+                previewCard = document.createElement('div');
+                previewCard.classList.add('article-card');
+                previewCard.innerHTML = `
+                    <span class="article-card-category-tag general"></span>
+                    <h3></h3>
+                    <p></p>
+                `;
+                articleGrid.appendChild(previewCard);
+            }
+            const tag = previewCard.querySelector('.article-card-category-tag');
+            if (partial.category) {
+                tag.textContent = partial.category;
+                tag.className = `article-card-category-tag ${partial.category.toLowerCase().replace(' ', '-')}`;
+            }
+            previewCard.querySelector('h3').textContent = partial.title || '';
+            previewCard.querySelector('p').textContent = partial.summary || '';
+        }
+
+        function handleEvent(name, data) {
+            if (name === 'stage') {
+                const message = STAGE_MESSAGES[data.stage];
+                if (message && stageMessage) stageMessage.textContent = message(data);
+            } else if (name === 'partial_article') {
+                renderPartial(data);
+            } else if (name === 'result') {
+                renderSearchResult(data, query, section);
+                return true;
+            } else if (name === 'error') {
+                throw new Error(data.message || data.error);
+            }
+            return false;
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const rawEvent = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+
+                let eventName = 'message';
+                const dataLines = [];
+                rawEvent.split('\n').forEach(line => {
+                    if (line.startsWith('event:')) eventName = line.slice(6).trim();
+                    else if (line.startsWith('data:')) dataLines.push(line.slice(5).trim());
+                });
+                if (dataLines.length === 0) continue; // Heartbeat comment
+
+                if (handleEvent(eventName, JSON.parse(dataLines.join('\n')))) {
+                    reader.cancel();
+                    return;
+                }
+            }
+        }
+        throw new Error('The search stream ended before a result was received');
+    }
+
     searchButton.addEventListener('click', performSearch);
     searchInput.addEventListener('keypress', (event) => {
         if (event.key === 'Enter') {
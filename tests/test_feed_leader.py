@@ -0,0 +1,72 @@
+"""
+Feed generator hand-over: a leader that is demoted while generation tasks are queued and then
+re-elected must pick its sections up again.
+"""
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+os.environ["ARTICLE_STORE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="debunkd_test_"), "articles.db")
+os.environ["FEED_WORKER_THREADS"] = "1"
+os.environ["RATE_LIMIT_SHARED_DB_PATH"] = ""
+
+import app  # noqa: E402  (reads the environment above at import time)
+
+
+class FeedLeaderHandoverTest(unittest.TestCase):
+    HEADLINES_PER_SECTION = app.MAX_ARTICLES_PER_SECTION + 5  # Enough to claim every free slot
+
+    def setUp(self):
+        self.calls = []
+        self.calls_lock = threading.Lock()
+        self.gate = threading.Event()
+        for sec_name in app.section_configs:
+            app.article_store.set_headline_queue(
+                sec_name, [f"{sec_name} headline {i}" for i in range(self.HEADLINES_PER_SECTION)]
+            )
+        app.article_store.flush()
+
+    def tearDown(self):
+        self.gate.set()
+        app.stop_background_generation()
+
+    def fake_generate(self, sec_name, headlines, gemini_key, news_key):
+        # Never publishes or releases its claim: only a stopped scheduler's reset can free the section
+        with self.calls_lock:
+            self.calls.append(sec_name)
+        self.gate.wait(5)
+
+    def wait_for_sections(self, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self.calls_lock:
+                if set(self.calls) >= set(app.section_configs):
+                    return True
+            time.sleep(0.05)
+        return False
+
+    def test_reelected_leader_resumes_every_section(self):
+        with mock.patch.object(app, "generate_section_articles_task", self.fake_generate):
+            app.become_feed_leader("test-gemini-key", "test-news-key")
+            deadline = time.monotonic() + 5
+            while not self.calls and time.monotonic() < deadline:
+                time.sleep(0.05)
+            self.assertTrue(self.calls, "the leader never started generating")
+            self.assertGreater(app.feed_scheduler.stats()["queued"], 0)
+
+            # Demoted with generate tasks still queued: they are dropped, their claims are not
+            self.gate.set()
+            app.step_down_as_feed_leader()
+            self.assertTrue(any(state["claimed"] for state in app.generation_state.values()))
+
+            with self.calls_lock:
+                self.calls.clear()
+            app.become_feed_leader("test-gemini-key", "test-news-key")
+            self.assertTrue(self.wait_for_sections(), f"sections left idle after re-election: {app.generation_state}")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,13 @@
+"""
+WSGI entry point for production servers, e.g.:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Background workers are not started here; gunicorn.conf.py starts them in each worker after the fork.
+Servers without such a hook can set START_WORKERS=true instead.
+"""
+import os
+
+from app import create_app
+
+app = create_app({"START_WORKERS": os.getenv("START_WORKERS", "false").lower() == "true"})